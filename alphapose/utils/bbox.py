@@ -66,6 +66,13 @@ def bbox_clip_xyxy(xyxy, width, height):
     else:
         raise TypeError('Expect input xywh a list, tuple or numpy.ndarray, given {}'.format(type(xyxy)))
 
+def bbox_from_pose(pose, width, height, ratio=0.1):
+    'Bounding boxes (xmin, ymin, xmax, ymax) of poses, as `get_box` of PoseFlow.\n\n    The box of the keypoints is expanded by `ratio` of its size on each side\n    and clipped to the image.\n\n    Parameters\n    ----------\n    pose : numpy.ndarray\n        The keypoints, an ndarray with shape :math:`(N, K, 2)` or more channels.\n    width : int or float\n        Image width.\n    height : int or float\n        Image height.\n    ratio : float, default is 0.1\n        Expand ratio.\n\n    Returns\n    -------\n    numpy.ndarray\n        An ndarray with shape :math:`(N, 4)`.\n\n    '
+    (xy_min, xy_max) = (pose[:, :, :2].min(axis=1), pose[:, :, :2].max(axis=1))
+    size = (xy_max - xy_min)
+    xyxy = np.hstack(((xy_min - (ratio * size)), (xy_max + (ratio * size))))
+    return np.clip(xyxy, 0, [width, height, width, height])
+
 def transformBox(pt, bbox, input_size, output_size):
     (inpH, inpW) = input_size
     (resH, _) = output_size
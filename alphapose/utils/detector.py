@@ -8,9 +8,17 @@ from threading import Thread
 from queue import Queue
 import cv2
 import numpy as np
+from alphapose.utils.bbox import bbox_from_pose
+from alphapose.utils.motion_gate import MotionGate
 from alphapose.utils.presets import SimpleTransform, SimpleTransform3DSMPL
 from alphapose.models import builder
+from alphapose.utils.roi import RegionOfInterest
 import multiprocessing as mp
+# marks of the frames skipping the detector, carried in their own field through the queues and to the writer
+# boxes of a frame between two keyframes, found from the poses of the frame before it when it is read
+PROPAGATE = 'propagate'
+# frame without motion since the last one processed, whose results the writer repeats
+STATIC = 'static'
 
 
 class DetectionLoader():
@@ -35,7 +43,19 @@ class DetectionLoader():
             self.videoinfo = {'fourcc': self.fourcc, 'fps': self.fps, 'frameSize': self.frameSize}
             stream.release()
         self.detector = detector
+        # fixed camera: detect on the bounding crop of the ROI only, drop the detections outside of it
+        self.roi = (RegionOfInterest.from_file(opt.roi, (input_source if (mode == 'video') else self.img_dir)) if getattr(opt, 'roi', '') else None)
         self.batchSize = batchSize
+        # video: run the detector on every det_interval-th frame only, see propagate
+        self.det_interval = (max(getattr(opt, 'det_interval', 1), 1) if (mode == 'video') else 1)
+        self.det_drop = getattr(opt, 'det_drop', 0.2)
+        self.key_batch = (- ((- batchSize) // self.det_interval))
+        self.prev_poses = None
+        self.propagated = False
+        self.redetect = False
+        # video: frames without motion skip detection and pose estimation
+        self.motion_gate = (MotionGate(opt.motion_thres) if ((mode == 'video') and (getattr(opt, 'motion_thres', 0) > 0)) else None)
+        self.static_frames = 0
         leftover = 0
         if (self.datalen % batchSize):
             leftover = 1
@@ -103,8 +123,8 @@ class DetectionLoader():
     def wait_and_put(self, queue, item):
         queue.put(item)
 
-    def wait_and_get(self, queue):
-        return queue.get()
+    def wait_and_get(self, queue, timeout=None):
+        return queue.get(timeout=timeout)
 
     def image_preprocess(self):
         for i in range(self.num_batches):
@@ -114,16 +134,24 @@ class DetectionLoader():
             im_dim_list = []
             for k in range((i * self.batchSize), min(((i + 1) * self.batchSize), self.datalen)):
                 if self.stopped:
-                    self.wait_and_put(self.image_queue, (None, None, None, None))
+                    self.wait_and_put(self.image_queue, (None, None, None, None, None))
                     return
                 im_name_k = self.imglist[k]
-                img_k = self.detector.image_preprocess(im_name_k)
+                if (self.roi is None):
+                    (img_k, orig_img_k) = self.detector.image_preprocess_with_orig(im_name_k)
+                    im_dim_list_k = (orig_img_k.shape[1], orig_img_k.shape[0])
+                else:
+                    orig_img_k = cv2.imread(im_name_k)
+                    if (orig_img_k is None):
+                        raise IOError('Cannot read image: {}'.format(im_name_k))
+                    roi_img_k = np.ascontiguousarray(self.roi.crop(orig_img_k)[0])
+                    img_k = self.detector.image_preprocess(roi_img_k)
+                    im_dim_list_k = (roi_img_k.shape[1], roi_img_k.shape[0])
                 if isinstance(img_k, np.ndarray):
                     img_k = jt.array(img_k)
                 if (img_k.ndim == 3):
                     img_k = img_k.unsqueeze(0)
-                orig_img_k = cv2.cvtColor(cv2.imread(im_name_k), cv2.COLOR_BGR2RGB)
-                im_dim_list_k = (orig_img_k.shape[1], orig_img_k.shape[0])
+                orig_img_k = cv2.cvtColor(orig_img_k, cv2.COLOR_BGR2RGB)
                 imgs.append(img_k)
                 orig_imgs.append(orig_img_k)
                 im_names.append(os.path.basename(im_name_k))
@@ -131,7 +159,7 @@ class DetectionLoader():
             with jt.no_grad():
                 imgs = jt.concat(imgs)
                 im_dim_list = jt.float32(im_dim_list).repeat(1, 2)
-            self.wait_and_put(self.image_queue, (imgs, orig_imgs, im_names, im_dim_list))
+            self.wait_and_put(self.image_queue, (imgs, orig_imgs, im_names, im_dim_list, ([None] * len(orig_imgs))))
 
     def frame_preprocess(self):
         stream = cv2.VideoCapture(self.path)
@@ -141,50 +169,92 @@ class DetectionLoader():
             orig_imgs = []
             im_names = []
             im_dim_list = []
+            # None for the frames to detect, else PROPAGATE or STATIC
+            marks = []
             for k in range((i * self.batchSize), min(((i + 1) * self.batchSize), self.datalen)):
                 (grabbed, frame) = stream.read()
                 if ((not grabbed) or self.stopped):
-                    if (len(imgs) > 0):
+                    if (len(orig_imgs) > 0):
                         with jt.no_grad():
-                            imgs = jt.contrib.concat(imgs)
-                            im_dim_list = jt.float32(im_dim_list).repeat(1, 2)
-                        self.wait_and_put(self.image_queue, (imgs, orig_imgs, im_names, im_dim_list))
-                    self.wait_and_put(self.image_queue, (None, None, None, None))
+                            imgs = (jt.contrib.concat(imgs) if imgs else None)
+                            im_dim_list = (jt.float32(im_dim_list).repeat(1, 2) if im_dim_list else None)
+                        self.wait_and_put(self.image_queue, (imgs, orig_imgs, im_names, im_dim_list, marks))
+                    self.wait_and_put(self.image_queue, (None, None, None, None, None))
                     print((('===========================> This video get ' + str(k)) + ' frames in total.'))
                     sys.stdout.flush()
                     stream.release()
                     return
-                img_k = self.detector.image_preprocess(frame)
-                if isinstance(img_k, np.ndarray):
-                    img_k = jt.array(img_k)
-                if (img_k.ndim == 3):
-                    img_k = img_k.unsqueeze(0)
-                im_dim_list_k = (frame.shape[1], frame.shape[0])
-                imgs.append(img_k)
+                if ((self.motion_gate is not None) and (not self.motion_gate.moving(frame))):
+                    marks.append(STATIC)
+                elif self.is_keyframe(k):
+                    (img_k, im_dim_list_k) = self.preprocess_frame(frame)
+                    imgs.append(img_k)
+                    im_dim_list.append(im_dim_list_k)
+                    marks.append(None)
+                else:
+                    marks.append(PROPAGATE)
                 orig_imgs.append(frame[:, :, ::(- 1)])
                 im_names.append((str(k) + '.jpg'))
-                im_dim_list.append(im_dim_list_k)
             with jt.no_grad():
-                imgs = jt.contrib.concat(imgs)
-                im_dim_list = jt.float32(im_dim_list).repeat(1, 2)
-            self.wait_and_put(self.image_queue, (imgs, orig_imgs, im_names, im_dim_list))
+                imgs = (jt.contrib.concat(imgs) if imgs else None)
+                im_dim_list = (jt.float32(im_dim_list).repeat(1, 2) if im_dim_list else None)
+            self.wait_and_put(self.image_queue, (imgs, orig_imgs, im_names, im_dim_list, marks))
         stream.release()
 
+    def is_keyframe(self, k):
+        return ((k % self.det_interval) == 0)
+
+    def preprocess_frame(self, frame):
+        """Detector input of a video frame (ndarray, channel BGR) and the (w, h) it maps back to"""
+        det_frame = (frame if (self.roi is None) else np.ascontiguousarray(self.roi.crop(frame)[0]))
+        img_k = self.detector.image_preprocess(det_frame)
+        if isinstance(img_k, np.ndarray):
+            img_k = jt.array(img_k)
+        if (img_k.ndim == 3):
+            img_k = img_k.unsqueeze(0)
+        return (img_k, (det_frame.shape[1], det_frame.shape[0]))
+
+    def detect(self, imgs, orig_imgs, im_dim_list):
+        """
+        Run the detector on a batch of frames
+        Input: imgs(jt.Var,(b,3,h,w)): pre-processed frames, im_dim_list(jt.Var,(b,4)): size they map back to
+               orig_imgs: the original frames (ndarray, channel RGB)
+        Output: dets(jt.Var or ndarray,(n,(batch_idx,x1,y1,x2,y2,c,s,idx of cls))) in frame coordinates, or 0
+        """
+        if self.detector.tile_size:
+            det_frames = [orig_img[:, :, ::(- 1)] for orig_img in orig_imgs]
+            if (self.roi is not None):
+                det_frames = [self.roi.crop(det_frame)[0] for det_frame in det_frames]
+            dets = self.detector.images_detection_tiled([np.ascontiguousarray(det_frame) for det_frame in det_frames])
+        else:
+            for pad_i in range((self.key_batch - len(orig_imgs))):
+                imgs = jt.contrib.concat((imgs, jt.unsqueeze(imgs[0], dim=0)), dim=0)
+                im_dim_list = jt.contrib.concat((im_dim_list, jt.unsqueeze(im_dim_list[0], dim=0)), dim=0)
+            dets = self.detector.images_detection(imgs, im_dim_list)
+            if ((not isinstance(dets, int)) and (len(orig_imgs) < self.key_batch)):
+                # detections of the copies padding the batch
+                dets = dets[(dets[:, 0] < len(orig_imgs))]
+        if ((self.roi is not None) and (not isinstance(dets, int))):
+            dets = self.roi.restore((dets if isinstance(dets, np.ndarray) else dets.numpy()), orig_imgs)
+        return dets
+
     def image_detection(self):
         for i in range(self.num_batches):
-            (imgs, orig_imgs, im_names, im_dim_list) = self.wait_and_get(self.image_queue)
-            if ((imgs is None) or self.stopped):
-                self.wait_and_put(self.det_queue, (None, None, None, None, None, None, None))
+            (imgs, orig_imgs, im_names, im_dim_list, marks) = self.wait_and_get(self.image_queue)
+            if ((orig_imgs is None) or self.stopped):
+                self.wait_and_put(self.det_queue, (None, None, None, None, None, None, None, None))
                 return
             with jt.no_grad():
-                for pad_i in range((self.batchSize - len(imgs))):
-                    imgs = jt.contrib.concat((imgs, jt.unsqueeze(imgs[0], dim=0)), dim=0)
-                    im_dim_list = jt.contrib.concat((im_dim_list, jt.unsqueeze(im_dim_list[0], dim=0)), dim=0)
-                dets = self.detector.images_detection(imgs, im_dim_list)
+                keys = [k for k in range(len(orig_imgs)) if (marks[k] is None)]
+                dets = (self.detect(imgs, [orig_imgs[k] for k in keys], im_dim_list) if keys else 0)
                 if (isinstance(dets, int) or (dets.shape[0] == 0)):
                     for k in range(len(orig_imgs)):
-                        self.wait_and_put(self.det_queue, (orig_imgs[k], im_names[k], None, None, None, None, None))
+                        self.wait_and_put(self.det_queue, (orig_imgs[k], im_names[k], None, None, None, None, None, marks[k]))
                     continue
+                if (len(keys) < len(orig_imgs)):
+                    # batch index of the keyframes among all the frames of the batch
+                    dets = (dets if isinstance(dets, np.ndarray) else dets.numpy())
+                    dets[:, 0] = np.float32(keys)[dets[:, 0].astype(np.int64)]
                 if isinstance(dets, np.ndarray):
                     dets = jt.array(dets)
                 # dets = dets.cpu()
@@ -195,31 +265,96 @@ class DetectionLoader():
                 else:
                     ids = jt.zeros(scores.shape)
             for k in range(len(orig_imgs)):
+                if (marks[k] is not None):
+                    self.wait_and_put(self.det_queue, (orig_imgs[k], im_names[k], None, None, None, None, None, marks[k]))
+                    continue
                 boxes_k = boxes[(dets[:, 0] == k)]
                 if (isinstance(boxes_k, int) or (boxes_k.shape[0] == 0)):
-                    self.wait_and_put(self.det_queue, (orig_imgs[k], im_names[k], None, None, None, None, None))
+                    self.wait_and_put(self.det_queue, (orig_imgs[k], im_names[k], None, None, None, None, None, None))
                     continue
-                inps = jt.zeros((boxes_k.shape[0], 3, *self._input_size))
-                cropped_boxes = jt.zeros((boxes_k.shape[0], 4))
-                self.wait_and_put(self.det_queue, (orig_imgs[k], im_names[k], boxes_k, scores[(dets[:, 0] == k)], ids[(dets[:, 0] == k)], inps, cropped_boxes))
+                # the crops and their boxes are made by image_postprocess
+                self.wait_and_put(self.det_queue, (orig_imgs[k], im_names[k], boxes_k, scores[(dets[:, 0] == k)], ids[(dets[:, 0] == k)], None, None, None))
 
     def image_postprocess(self):
         for i in range(self.datalen):
             with jt.no_grad():
-                (orig_img, im_name, boxes, scores, ids, inps, cropped_boxes) = self.wait_and_get(self.det_queue)
+                (orig_img, im_name, boxes, scores, ids, inps, cropped_boxes, mark) = self.wait_and_get(self.det_queue)
                 if ((orig_img is None) or self.stopped):
-                    self.wait_and_put(self.pose_queue, (None, None, None, None, None, None, None))
+                    self.wait_and_put(self.pose_queue, (None, None, None, None, None, None, None, None))
                     return
+                if (mark is not None):
+                    self.wait_and_put(self.pose_queue, (None, orig_img, im_name, None, None, None, None, mark))
+                    continue
                 if ((boxes is None) or (len(boxes) == 0)):
-                    self.wait_and_put(self.pose_queue, (None, orig_img, im_name, boxes, scores, ids, None))
+                    self.wait_and_put(self.pose_queue, (None, orig_img, im_name, boxes, scores, ids, None, None))
                     continue
-                for (i, box) in enumerate(boxes):
-                    (inps[i], cropped_box) = self.transformation.test_transform(orig_img, box)
-                    cropped_boxes[i] = jt.float32(cropped_box)
-                self.wait_and_put(self.pose_queue, (inps, orig_img, im_name, boxes, scores, ids, cropped_boxes))
+                (inps, cropped_boxes) = self.transformation.test_transform_batch(orig_img, boxes)
+                self.wait_and_put(self.pose_queue, (inps, orig_img, im_name, boxes, scores, ids, cropped_boxes, None))
+
+    def read(self, timeout=None):
+        """Next frame of the pose queue, raises queue.Empty when none comes within `timeout` seconds."""
+        return self.read_marked(timeout=timeout)[0]
+
+    def read_marked(self, timeout=None):
+        """
+        Next frame of the pose queue as read gives it, and its mark: STATIC for a frame without motion, whose
+        results the writer repeats, else None
+        """
+        item = self.wait_and_get(self.pose_queue, timeout=timeout)
+        (item, mark) = (item[:7], item[7])
+        if (mark == STATIC):
+            self.static_frames += 1
+        elif (self.det_interval > 1):
+            self.propagated = (mark == PROPAGATE)
+            if self.propagated:
+                # a propagated frame comes out with its boxes and crops, as a detected one
+                return (self.propagate(item[1], item[2]), None)
+        return (item, mark)
+
+    def propagate(self, orig_img, im_name):
+        """
+        Boxes and crops of a frame between two keyframes, from the poses of the frame before it (given to
+        update_poses), expanded as PoseFlow does. The detector runs on the frame instead when a pose of the
+        frame before lost confidence.
+        """
+        with jt.no_grad():
+            if self.redetect:
+                self.propagated = False
+                (img, im_dim_list) = self.preprocess_frame(np.ascontiguousarray(orig_img[:, :, ::(- 1)]))
+                dets = self.detect(img, [orig_img], jt.float32([im_dim_list]).repeat(1, 2))
+                if (isinstance(dets, int) or (dets.shape[0] == 0)):
+                    return (None, orig_img, im_name, None, None, None, None)
+                if isinstance(dets, np.ndarray):
+                    dets = jt.array(dets)
+                (boxes, scores) = (dets[:, 1:5], dets[:, 5:6])
+                ids = (dets[:, 6:7] if self.opt.tracking else jt.zeros(scores.shape))
+            elif (self.prev_poses is None):
+                return (None, orig_img, im_name, None, None, None, None)
+            else:
+                (poses, scores, ids, _) = self.prev_poses
+                boxes = jt.array(bbox_from_pose(poses, orig_img.shape[1], orig_img.shape[0]).astype(np.float32))
+            (inps, cropped_boxes) = self.transformation.test_transform_batch(orig_img, boxes)
+        return (inps, orig_img, im_name, boxes, scores, ids, cropped_boxes)
 
-    def read(self):
-        return self.wait_and_get(self.pose_queue)
+    def update_poses(self, poses, scores=None, ids=None):
+        """
+        Poses of the frame last read, for the boxes of the frames after it until the next keyframe
+        Input: poses(ndarray,(n,K,3)): keypoints and their scores, None if there is no one
+               scores, ids: scores and ids of the boxes of the people, passed on with them
+        When the mean keypoint score of a person falls more than det_drop under its score on the frame it
+        was detected in, the detector runs on the next frame.
+        """
+        self.redetect = False
+        if ((poses is None) or (len(poses) == 0)):
+            self.prev_poses = None
+            return
+        pose_scores = poses[:, :, 2].mean(axis=1)
+        ref_scores = pose_scores
+        if self.propagated:
+            ref_scores = self.prev_poses[3]
+            # the people do not match the frame before, e.g. the tracker dropped some of them
+            self.redetect = ((len(ref_scores) != len(pose_scores)) or bool((pose_scores < (ref_scores * (1 - self.det_drop))).any()))
+        self.prev_poses = (poses, scores, ids, ref_scores)
 
     @property
     def stopped(self):
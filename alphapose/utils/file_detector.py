@@ -97,9 +97,9 @@ class FileDetectionLoader():
         if (not self.stopped):
             queue.put(item)
 
-    def wait_and_get(self, queue):
+    def wait_and_get(self, queue, timeout=None):
         if (not self.stopped):
-            return queue.get()
+            return queue.get(timeout=timeout)
 
     def get_detection(self):
         for im_name_k in self.all_imgs:
@@ -107,17 +107,21 @@ class FileDetectionLoader():
             scores = jt.array(np.array(self.all_scores[im_name_k]))
             ids = jt.array(np.array(self.all_ids[im_name_k]))
             orig_img_k = cv2.cvtColor(cv2.imread(im_name_k), cv2.COLOR_BGR2RGB)
-            inps = jt.zeros((boxes.shape[0], 3, *self._input_size))
-            cropped_boxes = jt.zeros((boxes.shape[0], 4))
-            for (i, box) in enumerate(boxes):
-                (inps[i], cropped_box) = self.transformation.test_transform(orig_img_k, box)
-                cropped_boxes[i] = jt.float32(cropped_box)
-            self.wait_and_put(self.pose_queue, (inps, orig_img_k, im_name_k, boxes, scores, ids, cropped_boxes))
-        self.wait_and_put(self.pose_queue, (None, None, None, None, None, None, None))
+            (inps, cropped_boxes) = self.transformation.test_transform_batch(orig_img_k, boxes)
+            self.wait_and_put(self.pose_queue, (inps, orig_img_k, im_name_k, boxes, scores, ids, cropped_boxes, None))
+        self.wait_and_put(self.pose_queue, (None, None, None, None, None, None, None, None))
         return
 
-    def read(self):
-        return self.wait_and_get(self.pose_queue)
+    def read(self, timeout=None):
+        """Next frame of the pose queue, raises queue.Empty when none comes within `timeout` seconds."""
+        return self.read_marked(timeout=timeout)[0]
+
+    def read_marked(self, timeout=None):
+        """Next frame of the pose queue as read gives it, and its mark, always None for detection files."""
+        item = self.wait_and_get(self.pose_queue, timeout=timeout)
+        if (item is None):
+            return (None, None)
+        return (item[:7], item[7])
 
     @property
     def stopped(self):
@@ -0,0 +1,33 @@
+import cv2
+import numpy as np
+
+
+class MotionGate():
+    """Tell the frames of a fixed camera that changed from the static ones.
+
+    Each frame is shrunk to a `width` pixels wide gray thumbnail and compared
+    with the thumbnail of the last frame that went through the gate. A pixel
+    changed when it differs by more than `pixel_thres` gray levels, and the
+    frame moves when more than `threshold` of the pixels changed. Comparing
+    with the last moving frame instead of the previous one keeps slow changes
+    (light, a person walking very slowly) from being missed.
+    """
+
+    def __init__(self, threshold, width=160, pixel_thres=16):
+        self.threshold = threshold
+        self.width = width
+        self.pixel_thres = pixel_thres
+        self.reference = None
+
+    def moving(self, frame):
+        """Whether frame (ndarray, channel BGR) changed from the last moving frame, which it then becomes."""
+        height = max(int(round(((frame.shape[0] * self.width) / frame.shape[1]))), 1)
+        thumb = cv2.cvtColor(cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        if ((self.reference is None) or (self.reference.shape != thumb.shape)):
+            self.reference = thumb
+            return True
+        changed = np.count_nonzero((cv2.absdiff(thumb, self.reference) > self.pixel_thres))
+        if (changed <= (self.threshold * thumb.size)):
+            return False
+        self.reference = thumb
+        return True
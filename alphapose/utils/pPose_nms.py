@@ -22,34 +22,61 @@ face_weight_score = 1.0
 hand_weight_dist = 1.5
 face_weight_dist = 1.0
 
+# keypoint labelling sigmas of the 17/26/133/136 keypoint layouts, the variances used by oks_iou are computed once
+OKS_SIGMAS = {136: (np.array([0.26, 0.25, 0.25, 0.35, 0.35, 0.79, 0.79, 0.72, 0.72, 0.62, 0.62, 1.07, 1.07, 0.87, 0.87, 0.89, 0.89, 0.8, 0.8, 0.8, 0.89, 0.89, 0.89, 0.89, 0.89, 0.89, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25]) / 10.0),
+              133: np.array([0.026, 0.025, 0.025, 0.035, 0.035, 0.079, 0.079, 0.072, 0.072, 0.062, 0.062, 0.107, 0.107, 0.087, 0.087, 0.089, 0.089, 0.068, 0.066, 0.066, 0.092, 0.094, 0.094, 0.042, 0.043, 0.044, 0.043, 0.04, 0.035, 0.031, 0.025, 0.02, 0.023, 0.029, 0.032, 0.037, 0.038, 0.043, 0.041, 0.045, 0.013, 0.012, 0.011, 0.011, 0.012, 0.012, 0.011, 0.011, 0.013, 0.015, 0.009, 0.007, 0.007, 0.007, 0.012, 0.009, 0.008, 0.016, 0.01, 0.017, 0.011, 0.009, 0.011, 0.009, 0.007, 0.013, 0.008, 0.011, 0.012, 0.01, 0.034, 0.008, 0.008, 0.009, 0.008, 0.008, 0.007, 0.01, 0.008, 0.009, 0.009, 0.009, 0.007, 0.007, 0.008, 0.011, 0.008, 0.008, 0.008, 0.01, 0.008, 0.029, 0.022, 0.035, 0.037, 0.047, 0.026, 0.025, 0.024, 0.035, 0.018, 0.024, 0.022, 0.026, 0.017, 0.021, 0.021, 0.032, 0.02, 0.019, 0.022, 0.031, 0.029, 0.022, 0.035, 0.037, 0.047, 0.026, 0.025, 0.024, 0.035, 0.018, 0.024, 0.022, 0.026, 0.017, 0.021, 0.021, 0.032, 0.02, 0.019, 0.022, 0.031]),
+              26: (np.array([0.26, 0.25, 0.25, 0.35, 0.35, 0.79, 0.79, 0.72, 0.72, 0.62, 0.62, 1.07, 1.07, 0.87, 0.87, 0.89, 0.89, 0.8, 0.8, 0.8, 0.89, 0.89, 0.89, 0.89, 0.89, 0.89]) / 10.0),
+              17: (np.array([0.26, 0.25, 0.25, 0.35, 0.35, 0.79, 0.79, 0.72, 0.72, 0.62, 0.62, 1.07, 1.07, 0.87, 0.87, 0.89, 0.89]) / 10.0)}
+OKS_VARS = {num_joints: ((sigmas * 2) ** 2) for (num_joints, sigmas) in OKS_SIGMAS.items()}
+
 def oks_pose_nms(data, soft=False):
-    kpts = defaultdict(list)
+    if (len(data) == 0):
+        return []
+    # group the results by image, in the order the images first appear
+    (_, first, inverse) = np.unique([item['image_id'] for item in data], return_index=True, return_inverse=True)
+    group_rank = np.empty(len(first), dtype=np.intp)
+    group_rank[np.argsort(first, kind='stable')] = np.arange(len(first))
+    order = np.argsort(group_rank[inverse.reshape((- 1))], kind='stable')
+    bounds = np.cumsum(np.bincount(group_rank[inverse.reshape((- 1))]))
+    items = [data[i] for i in order]
+    kpts = np.array([item['keypoints'] for item in items]).reshape(len(items), (- 1))
+    areas = np.array([item['area'] for item in items])
+    box_scores = np.array([item['score'] for item in items])
+    kpt_scores = kpts[:, 2::3]
+    visible = (kpt_scores > vis_thr)
+    valid_num = visible.sum(axis=1)
+    # cumsum adds the visible keypoint scores one after the other, as a running sum would
+    kpt_score = np.cumsum(np.where(visible, kpt_scores, 0), axis=1)[:, (- 1)]
+    kpt_score = np.where((valid_num != 0), (kpt_score / np.maximum(valid_num, 1)), kpt_score)
+    scores = (kpt_score * box_scores)
+    for (item, score) in zip(items, scores):
+        item['score'] = score
+    starts = np.concatenate([[0], bounds[:(- 1)]])
+    if soft:
+        keeps = [_soft_oks_nms(scores[start:end], kpts[start:end], areas[start:end], oks_thr) for (start, end) in zip(starts, bounds)]
+    else:
+        # the oks ious of all the images are computed together
+        orders = [scores[start:end].argsort()[::(- 1)] for (start, end) in zip(starts, bounds)]
+        triu = {n: np.triu_indices(n, 1) for n in set((len(order) for order in orders))}
+        first = np.concatenate([(start + order[triu[len(order)][0]]) for (start, order) in zip(starts, orders)])
+        second = np.concatenate([(start + order[triu[len(order)][1]]) for (start, order) in zip(starts, orders)])
+        kpt_boxes = np.stack([kpts[:, 0::3].min(axis=1), kpts[:, 1::3].min(axis=1), kpts[:, 0::3].max(axis=1), kpts[:, 1::3].max(axis=1)], axis=1)
+        vars = OKS_VARS.get((kpts.shape[1] // 3), OKS_VARS[17])
+        # the other pairs are too far apart to reach oks_thr, only the comparison with it is used so their ious are left at 0
+        oks_ious = np.zeros(len(first))
+        candidates = np.flatnonzero((oks_iou_bound(kpt_boxes[first], kpt_boxes[second], areas[first], areas[second], vars) > (oks_thr * 0.99)))
+        chunk = max(1, ((1 << 20) // kpts.shape[1]))
+        for i in range(0, len(candidates), chunk):
+            pairs = candidates[i:(i + chunk)]
+            oks_ious[pairs] = oks_iou_pairs(kpts[first[pairs]], kpts[second[pairs]], areas[first[pairs]], areas[second[pairs]])
+        offsets = np.cumsum([0] + [len(triu[len(order)][0]) for order in orders])
+        keeps = [_oks_nms_sorted(order, *triu[len(order)], oks_ious[offsets[k]:offsets[(k + 1)]], oks_thr) for (k, order) in enumerate(orders)]
     post_data = []
-    for item in data:
-        img_id = item['image_id']
-        kpts[img_id].append(item)
-    for (img_id, img_res) in kpts.items():
-        for n_p in img_res:
-            box_score = n_p['score']
-            kpt_score = 0
-            valid_num = 0
-            kpt = np.array(n_p['keypoints']).reshape((- 1), 3)
-            for n_np in range(kpt.shape[0]):
-                t_s = kpt[n_np][2]
-                if (t_s > vis_thr):
-                    kpt_score += t_s
-                    valid_num += 1
-            if (valid_num != 0):
-                kpt_score = (kpt_score / valid_num)
-            n_p['score'] = (kpt_score * box_score)
-        if soft:
-            keep = soft_oks_nms([img_res[i] for i in range(len(img_res))], oks_thr)
-        else:
-            keep = oks_nms([img_res[i] for i in range(len(img_res))], oks_thr)
+    for (start, end, keep) in zip(starts, bounds, keeps):
         if (len(keep) == 0):
-            post_data += img_res
+            post_data += items[start:end]
         else:
-            post_data += [img_res[_keep] for _keep in keep]
+            post_data += [items[(start + _keep)] for _keep in keep]
     return post_data
 
 def oks_nms(kpts_db, thr, sigmas=None, vis_thr=None):
@@ -59,14 +86,25 @@ def oks_nms(kpts_db, thr, sigmas=None, vis_thr=None):
     scores = np.array([k['score'] for k in kpts_db])
     kpts = np.array([k['keypoints'] for k in kpts_db])
     areas = np.array([k['area'] for k in kpts_db])
+    return _oks_nms(scores, kpts, areas, thr, sigmas, vis_thr)
+
+def _oks_nms(scores, kpts, areas, thr, sigmas=None, vis_thr=None):
     order = scores.argsort()[::(- 1)]
+    (rows, cols) = np.triu_indices(len(order), 1)
+    oks_ious = oks_iou_pairs(kpts[order[rows]], kpts[order[cols]], areas[order[rows]], areas[order[cols]], sigmas, vis_thr)
+    return _oks_nms_sorted(order, rows, cols, oks_ious, thr)
+
+def _oks_nms_sorted(order, rows, cols, oks_ious, thr):
+    'Greedy OKS NMS from the ious of the pairs (rows, cols), rows < cols, of positions in the descending score order.'
+    # only the ious of a pose with the poses after it in the order are looked at
+    oks_ovr = np.zeros((len(order), len(order)))
+    oks_ovr[(rows, cols)] = oks_ious
     keep = []
-    while (len(order) > 0):
-        i = order[0]
-        keep.append(i)
-        oks_ovr = oks_iou(kpts[i], kpts[order[1:]], areas[i], areas[order[1:]], sigmas, vis_thr)
-        inds = np.where((oks_ovr <= thr))[0]
-        order = order[(inds + 1)]
+    remaining = np.arange(len(order))
+    while (len(remaining) > 0):
+        i = remaining[0]
+        keep.append(order[i])
+        remaining = remaining[1:][(oks_ovr[(i, remaining[1:])] <= thr)]
     keep = np.array(keep)
     return keep
 
@@ -77,6 +115,9 @@ def soft_oks_nms(kpts_db, thr, max_dets=20, sigmas=None, vis_thr=None):
     scores = np.array([k['score'] for k in kpts_db])
     kpts = np.array([k['keypoints'].flatten() for k in kpts_db])
     areas = np.array([k['area'] for k in kpts_db])
+    return _soft_oks_nms(scores, kpts, areas, thr, max_dets, sigmas, vis_thr)
+
+def _soft_oks_nms(scores, kpts, areas, thr, max_dets=20, sigmas=None, vis_thr=None):
     order = scores.argsort()[::(- 1)]
     scores = scores[order]
     keep = np.zeros(max_dets, dtype=np.intp)
@@ -96,32 +137,45 @@ def soft_oks_nms(kpts_db, thr, max_dets=20, sigmas=None, vis_thr=None):
 
 def oks_iou(g, d, a_g, a_d, sigmas=None, vis_thr=None):
     'Calculate oks ious.\n    Args:\n        g: Ground truth keypoints.\n        d: Detected keypoints.\n        a_g: Area of the ground truth object.\n        a_d: Area of the detected object.\n        sigmas: standard deviation of keypoint labelling.\n        vis_thr: threshold of the keypoint visibility.\n    Returns:\n        list: The oks ious.\n    '
+    return oks_iou_matrix(np.asarray(g)[None], d, np.array([a_g]), a_d, sigmas, vis_thr)[0]
+
+def oks_iou_matrix(g, d, a_g, a_d, sigmas=None, vis_thr=None):
+    'Calculate the oks ious of every pair of poses.\n    Args:\n        g: Ground truth keypoints (m, 3 * num_joints).\n        d: Detected keypoints (n, 3 * num_joints).\n        a_g: Areas of the ground truth objects (m,).\n        a_d: Areas of the detected objects (n,).\n        sigmas: standard deviation of keypoint labelling.\n        vis_thr: threshold of the keypoint visibility.\n    Returns:\n        np.ndarray: The oks ious (m, n).\n    '
+    g = np.asarray(g).reshape(len(g), (- 1))
+    d = np.asarray(d).reshape(len(d), g.shape[1])
+    return oks_iou_pairs(g[:, None], d[None], np.asarray(a_g)[:, None], np.asarray(a_d)[None], sigmas, vis_thr)
+
+def oks_iou_pairs(g, d, a_g, a_d, sigmas=None, vis_thr=None):
+    'Calculate the oks ious of pairs of poses, broadcast together.\n    Args:\n        g: Ground truth keypoints (..., 3 * num_joints).\n        d: Detected keypoints (..., 3 * num_joints).\n        a_g: Areas of the ground truth objects (...).\n        a_d: Areas of the detected objects (...).\n        sigmas: standard deviation of keypoint labelling.\n        vis_thr: threshold of the keypoint visibility.\n    Returns:\n        np.ndarray: The oks ious (...).\n    '
     if (sigmas is None):
-        if (len(g) == 408):
-            sigmas = (np.array([0.26, 0.25, 0.25, 0.35, 0.35, 0.79, 0.79, 0.72, 0.72, 0.62, 0.62, 1.07, 1.07, 0.87, 0.87, 0.89, 0.89, 0.8, 0.8, 0.8, 0.89, 0.89, 0.89, 0.89, 0.89, 0.89, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25]) / 10.0)
-        elif (len(g) == 399):
-            sigmas = np.array([0.026, 0.025, 0.025, 0.035, 0.035, 0.079, 0.079, 0.072, 0.072, 0.062, 0.062, 0.107, 0.107, 0.087, 0.087, 0.089, 0.089, 0.068, 0.066, 0.066, 0.092, 0.094, 0.094, 0.042, 0.043, 0.044, 0.043, 0.04, 0.035, 0.031, 0.025, 0.02, 0.023, 0.029, 0.032, 0.037, 0.038, 0.043, 0.041, 0.045, 0.013, 0.012, 0.011, 0.011, 0.012, 0.012, 0.011, 0.011, 0.013, 0.015, 0.009, 0.007, 0.007, 0.007, 0.012, 0.009, 0.008, 0.016, 0.01, 0.017, 0.011, 0.009, 0.011, 0.009, 0.007, 0.013, 0.008, 0.011, 0.012, 0.01, 0.034, 0.008, 0.008, 0.009, 0.008, 0.008, 0.007, 0.01, 0.008, 0.009, 0.009, 0.009, 0.007, 0.007, 0.008, 0.011, 0.008, 0.008, 0.008, 0.01, 0.008, 0.029, 0.022, 0.035, 0.037, 0.047, 0.026, 0.025, 0.024, 0.035, 0.018, 0.024, 0.022, 0.026, 0.017, 0.021, 0.021, 0.032, 0.02, 0.019, 0.022, 0.031, 0.029, 0.022, 0.035, 0.037, 0.047, 0.026, 0.025, 0.024, 0.035, 0.018, 0.024, 0.022, 0.026, 0.017, 0.021, 0.021, 0.032, 0.02, 0.019, 0.022, 0.031])
-        elif (len(g) == 78):
-            sigmas = (np.array([0.26, 0.25, 0.25, 0.35, 0.35, 0.79, 0.79, 0.72, 0.72, 0.62, 0.62, 1.07, 1.07, 0.87, 0.87, 0.89, 0.89, 0.8, 0.8, 0.8, 0.89, 0.89, 0.89, 0.89, 0.89, 0.89]) / 10.0)
-        else:
-            sigmas = (np.array([0.26, 0.25, 0.25, 0.35, 0.35, 0.79, 0.79, 0.72, 0.72, 0.62, 0.62, 1.07, 1.07, 0.87, 0.87, 0.89, 0.89]) / 10.0)
-    vars = ((sigmas * 2) ** 2)
-    xg = g[0::3]
-    yg = g[1::3]
-    vg = g[2::3]
-    ious = np.zeros(len(d))
-    for n_d in range(0, len(d)):
-        xd = d[n_d, 0::3]
-        yd = d[n_d, 1::3]
-        vd = d[n_d, 2::3]
-        dx = (xd - xg)
-        dy = (yd - yg)
-        e = (((((dx ** 2) + (dy ** 2)) / vars) / (((a_g + a_d[n_d]) / 2) + np.spacing(1))) / 2)
-        if (vis_thr is not None):
-            ind = (list((vg > vis_thr)) and list((vd > vis_thr)))
-            e = e[ind]
-        ious[n_d] = ((np.sum(np.exp((- e))) / len(e)) if (len(e) != 0) else 0.0)
-    return ious
+        vars = OKS_VARS.get((g.shape[(- 1)] // 3), OKS_VARS[17])
+    else:
+        vars = ((sigmas * 2) ** 2)
+    dx = (d[..., 0::3] - g[..., 0::3])
+    dy = (d[..., 1::3] - g[..., 1::3])
+    e = (((((dx ** 2) + (dy ** 2)) / vars) / ((((a_g + a_d) / 2) + np.spacing(1))[..., None])) / 2)
+    # exp(-e) is 0 from e = 745.2 on, but np.exp takes its slow underflow path to get there
+    exp_e = np.zeros(e.shape)
+    computed = (e < 746)
+    exp_e[computed] = np.exp((- e[computed]))
+    if (vis_thr is not None):
+        # the former `list(vg > vis_thr) and list(vd > vis_thr)` evaluated to the visibility of the detections only
+        vd = np.broadcast_to((d[..., 2::3] > vis_thr), e.shape)
+        num_visible = vd.sum(axis=(- 1))
+        ious = np.zeros(e.shape[:(- 1)])
+        for index in zip(*np.nonzero(num_visible)):
+            ious[index] = (np.sum(exp_e[index][vd[index]]) / num_visible[index])
+        return ious
+    if (e.shape[(- 1)] == 0):
+        return np.zeros(e.shape[:(- 1)])
+    return (np.sum(exp_e, axis=(- 1)) / e.shape[(- 1)])
+
+def oks_iou_bound(box_g, box_d, a_g, a_d, vars):
+    'Upper bound of the oks ious of pairs of poses, from the gap between the boxes of their keypoints.\n    Args:\n        box_g: Boxes of the ground truth keypoints (..., 4), x_min, y_min, x_max, y_max.\n        box_d: Boxes of the detected keypoints (..., 4).\n        a_g: Area of the ground truth objects (...).\n        a_d: Area of the detected objects (...).\n        vars: keypoint variances of oks_iou.\n    Returns:\n        np.ndarray: The bounds (...).\n    '
+    # every keypoint of g is at least as far from the same keypoint of d as the boxes are from each other
+    gap_x = np.maximum(0, np.maximum((box_d[..., 0] - box_g[..., 2]), (box_g[..., 0] - box_d[..., 2])))
+    gap_y = np.maximum(0, np.maximum((box_d[..., 1] - box_g[..., 3]), (box_g[..., 1] - box_d[..., 3])))
+    return np.exp(((- ((gap_x ** 2) + (gap_y ** 2))) / ((np.max(vars) * (((a_g + a_d) / 2) + np.spacing(1))) * 2)))
 
 def _rescore(overlap, scores, thr, type='gaussian'):
     "Rescoring mechanism gaussian or linear.\n    Args:\n        overlap: calculated ious\n        scores: target scores.\n        thr: retain oks overlap < thr.\n        type: 'gaussian' or 'linear'\n    Returns:\n        np.ndarray: indexes to keep\n    "
@@ -145,9 +199,9 @@ def pose_nms(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores, areaThres=0
             scoreThreds = 0.01
             matchThreds = 3.0
             alpha = 0.15
-        return pose_nms_fullbody(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores, areaThres)
+        return pose_nms_fullbody_matrix(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores, areaThres)
     else:
-        return pose_nms_body(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores, areaThres)
+        return pose_nms_body_matrix(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores, areaThres)
 
 def pose_nms_body(bboxes: np.ndarray,
                   bbox_scores: np.ndarray,
@@ -311,6 +365,131 @@ def pose_nms_fullbody(bboxes: np.ndarray,
         res_pick_ids.append(pick[j])
     return (res_bboxes, res_bbox_scores, res_bbox_ids, res_pose_preds, res_pose_scores, res_pick_ids)
 
+def pose_nms_body_matrix(bboxes: np.ndarray,
+                         bbox_scores: np.ndarray,
+                         bbox_ids: np.ndarray,
+                         pose_preds: np.ndarray,
+                         pose_scores: np.ndarray,
+                         areaThres=0):
+    '\n    Same result as pose_nms_body, but the parametric distances and PCK matches of all pairs\n    are computed once, and the clusters are merged together\n    '
+    pose_scores[(pose_scores == 0)] = 1e-05
+    ref_dists = (alpha * np.maximum((bboxes[:, 2] - bboxes[:, 0]), (bboxes[:, 3] - bboxes[:, 1])))
+    tanh_scores = np.tanh((pose_scores[:, :, 0] / delta1))
+    match_dists = np.minimum(ref_dists, 7).astype(pose_preds.dtype)
+
+    def delete_pairs(dist, i, j):
+        simi = parametric_distance_matrix(dist, tanh_scores[i], tanh_scores[j])
+        ratio = (dist / match_dists[i][..., None])
+        num_match_keypoints = np.sum((ratio <= 1), axis=(- 1))
+        uncertain = (_near(simi, gamma) | (_near(dist, 1) | _near(ratio, 1)).any(axis=(- 1)))
+        return ((((simi > gamma) | (num_match_keypoints >= matchThreds)),), uncertain)
+    (delete_matrix,) = _pairwise_matrix(pose_preds, delete_pairs)
+    (pick, merge_ids) = _greedy_pick(pose_scores.mean(axis=1), (lambda pick_id, ids: delete_matrix[(pick_id, ids)]))
+    return _merge_picks(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores, ref_dists, pick, merge_ids, areaThres)
+
+def pose_nms_fullbody_matrix(bboxes: np.ndarray,
+                             bbox_scores: np.ndarray,
+                             bbox_ids: np.ndarray,
+                             pose_preds: np.ndarray,
+                             pose_scores: np.ndarray,
+                             areaThres=0):
+    '\n    Same result as pose_nms_fullbody, see pose_nms_body_matrix\n    '
+    pose_scores[(pose_scores == 0)] = 1e-05
+    kp_nums = pose_preds.shape[1]
+    ref_dists = (alpha * np.maximum((bboxes[:, 2] - bboxes[:, 0]), (bboxes[:, 3] - bboxes[:, 1])))
+    tanh_scores = np.tanh((pose_scores[:, :, 0] / delta1))
+    dist_masks = (pose_scores[:, :, 0] < scoreThreds)
+    match_dists = np.minimum(ref_dists, 7).astype(pose_preds.dtype)
+    num_valid = np.sum((pose_scores[:, :, 0] > (scoreThreds / 2)), axis=1)
+
+    def delete_pairs(dist, i, j):
+        simi = parametric_distance_matrix(dist, tanh_scores[i], tanh_scores[j], dist_masks[j])
+        ratio = (dist / match_dists[i][..., None])
+        num_match_keypoints = ((np.sum((ratio[..., :26] <= 1), axis=(- 1)) + np.sum((ratio[..., 26:94] <= face_factor), axis=(- 1))) + np.sum((ratio[..., 94:] <= hand_factor), axis=(- 1)))
+        uncertain = (_near(simi, gamma) | (((_near(dist, 1).any(axis=(- 1)) | _near(ratio[..., :26], 1).any(axis=(- 1))) | _near(ratio[..., 26:94], face_factor).any(axis=(- 1))) | _near(ratio[..., 94:], hand_factor).any(axis=(- 1))))
+        return (((simi > gamma), num_match_keypoints), uncertain)
+    (simi_delete, match_counts) = _pairwise_matrix(pose_preds, delete_pairs)
+
+    def delete_row(pick_id, ids):
+        # as in PCK_match_fullbody, the number of matches is normalized by the size of the remaining set
+        mask_sum = np.float32(((len(ids) * num_valid[pick_id]) * 2))
+        if (mask_sum < 2):
+            num_match_keypoints = np.zeros(len(ids))
+        else:
+            num_match_keypoints = (((match_counts[(pick_id, ids)] / mask_sum) / 2) * kp_nums)
+        return (simi_delete[(pick_id, ids)] | (num_match_keypoints >= matchThreds))
+    (pick, merge_ids) = _greedy_pick(pose_scores.mean(axis=1), delete_row)
+    return _merge_picks(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores, ref_dists, pick, merge_ids, areaThres)
+
+def _near(values, threshold, tolerance=1e-04):
+    return (np.abs((values - threshold)) <= (tolerance * threshold))
+
+def _pairwise_matrix(pose_preds, pair_func, max_elements=(1 << 22)):
+    '\n    Evaluate pair_func(dist, i, j) -> (values, uncertain) for all the pairs of poses, by blocks of rows\n    The keypoint distances are first computed with the fast product. The pairs that pair_func flags\n    as uncertain, close to a threshold, are evaluated again with the distances of the loop versions,\n    so that the values are the same as theirs\n    '
+    (nsamples, kp_nums) = pose_preds.shape[:2]
+    block = max(1, (max_elements // max(1, ((nsamples * kp_nums) * 2))))
+    cols = np.arange(nsamples)[None]
+    blocks = []
+    for start in range(0, nsamples, block):
+        rows = np.arange(start, min((start + block), nsamples))[:, None]
+        (values, uncertain) = pair_func(pairwise_pose_distance(pose_preds[rows[:, 0]], pose_preds, exact=False), rows, cols)
+        (i, j) = np.nonzero(uncertain)
+        if (len(i) > 0):
+            exact_values = pair_func(keypoint_distance((pose_preds[(start + i)] - pose_preds[j])), (start + i), j)[0]
+            for (value, exact_value) in zip(values, exact_values):
+                value[(i, j)] = exact_value
+        blocks.append(values)
+    return [np.concatenate(value) for value in zip(*blocks)]
+
+def _greedy_pick(human_scores, delete_row):
+    '\n    Greedy selection of pose_nms_body over precomputed matrices\n    human_scores:   mean keypoint score of every pose      -- [n, 1]\n    delete_row:     (pick_id, remaining ids) -> bool array, poses removed by the pick\n    '
+    mask = np.ones(human_scores.shape[0], dtype=bool)
+    pick = []
+    merge_ids = []
+    while mask.any():
+        ids = np.flatnonzero(mask)
+        pick_id = ids[np.argmax(human_scores[ids], axis=0).item()]
+        delete_ids = ids[delete_row(pick_id, ids)]
+        if (delete_ids.shape[0] == 0):
+            # the loop version then merges the pick with itself only, given as a scalar index
+            delete_ids = pick_id
+        pick.append(pick_id.item())
+        merge_ids.append(delete_ids)
+        mask[delete_ids] = False
+    return (pick, merge_ids)
+
+def _merge_picks(bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores, ref_dists, pick, merge_ids, areaThres):
+    (res_bboxes, res_bbox_scores, res_bbox_ids, res_pose_preds, res_pose_scores, res_pick_ids) = ([], [], [], [], [], [])
+    kp_nums = pose_preds.shape[1]
+    ids = np.arange(kp_nums)
+    valid = [j for j in range(len(pick)) if (np.max(pose_scores[(pick[j], ids, 0)]) >= scoreThreds)]
+    if (len(valid) == 0):
+        return (res_bboxes, res_bbox_scores, res_bbox_ids, res_pose_preds, res_pose_scores, res_pick_ids)
+    clusters = [np.atleast_1d(merge_ids[j]) for j in valid]
+    cluster_masks = (np.arange(max((len(c) for c in clusters)))[None] < np.array([len(c) for c in clusters])[:, None])
+    cluster_ids = np.zeros(cluster_masks.shape, dtype=np.int64)
+    cluster_ids[cluster_masks] = np.concatenate(clusters)
+    valid_pick = [pick[j] for j in valid]
+    (merge_poses, merge_scores) = p_merge_fast_batch(pose_preds[valid_pick], pose_preds[cluster_ids], pose_scores[cluster_ids], cluster_masks, ref_dists[valid_pick])
+    for (k, j) in enumerate(valid):
+        (merge_pose, merge_score) = (merge_poses[k], merge_scores[k])
+        max_score = np.max(merge_score[ids])
+        if (max_score < scoreThreds):
+            continue
+        xmax = max(merge_pose[:, 0])
+        xmin = min(merge_pose[:, 0])
+        ymax = max(merge_pose[:, 1])
+        ymin = min(merge_pose[:, 1])
+        if ((((1.5 ** 2) * (xmax - xmin)) * (ymax - ymin)) < areaThres):
+            continue
+        res_bboxes.append(bboxes[pick[j]].tolist())
+        res_bbox_scores.append(bbox_scores[pick[j]])
+        res_bbox_ids.append(bbox_ids[merge_ids[j]].tolist())
+        res_pose_preds.append(merge_pose)
+        res_pose_scores.append(merge_score)
+        res_pick_ids.append(pick[j])
+    return (res_bboxes, res_bbox_scores, res_bbox_ids, res_pose_preds, res_pose_scores, res_pick_ids)
+
 def filter_result(args):
     (score_pick, merge_id, pred_pick, pick, bbox_score_pick) = args
     global ori_pose_preds, ori_pose_scores, ref_dists
@@ -375,6 +554,50 @@ def p_merge_fast(ref_pose: np.ndarray,
     final_score = (masked_scores * normed_scores).sum(axis=0)
     return (final_pose, final_score)
 
+def p_merge_fast_batch(ref_poses: np.ndarray,
+                       cluster_preds: np.ndarray,
+                       cluster_scores: np.ndarray,
+                       cluster_masks: np.ndarray,
+                       ref_dists: np.ndarray):
+    '\n    p_merge_fast for several clusters at once, padded to the largest cluster\n    INPUT:\n        ref_poses:      reference poses         -- [m, kp_num, 2]\n        cluster_preds:  redundant poses         -- [m, n, kp_num, 2]\n        cluster_scores: redundant poses score   -- [m, n, kp_num, 1]\n        cluster_masks:  False for the padding   -- [m, n]\n        ref_dists:      reference scales        -- [m]\n    OUTPUT:\n        final_poses:    merged poses            -- [m, kp_num, 2]\n        final_scores:   merged scores           -- [m, kp_num, 1]\n    '
+    dist = pairwise_pose_distance(ref_poses, cluster_preds)
+    mask = ((dist <= np.minimum(ref_dists, 15).astype(dist.dtype)[:, None, None]) & cluster_masks[:, :, None])
+    masked_scores = (cluster_scores * mask[..., None])
+    # the padding is at the end of each cluster and only adds zeros to the sums
+    normed_scores = (masked_scores / np.sum(masked_scores, axis=1, keepdims=True))
+    final_poses = (cluster_preds * normed_scores.repeat(2, 3)).sum(axis=1)
+    final_scores = (masked_scores * normed_scores).sum(axis=1)
+    return (final_poses, final_scores)
+
+def keypoint_distance(diff: np.ndarray, exact: bool=True) -> np.ndarray:
+    '\n    Norm of keypoint offsets [..., 2]. With exact, squares with np.power like the loop versions, bit for bit;\n    otherwise with a product, a few ulp away and much faster\n    '
+    square = (np.power(diff, 2) if exact else (diff * diff))
+    return np.sqrt((square[..., 0] + square[..., 1]))
+
+def pairwise_pose_distance(pick_preds: np.ndarray, all_preds: np.ndarray, exact: bool=True) -> np.ndarray:
+    '\n    Keypoint distances between every pose of pick_preds [m, kp_num, 2] and of all_preds [n, kp_num, 2]\n    (or their own poses [m, n, kp_num, 2]) -- [m, n, kp_num]\n    '
+    diff = (pick_preds[:, None] - (all_preds[None] if (all_preds.ndim == 3) else all_preds))
+    return keypoint_distance(diff, exact)
+
+def parametric_distance_matrix(dist: np.ndarray,
+                               pick_tanh_scores: np.ndarray,
+                               tanh_scores: np.ndarray,
+                               dist_mask: np.ndarray=None) -> np.ndarray:
+    '\n    get_parametric_distance over the last axis, from keypoint distances and tanh(scores / delta1)\n    of the picked and compared poses, all broadcast together -- [..., kp_num] -> [...]\n    dist_mask:  keypoint scores of the compared poses below scoreThreds, for the fullbody version\n    '
+    mask = (dist <= 1)
+    if (dist_mask is not None):
+        mask &= dist_mask
+    score_dists = np.where(mask, (pick_tanh_scores * tanh_scores).astype(np.float64), 0)
+    point_dist = np.exp((((- 1) * dist) / delta2))
+    if (dist_mask is not None):
+        point_dist[..., (- 110):(- 42)] = np.exp((((- 1) * dist[..., (- 110):(- 42)]) / (delta2 * face_factor)))
+        point_dist[..., (- 42):] = np.exp((((- 1) * dist[..., (- 42):]) / (delta2 * hand_factor)))
+        point_dist *= (~ dist_mask)
+        final_dist = (((np.mean(score_dists[..., :(- 110)], axis=(- 1)) + (np.mean(score_dists[..., (- 110):(- 42)], axis=(- 1)) * face_weight_score)) + (np.mean(score_dists[..., (- 42):], axis=(- 1)) * hand_weight_score)) + (mu * ((np.mean(point_dist[..., :(- 110)], axis=(- 1)) + (np.mean(point_dist[..., (- 110):(- 42)], axis=(- 1)) * face_weight_dist)) + (np.mean(point_dist[..., (- 42):], axis=(- 1)) * hand_weight_dist))))
+    else:
+        final_dist = (np.sum(score_dists, axis=(- 1)) + (mu * np.sum(point_dist, axis=(- 1))))
+    return final_dist
+
 def get_parametric_distance(i: int,
                             all_preds: np.ndarray,
                             keypoint_scores: np.ndarray,
@@ -416,7 +639,7 @@ def PCK_match(pick_pred: np.ndarray,
 
 def PCK_match_fullbody(pick_pred, pred_score, all_preds, ref_dist):
     kp_nums = pred_score.shape[0]
-    mask = (pred_score.reshape((1, kp_nums, 1)).repeat(all_preds.shape[0], 1, 2) > (scoreThreds / 2)).float()
+    mask = (np.tile(pred_score.reshape((1, kp_nums, 1)), (all_preds.shape[0], 1, 2)) > (scoreThreds / 2)).astype(np.float32)
     if (mask.sum() < 2):
         return np.zeros(all_preds.shape[0])
     dist = np.sqrt(np.sum(np.power(pick_pred[np.newaxis, :] - all_preds, 2), axis=2))
@@ -429,76 +652,61 @@ def PCK_match_fullbody(pick_pred, pred_score, all_preds, ref_dist):
 
 def write_json(all_results, outputpath, form=None, for_eval=False, outputfile='alphapose-results.json'):
     '\n    all_result: result dict of predictions\n    outputpath: output directory\n    '
-    json_results = []
-    json_results_cmu = {}
-    for im_res in all_results:
-        im_name = im_res['imgname']
-        for human in im_res['result']:
-            keypoints = []
-            result = {}
-            if for_eval:
-                result['image_id'] = int(os.path.basename(im_name).split('.')[0].split('_')[(- 1)])
-            else:
-                result['image_id'] = os.path.basename(im_name)
-            result['category_id'] = 1
-            kp_preds = human['keypoints']
-            kp_scores = human['kp_score']
-            pro_scores = human['proposal_score']
-            for n in range(kp_scores.shape[0]):
-                keypoints.append(float(kp_preds[(n, 0)]))
-                keypoints.append(float(kp_preds[(n, 1)]))
-                keypoints.append(float(kp_scores[n]))
-            result['keypoints'] = keypoints
-            result['score'] = float(pro_scores)
-            if ('box' in human.keys()):
-                result['box'] = human['box']
-            if ('idx' in human.keys()):
-                result['idx'] = human['idx']
-            if ('pred_xyz_nps' in human.keys()):
-                pred_xyz_nps = human['pred_xyz_nps']
-                pred_xyz_nps = pred_xyz_nps.numpy().tolist()
-                result['pred_xyz_nps'] = pred_xyz_nps
-            if (form == 'cmu'):
-                if (result['image_id'] not in json_results_cmu.keys()):
-                    json_results_cmu[result['image_id']] = {}
-                    json_results_cmu[result['image_id']]['version'] = 'AlphaPose v0.3'
-                    json_results_cmu[result['image_id']]['bodies'] = []
-                tmp = {'joints': []}
-                result['keypoints'].append(((result['keypoints'][15] + result['keypoints'][18]) / 2))
-                result['keypoints'].append(((result['keypoints'][16] + result['keypoints'][19]) / 2))
-                result['keypoints'].append(((result['keypoints'][17] + result['keypoints'][20]) / 2))
-                indexarr = [0, 51, 18, 24, 30, 15, 21, 27, 36, 42, 48, 33, 39, 45, 6, 3, 12, 9]
-                for i in indexarr:
-                    tmp['joints'].append(result['keypoints'][i])
-                    tmp['joints'].append(result['keypoints'][(i + 1)])
-                    tmp['joints'].append(result['keypoints'][(i + 2)])
-                json_results_cmu[result['image_id']]['bodies'].append(tmp)
-            elif (form == 'open'):
-                if (result['image_id'] not in json_results_cmu.keys()):
-                    json_results_cmu[result['image_id']] = {}
-                    json_results_cmu[result['image_id']]['version'] = 'AlphaPose v0.3'
-                    json_results_cmu[result['image_id']]['people'] = []
-                tmp = {'pose_keypoints_2d': []}
-                result['keypoints'].append(((result['keypoints'][15] + result['keypoints'][18]) / 2))
-                result['keypoints'].append(((result['keypoints'][16] + result['keypoints'][19]) / 2))
-                result['keypoints'].append(((result['keypoints'][17] + result['keypoints'][20]) / 2))
-                indexarr = [0, 51, 18, 24, 30, 15, 21, 27, 36, 42, 48, 33, 39, 45, 6, 3, 12, 9]
-                for i in indexarr:
-                    tmp['pose_keypoints_2d'].append(result['keypoints'][i])
-                    tmp['pose_keypoints_2d'].append(result['keypoints'][(i + 1)])
-                    tmp['pose_keypoints_2d'].append(result['keypoints'][(i + 2)])
-                json_results_cmu[result['image_id']]['people'].append(tmp)
-            else:
-                json_results.append(result)
-    if (form == 'cmu'):
-        with open(os.path.join(outputpath, outputfile), 'w') as json_file:
-            json_file.write(json.dumps(json_results_cmu))
-            if (not os.path.exists(os.path.join(outputpath, 'sep-json'))):
-                os.mkdir(os.path.join(outputpath, 'sep-json'))
-            for name in json_results_cmu.keys():
-                with open(os.path.join(outputpath, 'sep-json', (name.split('.')[0] + '.json')), 'w') as json_file:
-                    json_file.write(json.dumps(json_results_cmu[name]))
-    elif (form == 'open'):
+    records = (result for im_res in all_results for result in json_records(im_res, for_eval=for_eval))
+    write_json_records(records, outputpath, form=form, outputfile=outputfile)
+
+def json_records(im_res, for_eval=False):
+    '\n    Convert the result dict of one image into coco style json records\n    im_res: result dict of one image, {"imgname": ..., "result": [...]}\n    '
+    records = []
+    im_name = im_res['imgname']
+    for human in im_res['result']:
+        keypoints = []
+        result = {}
+        if for_eval:
+            result['image_id'] = int(os.path.basename(im_name).split('.')[0].split('_')[(- 1)])
+        else:
+            result['image_id'] = os.path.basename(im_name)
+        result['category_id'] = 1
+        kp_preds = human['keypoints']
+        kp_scores = human['kp_score']
+        pro_scores = human['proposal_score']
+        for n in range(kp_scores.shape[0]):
+            keypoints.append(float(kp_preds[(n, 0)]))
+            keypoints.append(float(kp_preds[(n, 1)]))
+            keypoints.append(float(kp_scores[n]))
+        result['keypoints'] = keypoints
+        result['score'] = float(pro_scores)
+        if ('box' in human.keys()):
+            result['box'] = human['box']
+        if ('idx' in human.keys()):
+            result['idx'] = human['idx']
+        if ('pred_xyz_nps' in human.keys()):
+            pred_xyz_nps = human['pred_xyz_nps']
+            pred_xyz_nps = pred_xyz_nps.numpy().tolist()
+            result['pred_xyz_nps'] = pred_xyz_nps
+        records.append(result)
+    return records
+
+def write_json_records(records, outputpath, form=None, outputfile='alphapose-results.json'):
+    '\n    records: iterable of json records given by json_records\n    outputpath: output directory\n    '
+    if (form in ('cmu', 'open')):
+        (part_key, joints_key) = (('bodies', 'joints') if (form == 'cmu') else ('people', 'pose_keypoints_2d'))
+        json_results_cmu = {}
+        for result in records:
+            if (result['image_id'] not in json_results_cmu.keys()):
+                json_results_cmu[result['image_id']] = {}
+                json_results_cmu[result['image_id']]['version'] = 'AlphaPose v0.3'
+                json_results_cmu[result['image_id']][part_key] = []
+            tmp = {joints_key: []}
+            result['keypoints'].append(((result['keypoints'][15] + result['keypoints'][18]) / 2))
+            result['keypoints'].append(((result['keypoints'][16] + result['keypoints'][19]) / 2))
+            result['keypoints'].append(((result['keypoints'][17] + result['keypoints'][20]) / 2))
+            indexarr = [0, 51, 18, 24, 30, 15, 21, 27, 36, 42, 48, 33, 39, 45, 6, 3, 12, 9]
+            for i in indexarr:
+                tmp[joints_key].append(result['keypoints'][i])
+                tmp[joints_key].append(result['keypoints'][(i + 1)])
+                tmp[joints_key].append(result['keypoints'][(i + 2)])
+            json_results_cmu[result['image_id']][part_key].append(tmp)
         with open(os.path.join(outputpath, outputfile), 'w') as json_file:
             json_file.write(json.dumps(json_results_cmu))
             if (not os.path.exists(os.path.join(outputpath, 'sep-json'))):
@@ -507,8 +715,61 @@ def write_json(all_results, outputpath, form=None, for_eval=False, outputfile='a
                 with open(os.path.join(outputpath, 'sep-json', (name.split('.')[0] + '.json')), 'w') as json_file:
                     json_file.write(json.dumps(json_results_cmu[name]))
     else:
+        # same bytes as json.dumps(list(records)), without holding the list
         with open(os.path.join(outputpath, outputfile), 'w') as json_file:
-            json_file.write(json.dumps(json_results))
+            json_file.write('[')
+            for (i, result) in enumerate(records):
+                if (i > 0):
+                    json_file.write(', ')
+                json_file.write(json.dumps(result))
+            json_file.write(']')
+
+def read_json_records(stream_path):
+    '\n    Iterate over the json records of a result stream written by ResultStream\n    stream_path: path of the ndjson file\n    '
+    with open(stream_path, 'r') as stream_file:
+        for line in stream_file:
+            if (not line.strip()):
+                continue
+            try:
+                (yield json.loads(line))
+            except ValueError:
+                # the last line may be cut short if the run was killed while writing it
+                break
+
+def write_json_from_stream(stream_path, outputpath, form=None, outputfile='alphapose-results.json'):
+    '\n    Write the result json of a (possibly interrupted) run from its result stream\n    stream_path: path of the ndjson file\n    outputpath: output directory\n    '
+    write_json_records(read_json_records(stream_path), outputpath, form=form, outputfile=outputfile)
+
+class ResultStream():
+    'Write the results of every image to an ndjson file as soon as they are ready, one json record per line.'
+
+    def __init__(self, outputpath, for_eval=False, fsync_interval=100, outputfile='alphapose-results.ndjson'):
+        self.outputpath = outputpath
+        self.path = os.path.join(outputpath, outputfile)
+        self.for_eval = for_eval
+        self.fsync_interval = fsync_interval
+        self.num_images = 0
+        self.stream_file = open(self.path, 'w')
+
+    def write(self, im_res):
+        for result in json_records(im_res, for_eval=self.for_eval):
+            self.stream_file.write((json.dumps(result) + '\n'))
+        self.num_images += 1
+        if ((self.fsync_interval > 0) and ((self.num_images % self.fsync_interval) == 0)):
+            self.sync()
+
+    def sync(self):
+        self.stream_file.flush()
+        os.fsync(self.stream_file.fileno())
+
+    def close(self):
+        if (not self.stream_file.closed):
+            self.sync()
+            self.stream_file.close()
+
+    def finalize(self, form=None, outputfile='alphapose-results.json'):
+        self.close()
+        write_json_from_stream(self.path, self.outputpath, form=form, outputfile=outputfile)
 
 def ppose_nms_validate_preprocess(_res):
     res = {}
@@ -0,0 +1,67 @@
+import time
+import jittor as jt
+
+
+class PoseBatcher():
+    """Collect the person crops of consecutive frames into one pose batch.
+
+    Frames are kept in arrival order until the pending crops reach `target_size`
+    or the oldest pending frame has waited `max_delay` seconds, then `flush` runs
+    the pose model once over all of them and scatters the heatmaps back to their
+    frames. With `target_size <= 1` every frame is flushed on its own. The
+    caller waits for the next frame at most `time_left()` seconds and flushes
+    when nothing came, so the delay holds while the input stalls.
+    """
+
+    def __init__(self, target_size, max_delay=0.05):
+        self.target_size = target_size
+        self.max_delay = max_delay
+        self.frames = []
+        self.num_crops = 0
+        self.start_time = None
+
+    def __len__(self):
+        return len(self.frames)
+
+    def put(self, inps, frame):
+        """Queue the crops `inps` (None for a frame without people) with its `frame` data."""
+        if (not self.frames):
+            self.start_time = time.time()
+        self.frames.append((inps, frame))
+        if (inps is not None):
+            self.num_crops += inps.shape[0]
+
+    def ready(self):
+        if (not self.frames):
+            return False
+        if ((self.num_crops == 0) or (self.num_crops >= self.target_size)):
+            return True
+        return ((time.time() - self.start_time) >= self.max_delay)
+
+    def time_left(self):
+        """Seconds until the oldest pending frame has waited `max_delay`, None without pending frames."""
+        if (not self.frames):
+            return None
+        return max(((self.start_time + self.max_delay) - time.time()), 0)
+
+    def flush(self, forward):
+        """Run `forward` on all the pending crops at once.
+
+        Returns a list of (inps, hm, frame) in the order the frames were put,
+        with `inps` and `hm` set to None for frames without people.
+        """
+        (frames, self.frames, self.num_crops) = (self.frames, [], 0)
+        inps = [inps_k for (inps_k, _) in frames if (inps_k is not None)]
+        if (len(inps) == 0):
+            return [(None, None, frame) for (_, frame) in frames]
+        hm = forward((inps[0] if (len(inps) == 1) else jt.contrib.concat(inps)))
+        results = []
+        start = 0
+        for (inps_k, frame) in frames:
+            if (inps_k is None):
+                results.append((None, None, frame))
+                continue
+            end = (start + inps_k.shape[0])
+            results.append((inps_k, hm[start:end], frame))
+            start = end
+        return results
@@ -7,7 +7,7 @@ import random
 import cv2
 import numpy as np
 from ..bbox import _box_to_center_scale, _center_scale_to_box, _clip_aspect_ratio
-from ..transforms import addDPG, affine_transform, flip_joints_3d, get_affine_transform, im_to_torch
+from ..transforms import addDPG, affine_transform, cv_crop_boxes, flip_joints_3d, get_affine_transform, im_to_torch, ims_to_torch
 if (platform.system() != 'Windows'):
     from ..roi_align import ROIAlign
 
@@ -61,6 +61,13 @@ class SimpleTransform(object):
         img[2] += (-0.48)
         return (img, bbox)
 
+    def test_transform_batch(self, src, bboxes):
+        '\n        Crop all the boxes of one or several frames at once, same result as calling\n        `test_transform` on every box.\n\n        Arguments:\n            src (ndarray [H, W, 3] or list of them): input images\n            bboxes (Tensor[K, 4] or list of them): the box coordinates in (x1, y1, x2, y2)\n                format, one entry per image when `src` is a list.\n\n        Returns:\n            inps (Tensor[K, 3, height, width]): cropped images, in the order of the boxes\n            cropped_boxes (Tensor[K, 4]): new box coordinates\n        '
+        (imgs, cropped_boxes) = cv_crop_boxes(src, bboxes, self._input_size, self._aspect_ratio)
+        inps = ims_to_torch(imgs)
+        inps = (inps + jt.array([(- 0.406), (- 0.457), (- 0.48)]).reshape(1, 3, 1, 1))
+        return (inps, jt.array(cropped_boxes))
+
     def align_transform(self, image, boxes):
         '\n        Performs Region of Interest (RoI) Align operator described in Mask R-CNN\n\n        Arguments:\n            input (ndarray [H, W, 3]): input images\n            boxes (Tensor[K, 4]): the box coordinates in (x1, y1, x2, y2)\n                format where the regions will be taken from.\n\n        Returns:\n            cropped_img (Tensor[K, C, output_size[0], output_size[1]])\n            boxes (Tensor[K, 4]): new box coordinates\n        '
         tensor_img = im_to_torch(image)
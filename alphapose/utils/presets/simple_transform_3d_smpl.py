@@ -7,7 +7,7 @@ import random
 import cv2
 import numpy as np
 from ..bbox import _box_to_center_scale, _center_scale_to_box
-from ..transforms import addDPG, affine_transform, flip_joints_3d, flip_thetas, flip_xyz_joints_3d, get_affine_transform, im_to_torch, batch_rodrigues_numpy, rotmat_to_quat_numpy, flip_twist, get_intrinsic_metrix
+from ..transforms import addDPG, affine_transform, cv_crop_boxes, flip_joints_3d, flip_thetas, flip_xyz_joints_3d, get_affine_transform, im_to_torch, ims_to_torch, batch_rodrigues_numpy, rotmat_to_quat_numpy, flip_twist, get_intrinsic_metrix
 s_coco_2_smpl_jt = [(- 1), 11, 12, (- 1), 13, 14, (- 1), 15, 16, (- 1), (- 1), (- 1), (- 1), (- 1), (- 1), (- 1), 5, 6, 7, 8, 9, 10, (- 1), (- 1)]
 s_coco_2_h36m_jt = [(- 1), (- 1), 13, 15, (- 1), 14, 16, (- 1), (- 1), 0, (- 1), 5, 7, 9, 6, 8, 10]
 s_coco_2_smpl_jt_2d = [(- 1), (- 1), (- 1), (- 1), 13, 14, (- 1), 15, 16, (- 1), (- 1), (- 1), (- 1), (- 1), (- 1), (- 1), 5, 6, 7, 8, 9, 10, (- 1), (- 1)]
@@ -66,11 +66,19 @@ class SimpleTransform3DSMPL(object):
         img[0]+=((- 0.406))
         img[1]+=((- 0.457))
         img[2]+=((- 0.48))
-        img[0].div_(0.225)
-        img[1].div_(0.224)
-        img[2].div_(0.229)
+        img[0] /= 0.225
+        img[1] /= 0.224
+        img[2] /= 0.229
         return (img, bbox)
 
+    def test_transform_batch(self, src, bboxes):
+        '\n        Crop all the boxes of one or several frames at once, same result as calling\n        `test_transform` on every box.\n\n        Arguments:\n            src (ndarray [H, W, 3] or list of them): input images\n            bboxes (Tensor[K, 4] or list of them): the box coordinates in (x1, y1, x2, y2)\n                format, one entry per image when `src` is a list.\n\n        Returns:\n            inps (Tensor[K, 3, height, width]): cropped images, in the order of the boxes\n            cropped_boxes (Tensor[K, 4]): new box coordinates\n        '
+        (imgs, cropped_boxes) = cv_crop_boxes(src, bboxes, self._input_size, self._aspect_ratio, scale_mult=self._scale_mult)
+        inps = ims_to_torch(imgs)
+        inps = (inps + jt.array([(- 0.406), (- 0.457), (- 0.48)]).reshape(1, 3, 1, 1))
+        inps = (inps / jt.array([0.225, 0.224, 0.229]).reshape(1, 3, 1, 1))
+        return (inps, jt.array(cropped_boxes))
+
     def _integral_target_generator(self, joints_3d, num_joints, patch_height, patch_width):
         target_weight = np.ones((num_joints, 3), dtype=np.float32)
         target_weight[:, 0] = joints_3d[:, 0, 1]
@@ -0,0 +1,103 @@
+import traceback
+from threading import Semaphore, Thread
+from queue import Queue
+import multiprocessing as mp
+
+
+def render_worker(in_queue, out_queue):
+    """Render the frames of `in_queue` until a None item arrives."""
+    while True:
+        item = in_queue.get()
+        if (item is None):
+            return
+        (index, vis_frame, orig_img, result, opt, vis_thres, im_name) = item
+        try:
+            img = (orig_img if (vis_frame is None) else vis_frame(orig_img, result, opt, vis_thres))
+        except Exception:
+            img = RenderError(traceback.format_exc())
+        out_queue.put((index, img, im_name))
+
+
+class RenderError():
+    """Traceback of a frame that failed to render, passed on to the sequencer."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+class RenderPool():
+    """Render frames on `num_workers` workers and write them in frame order.
+
+    `put` numbers the frames as they come. The workers (threads, or processes
+    with `use_threads=False`) render them in any order, and a single sequencer
+    thread keeps the rendered frames that arrive early until all the frames
+    before them are written, then calls `write_func(img, im_name)` on them one
+    by one. A frame that fails to render or to be written is reported and
+    skipped, and `stop` returns the first such error once the other frames
+    are written. `put` blocks while `queueSize` frames are in the pool,
+    queued, rendering or waiting for their turn.
+    """
+
+    def __init__(self, num_workers, write_func, use_threads=True, queueSize=None):
+        self.num_workers = num_workers
+        self.write_func = write_func
+        self.use_threads = use_threads
+        queueSize = ((4 * num_workers) if (queueSize is None) else queueSize)
+        self.slots = Semaphore(max(queueSize, 1))
+        if use_threads:
+            (self.in_queue, self.out_queue) = (Queue(), Queue())
+        else:
+            (self.in_queue, self.out_queue) = (mp.Queue(), mp.Queue())
+        self.num_frames = 0
+        self.num_written = 0
+        self.error = None
+
+    def start(self):
+        worker = (Thread if self.use_threads else mp.Process)
+        self.workers = [worker(target=render_worker, args=(self.in_queue, self.out_queue)) for _ in range(self.num_workers)]
+        for p in self.workers:
+            p.start()
+        self.sequencer = Thread(target=self.sequence, args=())
+        self.sequencer.start()
+        return self
+
+    def put(self, vis_frame, orig_img, result, opt, vis_thres, im_name):
+        """Queue a frame to be rendered with `vis_frame`, or written as is when `vis_frame` is None."""
+        self.slots.acquire()
+        self.in_queue.put((self.num_frames, vis_frame, orig_img, result, opt, vis_thres, im_name))
+        self.num_frames += 1
+
+    def sequence(self):
+        pending = {}
+        while True:
+            item = self.out_queue.get()
+            if (item is None):
+                return
+            (index, img, im_name) = item
+            pending[index] = (img, im_name)
+            while (self.num_written in pending):
+                (img, im_name) = pending.pop(self.num_written)
+                self.num_written += 1
+                if (not isinstance(img, RenderError)):
+                    try:
+                        self.write_func(img, im_name)
+                    except Exception:
+                        img = RenderError(traceback.format_exc())
+                # a failed frame is reported and skipped, the sequencer keeps draining the others
+                if isinstance(img, RenderError):
+                    print('Failed to render or write {}:\n{}'.format(im_name, img.message))
+                    self.error = (self.error or img)
+                self.slots.release()
+
+    def count(self):
+        return (self.num_frames - self.num_written)
+
+    def stop(self):
+        """Wait until every queued frame is written, shut the workers down and return the first RenderError, or None."""
+        for _ in self.workers:
+            self.in_queue.put(None)
+        for p in self.workers:
+            p.join()
+        self.out_queue.put(None)
+        self.sequencer.join()
+        return self.error
@@ -0,0 +1,89 @@
+import json
+import os
+import cv2
+import numpy as np
+
+
+class RegionOfInterest():
+    """Part of the frames of a fixed camera where people can appear.
+
+    Given as a binary mask image (non-zero inside), or as polygons of frame
+    coordinates. The detector only runs on the bounding box of the region,
+    see `crop`, and the detections whose box center falls outside of the
+    region are dropped by `keep`. The mask is resized to, or the polygons are
+    drawn at, the size of each frame, once per frame size.
+    """
+
+    def __init__(self, polygons=None, mask=None):
+        assert ((polygons is None) != (mask is None)), 'give either polygons or a mask'
+        self.polygons = ([np.int32(polygon).reshape((- 1), 2) for polygon in polygons] if (polygons is not None) else None)
+        self.mask = mask
+        self._regions = {}
+
+    @classmethod
+    def from_file(cls, path, source=None):
+        """
+        Load the region of a source from a mask image or a json file
+        The json holds a list of polygons ([[x, y], ...]), or a dict from the name of the source
+        (the basename of the video or image folder, or the webcam number) to its list of polygons
+        """
+        if (not path.endswith('.json')):
+            mask = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if (mask is None):
+                raise IOError('Cannot read ROI mask: {}'.format(path))
+            return cls(mask=mask)
+        with open(path, 'r') as f:
+            polygons = json.load(f)
+        if isinstance(polygons, dict):
+            name = os.path.basename(os.path.normpath(str(source)))
+            if (name not in polygons):
+                raise KeyError('No ROI for source {} in {}'.format(name, path))
+            polygons = polygons[name]
+        return cls(polygons=polygons)
+
+    def region(self, width, height):
+        """Mask (uint8, (h, w)) and bounding box (x0, y0, x1, y1) of the region in a frame of this size."""
+        if ((width, height) not in self._regions):
+            if (self.mask is not None):
+                mask = cv2.resize(self.mask, (width, height), interpolation=cv2.INTER_NEAREST)
+                mask = (mask > 0).astype(np.uint8)
+            else:
+                mask = np.zeros((height, width), dtype=np.uint8)
+                cv2.fillPoly(mask, self.polygons, 1)
+            points = cv2.findNonZero(mask)
+            assert (points is not None), 'the ROI is empty'
+            (x, y, w, h) = cv2.boundingRect(points)
+            self._regions[(width, height)] = (mask, (x, y, (x + w), (y + h)))
+        return self._regions[(width, height)]
+
+    def crop(self, img):
+        """Bounding crop of the region in img (ndarray, (h, w, c)), a view, and its top left corner."""
+        (_, (x0, y0, x1, y1)) = self.region(img.shape[1], img.shape[0])
+        return (img[y0:y1, x0:x1], (x0, y0))
+
+    def keep(self, boxes, width, height):
+        """
+        Which boxes to keep
+        Input: boxes(ndarray,(n,(x1,y1,x2,y2))): detections in frame coordinates
+        Output: ndarray(bool,(n,)): whether the center of the box is inside the region
+        """
+        (mask, _) = self.region(width, height)
+        cx = np.clip(((boxes[:, 0] + boxes[:, 2]) / 2).astype(np.int64), 0, (width - 1))
+        cy = np.clip(((boxes[:, 1] + boxes[:, 3]) / 2).astype(np.int64), 0, (height - 1))
+        return (mask[(cy, cx)] > 0)
+
+    def restore(self, dets, orig_imgs):
+        """
+        Map the detections of a batch of crops back to their frames and drop those outside the region
+        Input: dets(ndarray,(n,(batch_idx,x1,y1,x2,y2,...))): detections in crop coordinates
+               orig_imgs: the frames of the batch
+        Output: ndarray: detections in frame coordinates inside the region
+        """
+        keep = np.zeros(len(dets), dtype=bool)
+        for (k, orig_img) in enumerate(orig_imgs):
+            (height, width) = orig_img.shape[:2]
+            (_, (x0, y0, _, _)) = self.region(width, height)
+            in_k = (dets[:, 0] == k)
+            dets[in_k, 1:5] += np.float32([x0, y0, x0, y0])
+            keep[in_k] = self.keep(dets[in_k, 1:5], width, height)
+        return dets[keep]
@@ -6,6 +6,8 @@ from jittor import nn
 import random
 import cv2
 import numpy as np
+from .bbox import _box_to_center_scale, _center_scale_to_box
+_UINT8_TO_FLOAT = np.float32((np.arange(256) / 255))
 
 def rnd(x):
     return max(((- 2) * x), min((2 * x), (np.random.randn(1)[0] * x)))
@@ -64,6 +66,38 @@ def im_to_torch(img: np.ndarray):
     img = img.transpose(2, 0, 1)
     return img
 
+def ims_to_torch(imgs: np.ndarray):
+    'Transform a batch of ndarray images to torch tensor, see `im_to_torch`.\n    Parameters\n    ----------\n    imgs: numpy.ndarray\n        An ndarray with shape: `(N, H, W, 3)`.\n    Returns\n    -------\n    jt.array\n        A tensor with shape: `(N, 3, H, W)`.\n    '
+    if (imgs.shape[0] == 0):
+        return jt.zeros((0, imgs.shape[3], imgs.shape[1], imgs.shape[2]))
+    if (imgs.dtype != np.uint8):
+        return to_torch(np.stack([np.float32((img / 255)) if (img.max() > 1) else img for img in imgs])).transpose(0, 3, 1, 2)
+    # jittor turns `/ 255` into a multiplication by the reciprocal, look the values up instead
+    # so that the result is bit-identical to `im_to_torch`
+    scaled = to_torch((imgs.reshape((imgs.shape[0], (- 1))).max(axis=1) > 1)).reshape(((- 1), 1, 1, 1))
+    imgs = to_torch(imgs)
+    imgs = jt.ternary(scaled, jt.array(_UINT8_TO_FLOAT)[imgs], imgs.float32())
+    return imgs.transpose(0, 3, 1, 2)
+
+def cv_crop_boxes(src, bboxes, input_size, aspect_ratio, scale_mult=1.25):
+    'Crop many bboxes by Affinetransform, the same way as `test_transform` does for one bbox.\n    Parameters\n    ----------\n    src: numpy.ndarray or list of numpy.ndarray\n        An image with shape: `(h, w, 3)`, or a list of such images.\n    bboxes: numpy.ndarray or jt.array, or list of them\n        Boxes with shape: `(N, 4)` as [xmin, ymin, xmax, ymax], one entry per image if `src` is a list.\n    input_size: tuple\n        Resulting image size, as (height, width).\n    Returns\n    -------\n    numpy.ndarray\n        Cropped images with shape: `(N, height, width, 3)`, in the order of the boxes.\n    numpy.ndarray\n        Cropped boxes with shape: `(N, 4)`.\n    '
+    if (not isinstance(src, (list, tuple))):
+        (src, bboxes) = ([src], [bboxes])
+    bboxes = [to_numpy(b).reshape(((- 1), 4)) for b in bboxes]
+    num_boxes = sum((len(b) for b in bboxes))
+    (inp_h, inp_w) = input_size
+    imgs = np.zeros((num_boxes, int(inp_h), int(inp_w), src[0].shape[2]), dtype=src[0].dtype)
+    cropped_boxes = np.zeros((num_boxes, 4), dtype=np.float32)
+    i = 0
+    for (img, boxes) in zip(src, bboxes):
+        for (xmin, ymin, xmax, ymax) in boxes:
+            (center, scale) = _box_to_center_scale(xmin, ymin, (xmax - xmin), (ymax - ymin), aspect_ratio, scale_mult=scale_mult)
+            trans = get_affine_transform(center, scale, 0, [inp_w, inp_h])
+            imgs[i] = cv2.warpAffine(img, trans, (int(inp_w), int(inp_h)), flags=cv2.INTER_LINEAR)
+            cropped_boxes[i] = _center_scale_to_box(center, scale)
+            i += 1
+    return (imgs, cropped_boxes)
+
 def torch_to_im(img):
     'Transform torch tensor to ndarray image.\n    Parameters\n    ----------\n    img: jt.array\n        A tensor with shape: `(3, H, W)`.\n    Returns\n    -------\n    numpy.ndarray\n        An ndarray with shape: `(H, W, 3)`.\n    '
     img = to_numpy(img)
@@ -331,24 +365,16 @@ def heatmap_to_coord_simple(hms, bbox, hms_flip=None, **kwargs):
     return (preds, maxvals)
 
 def heatmap_to_coord_simple_regress(preds, bbox, hm_shape, norm_type, hms_flip=None):
-
-    def integral_op(hm_1d):
-        if (hm_1d.device.index is not None):
-            # hm_1d = (hm_1d * torch.cuda.comm.broadcast(jt.arange(hm_1d.shape[(- 1)]).astype(jt.float32), devices=[hm_1d.device.index])[0])
-            hm_1d = hm_1d * jt.arange(hm_1d.shape[(- 1)]).astype(jt.float32)  # tycoer
-        else:
-            hm_1d = (hm_1d * jt.arange(hm_1d.shape[(- 1)]).astype(jt.float32))
-        return hm_1d
     if (preds.ndim == 3):
         preds = preds.unsqueeze(0)
     (hm_height, hm_width) = hm_shape
     num_joints = preds.shape[1]
-    (pred_jts, pred_scores) = _integral_tensor(preds, num_joints, False, hm_width, hm_height, 1, integral_op, norm_type)
+    (pred_jts, pred_scores) = _integral_tensor(preds, num_joints, False, hm_width, hm_height, 1, _integral_op, norm_type)
     pred_jts = pred_jts.reshape((pred_jts.shape[0], num_joints, 2))
     if (hms_flip is not None):
         if (hms_flip.ndim == 3):
             hms_flip = hms_flip.unsqueeze(0)
-        (pred_jts_flip, pred_scores_flip) = _integral_tensor(hms_flip, num_joints, False, hm_width, hm_height, 1, integral_op, norm_type)
+        (pred_jts_flip, pred_scores_flip) = _integral_tensor(hms_flip, num_joints, False, hm_width, hm_height, 1, _integral_op, norm_type)
         pred_jts_flip = pred_jts_flip.reshape((pred_jts_flip.shape[0], num_joints, 2))
         pred_jts = ((pred_jts + pred_jts_flip) / 2)
         pred_scores = ((pred_scores + pred_scores_flip) / 2)
@@ -377,18 +403,106 @@ def heatmap_to_coord_simple_regress(preds, bbox, hm_shape, norm_type, hms_flip=N
         pred_scores = pred_scores[0]
     return (preds, pred_scores)
 
+def heatmap_to_coord_simple_batch(hms, bboxes, hms_flip=None, **kwargs):
+    'Batch version of `heatmap_to_coord_simple`.\n    Parameters\n    ----------\n    hms: numpy.ndarray or jt.array\n        Heatmaps with shape: `(N, K, H, W)`.\n    bboxes: numpy.ndarray or jt.array\n        Boxes with shape: `(N, 4)` as [xmin, ymin, xmax, ymax].\n    Returns\n    -------\n    numpy.ndarray\n        Coordinates with shape: `(N, K, 2)`.\n    numpy.ndarray\n        Scores with shape: `(N, K, 1)`.\n    '
+    hms = to_numpy(hms)
+    if (hms_flip is not None):
+        hms = ((hms + to_numpy(hms_flip)) / 2)
+    (coords, maxvals) = get_max_pred_batch(hms)
+    (num_people, num_joints, hm_h, hm_w) = hms.shape
+    px = coords[:, :, 0].astype(np.int64)
+    py = coords[:, :, 1].astype(np.int64)
+    inside = ((((1 < px) & (px < (hm_w - 1))) & (1 < py)) & (py < (hm_h - 1)))
+    px = np.clip(px, 1, (hm_w - 2))
+    py = np.clip(py, 1, (hm_h - 2))
+    people = np.arange(num_people)[:, None]
+    joints = np.arange(num_joints)[None, :]
+    diff = np.stack(((hms[(people, joints, py, (px + 1))] - hms[(people, joints, py, (px - 1))]), (hms[(people, joints, (py + 1), px)] - hms[(people, joints, (py - 1), px)])), axis=2)
+    coords += ((np.sign(diff) * 0.25) * inside[:, :, None])
+    preds = transform_preds_batch(coords, bboxes, [hm_w, hm_h])
+    return (preds, maxvals)
+
+def heatmap_to_coord_simple_regress_batch(preds, bboxes, hm_shape, norm_type, hms_flip=None, **kwargs):
+    'Batch version of `heatmap_to_coord_simple_regress`, see `heatmap_to_coord_simple_batch`.'
+    if isinstance(preds, np.ndarray):
+        preds = jt.array(preds)
+    (hm_height, hm_width) = hm_shape
+    num_joints = preds.shape[1]
+    (pred_jts, pred_scores) = _integral_tensor(preds, num_joints, False, hm_width, hm_height, 1, _integral_op, norm_type)
+    if (hms_flip is not None):
+        if isinstance(hms_flip, np.ndarray):
+            hms_flip = jt.array(hms_flip)
+        (pred_jts_flip, pred_scores_flip) = _integral_tensor(hms_flip, num_joints, False, hm_width, hm_height, 1, _integral_op, norm_type)
+        pred_jts = ((pred_jts + pred_jts_flip) / 2)
+        pred_scores = ((pred_scores + pred_scores_flip) / 2)
+    coords = pred_jts.reshape((pred_jts.shape[0], num_joints, 2)).numpy().astype(np.float32)
+    pred_scores = pred_scores.numpy().astype(np.float32)
+    coords[:, :, 0] = ((coords[:, :, 0] + 0.5) * hm_width)
+    coords[:, :, 1] = ((coords[:, :, 1] + 0.5) * hm_height)
+    preds = transform_preds_batch(coords, bboxes, [hm_width, hm_height])
+    return (preds, pred_scores)
+
+def heatmap_to_coord_combined_batch(hms, bboxes, hm_shape, norm_type, hms_flip=None, face_hand_num=110, **kwargs):
+    'Batch decoder of the `Combined` loss, the last `face_hand_num` joints are regressed and the others use heatmaps.'
+    (coords_body_foot, scores_body_foot) = heatmap_to_coord_simple_batch(hms[:, :(- face_hand_num)], bboxes, hms_flip=(hms_flip[:, :(- face_hand_num)] if (hms_flip is not None) else None))
+    (coords_face_hand, scores_face_hand) = heatmap_to_coord_simple_regress_batch(hms[:, (- face_hand_num):], bboxes, hm_shape, norm_type, hms_flip=(hms_flip[:, (- face_hand_num):] if (hms_flip is not None) else None))
+    return (np.concatenate((coords_body_foot, coords_face_hand), axis=1), np.concatenate((scores_body_foot, scores_face_hand), axis=1))
+
+def heatmap_to_coord_simple_device(hms, bboxes, hms_flip=None, **kwargs):
+    'Same as `heatmap_to_coord_simple_batch`, but built from jittor ops so that decoding runs on the\n    device right after the pose model and only the keypoints have to be fetched.\n    Parameters\n    ----------\n    hms: jt.array\n        Heatmaps with shape: `(N, K, H, W)`.\n    bboxes: jt.array\n        Boxes with shape: `(N, 4)` as [xmin, ymin, xmax, ymax].\n    Returns\n    -------\n    jt.array\n        Coordinates with shape: `(N, K, 2)`.\n    jt.array\n        Scores with shape: `(N, K, 1)`.\n    '
+    if (hms_flip is not None):
+        hms = ((hms + hms_flip) / 2)
+    (num_people, num_joints, hm_h, hm_w) = hms.shape
+    hms = hms.reshape((num_people, num_joints, (- 1)))
+    (idx, maxvals) = jt.argmax(hms, dim=2, keepdims=True)
+    idx = (idx * (maxvals > 0))
+    px = (idx % hm_w)
+    py = (idx // hm_w)
+    inside = ((((px > 1) & (px < (hm_w - 1))) & (py > 1)) & (py < (hm_h - 1)))
+    idx = jt.ternary(inside, idx, jt.full_like(idx, (hm_w + 1)))
+    dx = (jt.gather(hms, 2, (idx + 1)) - jt.gather(hms, 2, (idx - 1)))
+    dy = (jt.gather(hms, 2, (idx + hm_w)) - jt.gather(hms, 2, (idx - hm_w)))
+    diff = jt.contrib.concat((dx, dy), dim=2)
+    shift = ((((diff > 0).float32() - (diff < 0).float32()) * 0.25) * inside.float32())
+    coords = (jt.contrib.concat((px, py), dim=2).float32() + shift)
+    preds = transform_preds_device(coords, bboxes, [hm_w, hm_h])
+    return (preds, maxvals)
+
+def heatmap_to_coord_simple_regress_device(preds, bboxes, hm_shape, norm_type, hms_flip=None, **kwargs):
+    'Same as `heatmap_to_coord_simple_regress_batch`, see `heatmap_to_coord_simple_device`.'
+    (hm_height, hm_width) = hm_shape
+    num_joints = preds.shape[1]
+    (pred_jts, pred_scores) = _integral_tensor(preds, num_joints, False, hm_width, hm_height, 1, _integral_op, norm_type)
+    if (hms_flip is not None):
+        (pred_jts_flip, pred_scores_flip) = _integral_tensor(hms_flip, num_joints, False, hm_width, hm_height, 1, _integral_op, norm_type)
+        pred_jts = ((pred_jts + pred_jts_flip) / 2)
+        pred_scores = ((pred_scores + pred_scores_flip) / 2)
+    coords = pred_jts.reshape((pred_jts.shape[0], num_joints, 2))
+    coords = ((coords + 0.5) * jt.array([float(hm_width), float(hm_height)]).reshape(1, 1, 2))
+    preds = transform_preds_device(coords, bboxes, [hm_width, hm_height])
+    return (preds, pred_scores)
+
+def heatmap_to_coord_combined_device(hms, bboxes, hm_shape, norm_type, hms_flip=None, face_hand_num=110, **kwargs):
+    'Same as `heatmap_to_coord_combined_batch`, see `heatmap_to_coord_simple_device`.'
+    (coords_body_foot, scores_body_foot) = heatmap_to_coord_simple_device(hms[:, :(- face_hand_num)], bboxes, hms_flip=(hms_flip[:, :(- face_hand_num)] if (hms_flip is not None) else None))
+    (coords_face_hand, scores_face_hand) = heatmap_to_coord_simple_regress_device(hms[:, (- face_hand_num):], bboxes, hm_shape, norm_type, hms_flip=(hms_flip[:, (- face_hand_num):] if (hms_flip is not None) else None))
+    return (jt.contrib.concat((coords_body_foot, coords_face_hand), dim=1), jt.contrib.concat((scores_body_foot, scores_face_hand), dim=1))
+
+def _integral_op(hm_1d):
+    return (hm_1d * jt.arange(hm_1d.shape[(- 1)]).astype(jt.float32))
+
 def _integral_tensor(preds, num_joints, output_3d, hm_width, hm_height, hm_depth, integral_operation, norm_type='softmax'):
     preds = preds.reshape((preds.shape[0], num_joints, (- 1)))
     preds = norm_heatmap(norm_type, preds)
     if (norm_type == 'sigmoid'):
-        (maxvals, _) = jt.max(preds, dim=2, keepdims=True)
+        maxvals = jt.max(preds, dim=2, keepdims=True)
     else:
         maxvals = jt.ones((*preds.shape[:2], 1), dtype=jt.float)
     heatmaps = (preds / preds.sum(dim=2, keepdims=True))
     heatmaps = heatmaps.reshape((heatmaps.shape[0], num_joints, hm_depth, hm_height, hm_width))
-    hm_x = heatmaps.sum(dim=(2, 3))
-    hm_y = heatmaps.sum(dim=(2, 4))
-    hm_z = heatmaps.sum(dim=(3, 4))
+    hm_x = heatmaps.sum(dims=(2, 3))
+    hm_y = heatmaps.sum(dims=(2, 4))
+    hm_z = heatmaps.sum(dims=(3, 4))
     hm_x = integral_operation(hm_x)
     hm_y = integral_operation(hm_y)
     hm_z = integral_operation(hm_z)
@@ -427,6 +541,31 @@ def transform_preds(coords, center, scale, output_size):
     target_coords[0:2] = affine_transform(coords[0:2], trans)
     return target_coords
 
+def transform_preds_batch(coords, bboxes, output_size):
+    'Map `(N, K, 2)` heatmap coordinates back to the image, person i being cropped by `bboxes[i]`.'
+    bboxes = to_numpy(bboxes).astype(np.float64).reshape(((- 1), 4))
+    trans = np.zeros((bboxes.shape[0], 2, 3))
+    for (i, (xmin, ymin, xmax, ymax)) in enumerate(bboxes):
+        w = (xmax - xmin)
+        h = (ymax - ymin)
+        center = np.array([(xmin + (w * 0.5)), (ymin + (h * 0.5))])
+        scale = np.array([w, h])
+        trans[i] = get_affine_transform(center, scale, 0, output_size, inv=1)
+    x = coords[:, :, 0:1].astype(np.float64)
+    y = coords[:, :, 1:2].astype(np.float64)
+    target_coords = (((x * trans[:, None, :, 0]) + (y * trans[:, None, :, 1])) + trans[:, None, :, 2])
+    return target_coords.astype(coords.dtype)
+
+def transform_preds_device(coords, bboxes, output_size):
+    'Jittor version of `transform_preds_batch`. With no rotation the inverse affine of\n    `get_affine_transform` is a plain scaling by `box width / heatmap width` around the box center.'
+    (hm_w, hm_h) = output_size
+    bboxes = bboxes.float32().reshape(((- 1), 1, 4))
+    w = (bboxes[:, :, 2:3] - bboxes[:, :, 0:1])
+    h = (bboxes[:, :, 3:4] - bboxes[:, :, 1:2])
+    center = jt.contrib.concat(((bboxes[:, :, 0:1] + (w * 0.5)), (bboxes[:, :, 1:2] + (h * 0.5))), dim=2)
+    offset = jt.array([(hm_w * 0.5), (hm_h * 0.5)]).float32().reshape(1, 1, 2)
+    return (center + ((coords - offset) * (w / hm_w)))
+
 def get_max_pred(heatmaps):
     num_joints = heatmaps.shape[0]
     width = heatmaps.shape[2]
@@ -576,3 +715,25 @@ def get_func_heatmap_to_coord(cfg):
             return [heatmap_to_coord_simple, heatmap_to_coord_simple_regress]
     else:
         raise NotImplementedError
+
+def get_func_heatmap_to_coord_device(cfg):
+    if (cfg.DATA_PRESET.TYPE == 'simple'):
+        if (cfg.LOSS.TYPE == 'MSELoss'):
+            return heatmap_to_coord_simple_device
+        elif (cfg.LOSS.TYPE == 'L1JointRegression'):
+            return heatmap_to_coord_simple_regress_device
+        elif (cfg.LOSS.TYPE == 'Combined'):
+            return heatmap_to_coord_combined_device
+    else:
+        raise NotImplementedError
+
+def get_func_heatmap_to_coord_batch(cfg):
+    if (cfg.DATA_PRESET.TYPE == 'simple'):
+        if (cfg.LOSS.TYPE == 'MSELoss'):
+            return heatmap_to_coord_simple_batch
+        elif (cfg.LOSS.TYPE == 'L1JointRegression'):
+            return heatmap_to_coord_simple_regress_batch
+        elif (cfg.LOSS.TYPE == 'Combined'):
+            return heatmap_to_coord_combined_batch
+    else:
+        raise NotImplementedError
@@ -131,11 +131,8 @@ def vis_frame_fast(frame, im_res, opt, vis_thres, format='coco'):
                     cv2.line(img, start_xy, end_xy, (255, 255, 255), 1)
     return img
 
-def vis_frame(frame, im_res, opt, vis_thres, format='coco'):
-    '\n    frame: frame image\n    im_res: im_res of predictions\n    format: coco or mpii\n\n    return rendered image\n    '
-    kp_num = 17
-    if (len(im_res['result']) > 0):
-        kp_num = len(im_res['result'][0]['keypoints'])
+def get_vis_layout(kp_num, format='coco'):
+    '\n    kp_num: number of keypoints of the poses\n    format: coco or mpii\n\n    return limb pairs, keypoint colors and limb colors of vis_frame\n    '
     if (kp_num == 17):
         if (format == 'coco'):
             l_pair = [(0, 1), (0, 2), (1, 3), (2, 4), (5, 6), (5, 7), (7, 9), (6, 8), (8, 10), (17, 11), (17, 12), (11, 13), (12, 14), (13, 15), (14, 16)]
@@ -169,6 +166,14 @@ def vis_frame(frame, im_res, opt, vis_thres, format='coco'):
         line_color = [(255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255), (255, 255, 255)]
     else:
         raise NotImplementedError
+    return (l_pair, p_color, line_color)
+
+def vis_frame(frame, im_res, opt, vis_thres, format='coco'):
+    '\n    frame: frame image\n    im_res: im_res of predictions\n    format: coco or mpii\n\n    return rendered image\n    '
+    kp_num = 17
+    if (len(im_res['result']) > 0):
+        kp_num = len(im_res['result'][0]['keypoints'])
+    (l_pair, p_color, line_color) = get_vis_layout(kp_num, format)
     img = frame.copy()
     (height, width) = img.shape[:2]
     for human in im_res['result']:
@@ -253,6 +258,159 @@ def vis_frame(frame, im_res, opt, vis_thres, format='coco'):
                 img = cv2.addWeighted(bg, transparency, img, (1 - transparency), 0)
     return img
 
+class FrameOverlay():
+    """Primitives drawn over a frame with a transparency each, composited once.
+
+    vis_frame draws every keypoint and limb into a copy of the whole frame and blends
+    it back with cv2.addWeighted. Here the primitives are kept with their bounding box,
+    and `composite` draws each one into a mask of its box only, accumulates them in
+    drawing order into a premultiplied color and alpha buffer that spans all the boxes,
+    and blends that buffer into the frame once. Up to the rounding of the intermediate
+    frames, this gives the same image as blending the primitives one after the other.
+    """
+
+    def __init__(self):
+        self.primitives = []
+
+    def circle(self, center, radius, color, thickness, transparency=1.0):
+        (x, y) = center
+        r = (radius + max(thickness, 1))
+        self._add(((x - r), (y - r), ((x + r) + 1), ((y + r) + 1)), (lambda mask, x0, y0: cv2.circle(mask, ((x - x0), (y - y0)), radius, 255, thickness)), color, transparency)
+
+    def line(self, pt1, pt2, color, thickness, transparency=1.0):
+        r = max(thickness, 1)
+        self._add(((min(pt1[0], pt2[0]) - r), (min(pt1[1], pt2[1]) - r), ((max(pt1[0], pt2[0]) + r) + 1), ((max(pt1[1], pt2[1]) + r) + 1)), (lambda mask, x0, y0: cv2.line(mask, ((pt1[0] - x0), (pt1[1] - y0)), ((pt2[0] - x0), (pt2[1] - y0)), 255, thickness)), color, transparency)
+
+    def rectangle(self, pt1, pt2, color, thickness, transparency=1.0):
+        r = max(thickness, 1)
+        self._add(((min(pt1[0], pt2[0]) - r), (min(pt1[1], pt2[1]) - r), ((max(pt1[0], pt2[0]) + r) + 1), ((max(pt1[1], pt2[1]) + r) + 1)), (lambda mask, x0, y0: cv2.rectangle(mask, ((pt1[0] - x0), (pt1[1] - y0)), ((pt2[0] - x0), (pt2[1] - y0)), 255, thickness)), color, transparency)
+
+    def convex_poly(self, points, color, transparency=1.0):
+        (x_min, y_min) = points.min(axis=0)
+        (x_max, y_max) = points.max(axis=0)
+        self._add((int(x_min), int(y_min), (int(x_max) + 1), (int(y_max) + 1)), (lambda mask, x0, y0: cv2.fillConvexPoly(mask, (points - [x0, y0]).astype(np.int32), 255)), color, transparency)
+
+    def text(self, text, org, font, scale, color, thickness, transparency=1.0):
+        ((w, h), baseline) = cv2.getTextSize(text, font, scale, thickness)
+        (x, y) = org
+        self._add(((x - thickness), ((y - h) - thickness), ((x + w) + thickness), ((y + baseline) + thickness)), (lambda mask, x0, y0: cv2.putText(mask, text, ((x - x0), (y - y0)), font, scale, 255, thickness)), color, transparency)
+
+    def _add(self, box, draw, color, transparency):
+        if (transparency > 0):
+            self.primitives.append((box, draw, color, transparency))
+
+    def composite(self, img):
+        """Blend the primitives into `img`, in place, and return it."""
+        (height, width) = img.shape[:2]
+        boxes = np.array([box for (box, _, _, _) in self.primitives]).reshape((- 1), 4)
+        if (len(boxes) == 0):
+            return img
+        (x0, y0) = np.maximum(boxes[:, :2].min(axis=0), 0)
+        (x1, y1) = np.minimum(boxes[:, 2:].max(axis=0), [width, height])
+        if ((x1 <= x0) or (y1 <= y0)):
+            return img
+        # premultiplied color channels and alpha of the overlay, one row per pixel of the boxes
+        channels = img.shape[2]
+        acc_width = (x1 - x0)
+        acc = np.zeros((((y1 - y0) * acc_width), (channels + 1)), dtype=np.float32)
+        seen = np.zeros(acc.shape[0], dtype=np.uint8)
+        for (box, draw, color, transparency) in self.primitives:
+            (bx0, by0) = (max(box[0], x0), max(box[1], y0))
+            (bx1, by1) = (min(box[2], x1), min(box[3], y1))
+            if ((bx1 <= bx0) or (by1 <= by0)):
+                continue
+            mask = np.zeros(((by1 - by0), (bx1 - bx0)), dtype=np.uint8)
+            draw(mask, bx0, by0)
+            # only the pixels the primitive covers change
+            points = cv2.findNonZero(mask)
+            if (points is None):
+                continue
+            points = points.reshape((- 1), 2)
+            covered = ((((points[:, 1] + by0) - y0) * acc_width) + ((points[:, 0] + bx0) - x0))
+            alpha = np.float32(transparency)
+            acc[covered] = ((acc[covered] * (1 - alpha)) + (alpha * np.array((tuple(color) + (1,)), dtype=np.float32)))
+            seen[covered] = 1
+        covered = np.flatnonzero(seen)
+        (ys, xs) = (((covered // acc_width) + y0), ((covered % acc_width) + x0))
+        pixels = img[(ys, xs)]
+        img[(ys, xs)] = np.clip(((pixels * (1 - acc[covered, channels:])) + acc[covered, :channels]).round(), 0, 255).astype(np.uint8)
+        return img
+
+def vis_frame_composite(frame, im_res, opt, vis_thres, format='coco'):
+    '\n    frame: frame image\n    im_res: im_res of predictions\n    format: coco or mpii\n\n    return rendered image, the look of vis_frame with a single FrameOverlay composite\n    '
+    kp_num = 17
+    if (len(im_res['result']) > 0):
+        kp_num = len(im_res['result'][0]['keypoints'])
+    (l_pair, p_color, line_color) = get_vis_layout(kp_num, format)
+    img = frame.copy()
+    (height, width) = img.shape[:2]
+    overlay = FrameOverlay()
+    for human in im_res['result']:
+        part_line = {}
+        kp_preds = human['keypoints']
+        kp_scores = human['kp_score']
+        kp_preds = np.asarray((kp_preds.numpy() if isinstance(kp_preds, jt.Var) else kp_preds))
+        kp_scores = np.asarray((kp_scores.numpy() if isinstance(kp_scores, jt.Var) else kp_scores))
+        if (kp_num == 17):
+            kp_preds = np.concatenate((kp_preds, ((kp_preds[5, :] + kp_preds[6, :]) / 2)[None]))
+            kp_scores = np.concatenate((kp_scores, ((kp_scores[5, :] + kp_scores[6, :]) / 2)[None]))
+            vis_thres.append(vis_thres[(- 1)])
+        if opt.tracking:
+            while isinstance(human['idx'], list):
+                human['idx'].sort()
+                human['idx'] = human['idx'][0]
+            color = get_color_fast(int(abs(human['idx'])))
+        else:
+            color = BLUE
+        if opt.showbox:
+            if ('box' in human.keys()):
+                bbox = human['box']
+                bbox = [bbox[0], (bbox[0] + bbox[2]), bbox[1], (bbox[1] + bbox[3])]
+            else:
+                from trackers.PoseFlow.poseflow_infer import get_box
+                keypoints = []
+                for n in range(kp_scores.shape[0]):
+                    keypoints.append(float(kp_preds[(n, 0)]))
+                    keypoints.append(float(kp_preds[(n, 1)]))
+                    keypoints.append(float(kp_scores[n]))
+                bbox = get_box(keypoints, height, width)
+            overlay.rectangle((int(bbox[0]), int(bbox[2])), (int(bbox[1]), int(bbox[3])), color, 1)
+            if opt.tracking:
+                overlay.text(str(human['idx']), (int(bbox[0]), int((bbox[2] + 26))), DEFAULT_FONT, 1, BLACK, 2)
+        for n in range(kp_scores.shape[0]):
+            if (kp_scores[n] <= vis_thres[n]):
+                continue
+            (cor_x, cor_y) = (int(kp_preds[(n, 0)]), int(kp_preds[(n, 1)]))
+            part_line[n] = (cor_x, cor_y)
+            if (n < len(p_color)):
+                transparency = float(max(0, min(1, kp_scores[n])))
+                overlay.circle((cor_x, cor_y), 2, (color if opt.tracking else p_color[n]), (- 1), transparency)
+            else:
+                transparency = float(max(0, min(1, (kp_scores[n] * 2))))
+                overlay.circle((cor_x, cor_y), 1, (255, 255, 255), 2, transparency)
+        for (i, (start_p, end_p)) in enumerate(l_pair):
+            if ((start_p in part_line) and (end_p in part_line)):
+                start_xy = part_line[start_p]
+                end_xy = part_line[end_p]
+                X = (start_xy[0], end_xy[0])
+                Y = (start_xy[1], end_xy[1])
+                mX = ((X[0] + X[1]) / 2)
+                mY = ((Y[0] + Y[1]) / 2)
+                length = ((((Y[0] - Y[1]) ** 2) + ((X[0] - X[1]) ** 2)) ** 0.5)
+                angle = math.degrees(math.atan2((Y[0] - Y[1]), (X[0] - X[1])))
+                stickwidth = ((kp_scores[start_p] + kp_scores[end_p]) + 1)
+                # as in vis_frame, n is the last keypoint index here
+                if (n < len(p_color)):
+                    transparency = float(max(0, min(1, ((0.5 * (kp_scores[start_p] + kp_scores[end_p])) - 0.1))))
+                else:
+                    transparency = float(max(0, min(1, (kp_scores[start_p] + kp_scores[end_p]))))
+                if (i < len(line_color)):
+                    polygon = cv2.ellipse2Poly((int(mX), int(mY)), (int((length / 2)), int(stickwidth)), int(angle), 0, 360, 1)
+                    overlay.convex_poly(polygon, (color if opt.tracking else line_color[i]), transparency)
+                else:
+                    overlay.line(start_xy, end_xy, (255, 255, 255), 1, transparency)
+    return overlay.composite(img)
+
 def vis_frame_smpl(frame, im_res, smpl_output, opt, vis_thres):
     '\n    frame: frame image\n    im_res: result dict\n    smpl_output: predictions\n\n    return rendered image\n    '
     img = frame.copy()
@@ -8,6 +8,9 @@ from queue import Queue
 import cv2
 import numpy as np
 from alphapose.utils.presets import SimpleTransform, SimpleTransform3DSMPL
+from alphapose.utils.detector import STATIC
+from alphapose.utils.motion_gate import MotionGate
+from alphapose.utils.roi import RegionOfInterest
 
 class WebCamDetectionLoader():
 
@@ -23,6 +26,11 @@ class WebCamDetectionLoader():
         self.videoinfo = {'fourcc': self.fourcc, 'fps': self.fps, 'frameSize': self.frameSize}
         stream.release()
         self.detector = detector
+        # fixed camera: detect on the bounding crop of the ROI only, drop the detections outside of it
+        self.roi = (RegionOfInterest.from_file(opt.roi, input_source) if getattr(opt, 'roi', '') else None)
+        # frames without motion skip detection and pose estimation
+        self.motion_gate = (MotionGate(opt.motion_thres) if (getattr(opt, 'motion_thres', 0) > 0) else None)
+        self.static_frames = 0
         self._input_size = cfg.DATA_PRESET.IMAGE_SIZE
         self._output_size = cfg.DATA_PRESET.HEATMAP_SIZE
         self._sigma = cfg.DATA_PRESET.SIGMA
@@ -73,9 +81,9 @@ class WebCamDetectionLoader():
         if (not self.stopped):
             queue.put(item)
 
-    def wait_and_get(self, queue):
+    def wait_and_get(self, queue, timeout=None):
         if (not self.stopped):
-            return queue.get()
+            return queue.get(timeout=timeout)
 
     def frame_preprocess(self):
         stream = cv2.VideoCapture(self.path)
@@ -87,15 +95,19 @@ class WebCamDetectionLoader():
             if not self.pose_queue.full():
                 (grabbed, frame) = stream.read()
                 if (not grabbed):
-                    self.wait_and_put(self.pose_queue, (None, None, None, None, None, None, None))
+                    self.wait_and_put(self.pose_queue, (None, None, None, None, None, None, None, None))
                     stream.release()
                     return
-                img_k = self.detector.image_preprocess(frame)
+                if ((self.motion_gate is not None) and (not self.motion_gate.moving(frame))):
+                    self.wait_and_put(self.pose_queue, (None, frame[:, :, ::(- 1)], (str(i) + '.jpg'), None, None, None, None, STATIC))
+                    continue
+                det_frame = (frame if (self.roi is None) else np.ascontiguousarray(self.roi.crop(frame)[0]))
+                img_k = self.detector.image_preprocess(det_frame)
                 if isinstance(img_k, np.ndarray):
                     img_k = jt.array(img_k)
                 if (img_k.ndim == 3):
                     img_k = img_k.unsqueeze(0)
-                im_dim_list_k = (frame.shape[1], frame.shape[0])
+                im_dim_list_k = (det_frame.shape[1], det_frame.shape[0])
                 orig_img = frame[:, :, ::(- 1)]
                 im_name = (str(i) + '.jpg')
                 with jt.no_grad():
@@ -108,7 +120,15 @@ class WebCamDetectionLoader():
         if ((img is None) or self.stopped):
             return (None, None, None, None, None, None, None)
         with jt.no_grad():
-            dets = self.detector.images_detection(img, im_dim_list)
+            if self.detector.tile_size:
+                det_frame = orig_img[:, :, ::(- 1)]
+                if (self.roi is not None):
+                    det_frame = self.roi.crop(det_frame)[0]
+                dets = self.detector.images_detection_tiled([np.ascontiguousarray(det_frame)])
+            else:
+                dets = self.detector.images_detection(img, im_dim_list)
+            if ((self.roi is not None) and (not isinstance(dets, int))):
+                dets = self.roi.restore((dets if isinstance(dets, np.ndarray) else dets.numpy()), [orig_img])
             if (isinstance(dets, int) or (dets.shape[0] == 0)):
                 return (orig_img, im_name, None, None, None, None, None)
             if isinstance(dets, np.ndarray):
@@ -123,26 +143,36 @@ class WebCamDetectionLoader():
         boxes_k = boxes[(dets[:, 0] == 0)]
         if (isinstance(boxes_k, int) or (boxes_k.shape[0] == 0)):
             return (orig_img, im_name, None, None, None, None, None)
-        inps = jt.zeros((boxes_k.shape[0], 3, *self._input_size))
-        cropped_boxes = jt.zeros((boxes_k.shape[0], 4))
-        return (orig_img, im_name, boxes_k, scores[(dets[:, 0] == 0)], ids[(dets[:, 0] == 0)], inps, cropped_boxes)
+        # the crops and their boxes are made by image_postprocess
+        return (orig_img, im_name, boxes_k, scores[(dets[:, 0] == 0)], ids[(dets[:, 0] == 0)], None, None)
 
     def image_postprocess(self, inputs):
         with jt.no_grad():
             (orig_img, im_name, boxes, scores, ids, inps, cropped_boxes) = inputs
             if ((orig_img is None) or self.stopped):
-                self.wait_and_put(self.pose_queue, (None, None, None, None, None, None, None))
+                self.wait_and_put(self.pose_queue, (None, None, None, None, None, None, None, None))
                 return
             if ((boxes is None) or (len(boxes) == 0)):
-                self.wait_and_put(self.pose_queue, (None, orig_img, im_name, boxes, scores, ids, None))
+                self.wait_and_put(self.pose_queue, (None, orig_img, im_name, boxes, scores, ids, None, None))
                 return
-            for (i, box) in enumerate(boxes):
-                (inps[i], cropped_box) = self.transformation.test_transform(orig_img, box)
-                cropped_boxes[i] = jt.float32(cropped_box)
-            self.wait_and_put(self.pose_queue, (inps, orig_img, im_name, boxes, scores, ids, cropped_boxes))
-
-    def read(self):
-        return self.wait_and_get(self.pose_queue)
+            (inps, cropped_boxes) = self.transformation.test_transform_batch(orig_img, boxes)
+            self.wait_and_put(self.pose_queue, (inps, orig_img, im_name, boxes, scores, ids, cropped_boxes, None))
+
+    def read(self, timeout=None):
+        """Next frame of the pose queue, raises queue.Empty when none comes within `timeout` seconds."""
+        return self.read_marked(timeout=timeout)[0]
+
+    def read_marked(self, timeout=None):
+        """
+        Next frame of the pose queue as read gives it, and its mark: STATIC for a frame without motion, whose
+        results the writer repeats, else None
+        """
+        item = self.wait_and_get(self.pose_queue, timeout=timeout)
+        if (item is None):
+            return (None, None)
+        if (item[7] == STATIC):
+            self.static_frames += 1
+        return (item[:7], item[7])
 
     @property
     def stopped(self):
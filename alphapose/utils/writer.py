@@ -8,8 +8,10 @@ from threading import Thread
 from queue import Queue
 import cv2
 import numpy as np
-from alphapose.utils.transforms import get_func_heatmap_to_coord
-from alphapose.utils.pPose_nms import pose_nms, write_json
+from alphapose.utils.transforms import get_func_heatmap_to_coord_batch
+from alphapose.utils.pPose_nms import ResultStream, pose_nms, write_json
+from alphapose.utils.render_pool import RenderPool
+from alphapose.utils.detector import STATIC
 import multiprocessing as mp
 DEFAULT_VIDEO_SAVE_OPT = {'savepath': 'examples/res/1.mp4', 'fourcc': cv2.VideoWriter_fourcc(*'mp4v'), 'fps': 25, 'frameSize': (640, 480)}
 EVAL_JOINTS = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16]
@@ -21,7 +23,11 @@ class DataWriter():
         self.video_save_opt = video_save_opt
         self.eval_joints = EVAL_JOINTS
         self.save_video = save_video
-        self.heatmap_to_coord = get_func_heatmap_to_coord(cfg)
+        # --stream_results/--fsync_interval/--render_workers only exist in demo_inference
+        self.stream_results = getattr(opt, 'stream_results', False)
+        self.fsync_interval = getattr(opt, 'fsync_interval', 100)
+        self.render_workers = getattr(opt, 'render_workers', 0)
+        self.heatmap_to_coord = get_func_heatmap_to_coord_batch(cfg)
         if opt.sp:
             self.result_queue = Queue(maxsize=queueSize)
         else:
@@ -31,7 +37,8 @@ class DataWriter():
                 os.mkdir((opt.outputpath + '/vis'))
         if opt.pose_flow:
             from trackers.PoseFlow.poseflow_infer import PoseFlowWrapper
-            self.pose_flow_wrapper = PoseFlowWrapper(save_path=os.path.join(opt.outputpath, 'poseflow'))
+            # the results of every frame are kept by the writer, not by the tracker
+            self.pose_flow_wrapper = PoseFlowWrapper(save_path=os.path.join(opt.outputpath, 'poseflow'), sink=(lambda frame_name, people: None))
         if (self.opt.save_img or self.save_video or self.opt.vis):
             loss_type = self.cfg.DATA_PRESET.get('LOSS_TYPE', 'MSELoss')
             num_joints = self.cfg.DATA_PRESET.NUM_JOINTS
@@ -62,6 +69,8 @@ class DataWriter():
 
     def update(self):
         final_result = []
+        if self.stream_results:
+            result_stream = ResultStream(self.opt.outputpath, for_eval=self.opt.eval, fsync_interval=self.fsync_interval)
         norm_type = self.cfg.LOSS.get('NORM_TYPE', None)
         hm_size = self.cfg.DATA_PRESET.HEATMAP_SIZE
         if self.save_video:
@@ -74,8 +83,14 @@ class DataWriter():
                 self.video_save_opt['savepath'] = (self.video_save_opt['savepath'][:(- 4)] + _ext)
                 stream = cv2.VideoWriter(*[self.video_save_opt[k] for k in ['savepath', 'fourcc', 'fps', 'frameSize']])
             assert stream.isOpened(), 'Cannot open video for writing'
+        render_pool = None
+        if ((self.render_workers > 0) and (self.opt.save_img or self.save_video or self.opt.vis)):
+            # rendering runs on the pool, and the frames are written in order by its sequencer
+            render_pool = RenderPool(self.render_workers, (lambda img, im_name: self.write_image(img, im_name, stream=(stream if self.save_video else None))), use_threads=self.opt.sp).start()
+        # result and renderer of the last frame with people, repeated for the static frames after it
+        last = None
         while True:
-            (boxes, scores, ids, hm_data, cropped_boxes, orig_img, im_name) = self.wait_and_get(self.result_queue)
+            (boxes, scores, ids, hm_data, cropped_boxes, orig_img, im_name, mark) = self.wait_and_get(self.result_queue)
 
             # tycoer
             if isinstance(boxes, jt.Var):
@@ -90,17 +105,35 @@ class DataWriter():
                 cropped_boxes = cropped_boxes.numpy()
 
             if (orig_img is None):
+                if self.opt.pose_flow:
+                    self.pose_flow_wrapper.close()
+                # the results are written first, a frame that failed to render does not lose them
+                if self.stream_results:
+                    result_stream.finalize(form=self.opt.format)
+                else:
+                    write_json(final_result, self.opt.outputpath, form=self.opt.format, for_eval=self.opt.eval)
+                print('Results have been written to json.')
+                if (render_pool is not None):
+                    error = render_pool.stop()
+                    if (error is not None):
+                        print('Some frames could not be rendered, the first error was:\n{}'.format(error.message))
                 if self.save_video:
                     stream.release()
-                write_json(final_result, self.opt.outputpath, form=self.opt.format, for_eval=self.opt.eval)
-                print('Results have been written to json.')
                 return
             orig_img = np.array(orig_img, dtype=np.uint8)[:, :, ::(- 1)]
-            if ((boxes is None) or (len(boxes) == 0)):
-                if (self.opt.save_img or self.save_video or self.opt.vis):
+            if ((mark == STATIC) and (last is not None)):
+                # static frame (--motion_thres)
+                (result, vis_frame) = ({'imgname': im_name, 'result': last[0]['result'], 'static': True}, last[1])
+            elif ((boxes is None) or (len(boxes) == 0)):
+                # also a static frame after a frame without people, the first frame is never static
+                last = None
+                if (render_pool is not None):
+                    render_pool.put(None, orig_img, None, self.opt, None, im_name)
+                elif (self.opt.save_img or self.save_video or self.opt.vis):
                     self.write_image(orig_img, im_name, stream=(stream if self.save_video else None))
+                continue
             else:
-                assert (hm_data.ndim == 4)
+                assert (hm_data.ndim in (3, 4))
                 face_hand_num = 110
                 if (hm_data.shape[1] == 136):
                     self.eval_joints = [*range(0, 136)]
@@ -113,27 +146,14 @@ class DataWriter():
                     self.eval_joints = [*range(0, 68)]
                 elif (hm_data.shape[1] == 21):
                     self.eval_joints = [*range(0, 21)]
-                pose_coords = []
-                pose_scores = []
-                for i in range(hm_data.shape[0]):
-                    bbox = cropped_boxes[i].tolist()
-                    if isinstance(self.heatmap_to_coord, list):
-                        (pose_coords_body_foot, pose_scores_body_foot) = self.heatmap_to_coord[0](hm_data[i][self.eval_joints[:(- face_hand_num)]], bbox, hm_shape=hm_size, norm_type=norm_type)
-                        (pose_coords_face_hand, pose_scores_face_hand) = self.heatmap_to_coord[1](hm_data[i][self.eval_joints[(- face_hand_num):]], bbox, hm_shape=hm_size, norm_type=norm_type)
-                        pose_coord = np.concatenate((pose_coords_body_foot, pose_coords_face_hand), axis=0)
-                        pose_score = np.concatenate((pose_scores_body_foot, pose_scores_face_hand), axis=0)
-                    else:
-                        (pose_coord, pose_score) = self.heatmap_to_coord(hm_data[i][self.eval_joints], bbox, hm_shape=hm_size, norm_type=norm_type)
-                    # pose_coords.append(jt.array(pose_coord).unsqueeze(0))
-                    # pose_scores.append(jt.array(pose_score).unsqueeze(0))
-                    # tycoer
-                    pose_coords.append(pose_coord)
-                    pose_scores.append(pose_score)
-                # tycoer
-                preds_img = np.float32(pose_coords)
-                preds_scores = np.float32(pose_scores)
-                # preds_img = jt.contrib.concat(pose_coords)
-                # preds_scores = jt.contrib.concat(pose_scores)
+                if (hm_data.ndim == 3):
+                    # already decoded by the pose loop (--device_decode), as (N, K, 3) of x, y, score
+                    preds_img = np.float32(hm_data[:, self.eval_joints, 0:2])
+                    preds_scores = np.float32(hm_data[:, self.eval_joints, 2:3])
+                else:
+                    (preds_img, preds_scores) = self.heatmap_to_coord(hm_data[:, self.eval_joints], cropped_boxes, hm_shape=hm_size, norm_type=norm_type, face_hand_num=face_hand_num)
+                    preds_img = np.float32(preds_img)
+                    preds_scores = np.float32(preds_scores)
 
                 if (not self.opt.pose_track):
                     (boxes, scores, ids, preds_img, preds_scores, pick_ids) = pose_nms(boxes, scores, ids, preds_img, preds_scores, self.opt.min_box_area, use_heatmap_loss=self.use_heatmap_loss)
@@ -151,14 +171,23 @@ class DataWriter():
                     poseflow_result = self.pose_flow_wrapper.step(orig_img, result)
                     for i in range(len(poseflow_result)):
                         result['result'][i]['idx'] = poseflow_result[i]['idx']
-                final_result.append(result)
+                vis_frame = None
                 if (self.opt.save_img or self.save_video or self.opt.vis):
                     if (hm_data.shape[1] == 49):
                         from alphapose.utils.vis import vis_frame_dense as vis_frame
                     elif self.opt.vis_fast:
                         from alphapose.utils.vis import vis_frame_fast as vis_frame
                     else:
-                        from alphapose.utils.vis import vis_frame
+                        from alphapose.utils.vis import vis_frame_composite as vis_frame
+                last = (result, vis_frame)
+            if self.stream_results:
+                result_stream.write(result)
+            else:
+                final_result.append(result)
+            if (self.opt.save_img or self.save_video or self.opt.vis):
+                if (render_pool is not None):
+                    render_pool.put(vis_frame, orig_img, result, self.opt, list(self.vis_thres), im_name)
+                else:
                     img = vis_frame(orig_img, result, self.opt, self.vis_thres)
                     self.write_image(img, im_name, stream=(stream if self.save_video else None))
 
@@ -177,8 +206,9 @@ class DataWriter():
     def wait_and_get(self, queue):
         return queue.get()
 
-    def save(self, boxes, scores, ids, hm_data, cropped_boxes, orig_img, im_name):
-        self.wait_and_put(self.result_queue, (boxes, scores, ids, hm_data, cropped_boxes, orig_img, im_name))
+    def save(self, boxes, scores, ids, hm_data, cropped_boxes, orig_img, im_name, mark=None):
+        """Queue the results of a frame, `mark` is STATIC for a frame that repeats the results of the one before."""
+        self.wait_and_put(self.result_queue, (boxes, scores, ids, hm_data, cropped_boxes, orig_img, im_name, mark))
 
     def running(self):
         return (not self.result_queue.empty())
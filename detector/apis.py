@@ -6,6 +6,10 @@
 """API of detector"""
 from abc import ABC, abstractmethod
 
+import cv2
+import jittor as jt
+import numpy as np
+
 
 def get_detector(opt=None):
     if opt.detector == 'yolo':
@@ -32,18 +36,144 @@ def get_detector(opt=None):
         raise NotImplementedError
 
 
+def tile_starts(length, tile_size, overlap):
+    """Start offsets of tiles of `tile_size` covering `length` pixels, neighbours overlapping by at least `overlap`"""
+    if (length <= tile_size):
+        return [0]
+    num = (- ((- (length - overlap)) // (tile_size - overlap)))
+    return [int(round(((i * (length - tile_size)) / (num - 1)))) for i in range(num)]
+
+
 class BaseDetector(ABC):
+    # tiled detection, see images_detection_tiled, off when tile_size is 0
+    tile_size = 0
+    tile_overlap = 0
+    tile_batch = 8
+
     def __init__(self):
         pass
 
+    def set_tiling(self, cfg):
+        self.tile_size = cfg.get('TILE_SIZE', 0)
+        self.tile_overlap = cfg.get('TILE_OVERLAP', 0)
+        self.tile_batch = cfg.get('TILE_BATCH', 8)
+        assert ((self.tile_size == 0) or (self.tile_overlap < self.tile_size)), 'TILE_OVERLAP must be smaller than TILE_SIZE'
+
     @abstractmethod
     def image_preprocess(self, img_name):
         pass
 
+    def image_preprocess_with_orig(self, img_source):
+        """
+        Decode the img at most once and pre-process it for the detection network
+        Input: image name(str) or already decoded image data(ndarray, channel BGR)
+        Output: pre-processed image data(jt.Var,(1,3,h,w)), original image data(ndarray, channel BGR)
+        """
+        if isinstance(img_source, str):
+            orig_img = cv2.imread(img_source)
+            if orig_img is None:
+                raise IOError('Cannot read image: {}'.format(img_source))
+        else:
+            orig_img = img_source
+        return self.image_preprocess(orig_img), orig_img
+
     @abstractmethod
     def images_detection(self, imgs, orig_dim_list):
         pass
 
+    def images_detection_tiled(self, orig_imgs):
+        """
+        Detect on overlapping tiles of the original images, for frames much larger than the network input
+        Input: orig_imgs: list of original images (ndarray, channel BGR)
+        Output: dets(jt.Var,(n,(batch_idx,x1,y1,x2,y2,c,s,idx of cls))): human detection results in original image coordinates, or 0
+        Each image is cut into tiles of tile_size pixels overlapping by tile_overlap, and is also detected as a whole
+        for the people larger than a tile. The views go through images_detection tile_batch at a time, so memory
+        does not grow with the frame size. Boxes touching a tile border inside the image are dropped as cut people,
+        the others are merged across tiles and with the whole image by nms.
+        """
+        from detector.nms.nms_wrapper import batched_nms
+        views = []
+        for (k, img) in enumerate(orig_imgs):
+            (h, w) = img.shape[:2]
+            views.append((k, 0, 0, w, h, w, h))
+            if (max(w, h) > self.tile_size):
+                for y0 in tile_starts(h, self.tile_size, self.tile_overlap):
+                    for x0 in tile_starts(w, self.tile_size, self.tile_overlap):
+                        views.append((k, x0, y0, min((x0 + self.tile_size), w), min((y0 + self.tile_size), h), w, h))
+        dets = []
+        for start in range(0, len(views), self.tile_batch):
+            chunk = views[start:(start + self.tile_batch)]
+            imgs = []
+            for (k, x0, y0, x1, y1, _, _) in chunk:
+                img = self.image_preprocess(orig_imgs[k][y0:y1, x0:x1])
+                img = (jt.array(img) if isinstance(img, np.ndarray) else img)
+                imgs.append((img.unsqueeze(0) if (img.ndim == 3) else img))
+            dims = [((x1 - x0), (y1 - y0)) for (_, x0, y0, x1, y1, _, _) in chunk]
+            # keep the batch shape of the network fixed, as DetectionLoader does
+            imgs += ([imgs[0]] * (self.tile_batch - len(chunk)))
+            dims += ([dims[0]] * (self.tile_batch - len(chunk)))
+            chunk_dets = self.images_detection(jt.concat(imgs), jt.float32(dims).repeat(1, 2))
+            if (isinstance(chunk_dets, int) or (chunk_dets.shape[0] == 0)):
+                continue
+            chunk_dets = (chunk_dets if isinstance(chunk_dets, np.ndarray) else chunk_dets.numpy())
+            chunk_dets = chunk_dets[(chunk_dets[:, 0] < len(chunk))]
+            # view of each box: image index, x0, y0, x1, y1 of the tile, w, h of the image
+            view = np.array(chunk, dtype=np.float32)[chunk_dets[:, 0].astype(np.int64)]
+            (start_cut, end_cut) = ((view[:, 1:3] > 0), (view[:, 3:5] < view[:, 5:7]))
+            margin = 2
+            cut = (((start_cut & (chunk_dets[:, 1:3] < margin)) | (end_cut & (chunk_dets[:, 3:5] > ((view[:, 3:5] - view[:, 1:3]) - margin)))).any(axis=1))
+            chunk_dets[:, 0] = view[:, 0]
+            chunk_dets[:, 1:5] += view[:, [1, 2, 1, 2]]
+            dets.append(chunk_dets[(~ cut)])
+        if ((len(dets) == 0) or (sum((len(d) for d in dets)) == 0)):
+            return 0
+        dets = jt.array(np.concatenate(dets))
+        keep = batched_nms(dets[:, 1:5], self.nms_scores(dets), dets[:, 0], self.nms_thres)
+        return dets[keep]
+
+    def rescale_dets(self, dets, orig_dim_list, inp_dim=None, center=True):
+        """
+        Map the boxes of the detections of a batch back to their original images and clip them to the images
+        Input: dets(jt.Var,(n,(batch_idx,x1,y1,x2,y2,...))): detections of the batch
+               orig_dim_list(jt.Var,(b,(w,h,w,h))): original mini-batch image size
+               inp_dim: size of the letterboxed network input, None if the boxes are already in original image scale
+               center: whether the letterbox pads the resized image on both sides or only right and bottom
+        Output: dets(jt.Var), the same detections with x1, y1, x2, y2 in original image coordinates
+        """
+        dims = orig_dim_list[dets[:, 0].long()]
+        boxes = dets[:, 1:5]
+        if (inp_dim is not None):
+            scaling_factor = jt.min((inp_dim / dims), 1).view((- 1), 1)
+            if center:
+                boxes = (boxes - ((inp_dim - (scaling_factor * dims)) / 2))
+            boxes = (boxes / scaling_factor)
+        dets[:, 1:5] = boxes.maximum(0.0).minimum(dims)
+        return dets
+
     @abstractmethod
     def detect_one_img(self, img_name):
         pass
+
+    def warmup(self, batch_size=1):
+        """
+        Load the model and run the detection once on a blank batch, so that loading the weights
+        and compiling the forward pass for this batch shape happen before the first frames come in
+        Input: batch_size: batch size the detector will be run with, e.g. --detbatch
+        """
+        if (not self.model):
+            self.load_model()
+        if self.tile_size:
+            batch_size = self.tile_batch
+        (w, h) = self.warmup_size()
+        imgs = jt.zeros((batch_size, 3, h, w))
+        orig_dim_list = jt.float32([[w, h]]).repeat(batch_size, 2)
+        self.images_detection(imgs, orig_dim_list)
+        jt.sync_all(True)
+
+    def warmup_size(self):
+        """(w, h) of the pre-processed images fed to the detection network"""
+        return (self.inp_dim, self.inp_dim)
+
+    def nms_scores(self, dets):
+        """Scores the detector ranks its detections (jt.Var,(n,8)) by in nms, the objectness c by default"""
+        return dets[:, 5]
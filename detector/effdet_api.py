@@ -96,33 +96,19 @@ class EffDetDetector(BaseDetector):
             scaling_factors = jt.float32([(1.0 / min((self.inp_dim / orig_dim[0]), (self.inp_dim / orig_dim[1]))) for orig_dim in orig_dim_list]).view((- 1), 1)
             # scaling_factors = (scaling_factors.to(args.device) if args else scaling_factors.cuda())
             prediction = self.model(imgs, scaling_factors)
-            prediction = prediction
-            write = False
-            for (index, sample) in enumerate(prediction):
-                for det in sample:
-                    score = float(det[4])
-                    if (score < 0.001):
-                        break
-                    if ((int(det[5]) != 1) or (score < self.confidence)):
-                        continue
-                    det_new = prediction.new(1, 8)
-                    det_new[(0, 0)] = index
-                    det_new[0, 1:3] = det[0:2]
-                    det_new[0, 3:5] = (det[0:2] + det[2:4])
-                    det_new[0, 6:7] = det[4]
-                    det_new[(0, 7)] = det[5]
-                    if (not write):
-                        dets = det_new
-                        write = True
-                    else:
-                        dets = jt.contrib.concat((dets, det_new))
-            if (not write):
+            dets = self.write_person_results(prediction)
+            if isinstance(dets, int):
                 return 0
-            orig_dim_list = orig_dim_list[dets[:, 0].long()]
-            for i in range(dets.shape[0]):
-                dets[(i, [1, 3])] = jt.clamp(dets[(i, [1, 3])], min_v=0.0, max_v=orig_dim_list[(i, 0)])
-                dets[(i, [2, 4])] = jt.clamp(dets[(i, [2, 4])], min_v=0.0, max_v=orig_dim_list[(i, 1)])
-            return dets
+            return self.rescale_dets(dets, orig_dim_list)
+
+    def write_person_results(self, prediction):
+        '\n        Person detections of the whole batch above the confidence threshold\n        Input: prediction(jt.Var,(b,max_dets,(x,y,w,h,score,class))): output of DetBenchEval, padded with zeros\n        Output: dets(jt.Var,(n,(batch_idx,x1,y1,x2,y2,c,s,idx of cls))), or 0 if there is no person\n        '
+        # the padding rows have a zero score, below the 0.001 floor of the detections
+        (batch_inds, det_inds) = jt.nonzero(((prediction[:, :, 5] == 1) & (prediction[:, :, 4] >= max(self.confidence, 0.001)))).transpose(0, 1)
+        if (batch_inds.shape[0] == 0):
+            return 0
+        det = prediction[(batch_inds, det_inds)]
+        return jt.stack([batch_inds.float32(), det[:, 0], det[:, 1], (det[:, 0] + det[:, 2]), (det[:, 1] + det[:, 3]), det[:, 4], det[:, 4], det[:, 5]], dim=1)
 
     def detect_one_img(self, img_name):
         '\n        Detect bboxs in one image\n        Input: \'str\', full path of image\n        Output: \'[{"category_id":1,"score":float,"bbox":[x,y,w,h],"image_id":str},...]\',\n        The output results are similar with coco results type, except that image_id uses full path str\n        instead of coco %012d id for generalization. \n        '
@@ -143,32 +129,11 @@ class EffDetDetector(BaseDetector):
             scaling_factor = jt.float32([(1 / min((self.inp_dim / orig_dim[0]), (self.inp_dim / orig_dim[1]))) for orig_dim in img_dim_list]).view((- 1), 1)
             # scaling_factor = (scaling_factor.to(args.device) if args else scaling_factor.cuda())
             prediction = self.model(img, scaling_factor)
-            prediction = prediction
-            write = False
-            for (index, sample) in enumerate(prediction):
-                for det in sample:
-                    score = float(det[4])
-                    if (score < 0.001):
-                        break
-                    if ((int(det[5]) != 1) or (score < self.confidence)):
-                        continue
-                    det_new = prediction.new(1, 8)
-                    det_new[(0, 0)] = index
-                    det_new[0, 1:3] = det[0:2]
-                    det_new[0, 3:5] = (det[0:2] + det[2:4])
-                    det_new[0, 6:7] = det[4]
-                    det_new[(0, 7)] = det[5]
-                    if (not write):
-                        dets = det_new
-                        write = True
-                    else:
-                        dets = jt.contrib.concat((dets, det_new))
-            if (not write):
+            dets = self.write_person_results(prediction)
+            if isinstance(dets, int):
                 return None
-            img_dim_list = img_dim_list[dets[:, 0].long()]
+            dets = self.rescale_dets(dets, img_dim_list).numpy()
             for i in range(dets.shape[0]):
-                dets[(i, [1, 3])] = jt.clamp(dets[(i, [1, 3])], min_v=0.0, max_v=img_dim_list[(i, 0)])
-                dets[(i, [2, 4])] = jt.clamp(dets[(i, [2, 4])], min_v=0.0, max_v=img_dim_list[(i, 1)])
                 det_dict = {}
                 x = float(dets[(i, 1)])
                 y = float(dets[(i, 2)])
@@ -6,6 +6,7 @@ from jittor import init
 import collections
 import numpy as np
 from jittor import nn
+from detector.nms.nms_wrapper import batched_nms
 from .object_detection import argmax_matcher
 from .object_detection import box_list
 from .object_detection import faster_rcnn_box_coder
@@ -15,6 +16,8 @@ MIN_CLASS_SCORE = (- 5.0)
 _DUMMY_DETECTION_SCORE = (- 100000.0)
 MAX_DETECTION_POINTS = 5000
 MAX_DETECTIONS_PER_IMAGE = 100
+# detections scoring lower are the zero padding for the callers, so they can be dropped before the nms
+MIN_DETECTION_SCORE = 0.001
 
 def decode_box_outputs(rel_codes, anchors, output_xyxy=False):
     'Transforms relative regression coordinates to absolute positions.\n\n    Network predictions are normalized and relative to a given anchor; this\n    reverses the transformation and outputs absolute coordinates for the input image.\n\n    Args:\n        rel_codes: box regression targets.\n\n        anchors: anchors on all feature levels.\n\n    Returns:\n        outputs: bounding boxes.\n\n    '
@@ -72,27 +75,33 @@ def _generate_anchor_boxes(image_size, anchor_scale, anchor_configs):
     anchor_boxes = np.vstack(boxes_all)
     return anchor_boxes
 
-def generate_detections(cls_outputs, box_outputs, anchor_boxes, indices, classes, image_scale, nms_thres=0.5, max_dets=100):
-    'Generates detections with RetinaNet model outputs and anchors.\n\n    Args:\n        cls_outputs: a torch tensor with shape [N, 1], which has the highest class\n            scores on all feature levels. The N is the number of selected\n            top-K total anchors on all levels.  (k being MAX_DETECTION_POINTS)\n\n        box_outputs: a torch tensor with shape [N, 4], which stacks box regression\n            outputs on all feature levels. The N is the number of selected top-k\n            total anchors on all levels. (k being MAX_DETECTION_POINTS)\n\n        anchor_boxes: a torch tensor with shape [N, 4], which stacks anchors on all\n            feature levels. The N is the number of selected top-k total anchors on all levels.\n\n        indices: a torch tensor with shape [N], which is the indices from top-k selection.\n\n        classes: a torch tensor with shape [N], which represents the class\n            prediction on all selected anchors from top-k selection.\n\n        image_scale: a float tensor representing the scale between original image\n            and input image for the detector. It is used to rescale detections for\n            evaluating with the original groundtruth annotations.\n\n    Returns:\n        detections: detection results in a tensor with shape [MAX_DETECTION_POINTS, 6],\n            each row representing [x, y, width, height, score, class]\n    '
-    anchor_boxes = anchor_boxes[indices, :]
-    boxes = decode_box_outputs(box_outputs.T.float(), anchor_boxes.T, output_xyxy=True)
-    scores = cls_outputs.sigmoid().squeeze(1).float()
-    human_idx = (classes == 0)
-    boxes = boxes[human_idx]
-    scores = scores[human_idx]
-    classes = classes[human_idx]
-    top_detection_idx = batched_nms(boxes, scores, classes, iou_threshold=nms_thres)
-    top_detection_idx = top_detection_idx[:max_dets]
+def generate_detections(cls_outputs, box_outputs, anchor_boxes, indices, classes, image_scales, nms_thres=0.5, max_dets=100):
+    'Generates detections with RetinaNet model outputs and anchors, for a whole batch at once.\n\n    Args:\n        cls_outputs: a jittor var with shape [B, N, 1], which has the highest class\n            scores on all feature levels. The N is the number of selected\n            top-K total anchors on all levels.  (k being MAX_DETECTION_POINTS)\n\n        box_outputs: a jittor var with shape [B, N, 4], which stacks box regression\n            outputs on all feature levels. The N is the number of selected top-k\n            total anchors on all levels. (k being MAX_DETECTION_POINTS)\n\n        anchor_boxes: a jittor var with shape [A, 4], which stacks the anchors on all\n            feature levels.\n\n        indices: a jittor var with shape [B, N], which is the indices from top-k selection.\n\n        classes: a jittor var with shape [B, N], which represents the class\n            prediction on all selected anchors from top-k selection.\n\n        image_scales: a float var with shape [B, 1] representing the scale between original\n            image and input image for the detector. It is used to rescale detections for\n            evaluating with the original groundtruth annotations.\n\n    Returns:\n        detections: detection results in a var with shape [B, max_dets, 6],\n            each row representing [x, y, width, height, score, class], by decreasing\n            score, padded with zeros. Detections below MIN_DETECTION_SCORE are dropped.\n    '
+    (batch_size, num_points) = indices.shape
+    anchor_boxes = anchor_boxes[indices.reshape((- 1))]
+    boxes = decode_box_outputs(box_outputs.reshape(((- 1), 4)).transpose(1, 0).float(), anchor_boxes.transpose(1, 0), output_xyxy=True)
+    scores = cls_outputs.sigmoid().reshape((- 1)).float()
+    classes = classes.reshape((- 1))
+    batch_idx = jt.index((batch_size, num_points), dim=0).reshape((- 1))
+    detections = jt.zeros((batch_size, max_dets, 6), dtype=boxes.dtype)
+    human_idx = ((classes == 0) & (scores >= MIN_DETECTION_SCORE))
+    (boxes, scores, classes, batch_idx) = (boxes[human_idx], scores[human_idx], classes[human_idx], batch_idx[human_idx])
+    if (boxes.shape[0] == 0):
+        return detections
+    top_detection_idx = batched_nms(boxes, scores, batch_idx, nms_thres)
+    batch_idx = batch_idx[top_detection_idx]
+    # the kept boxes come by image and by decreasing score, so the rank in its image is the position after those of the images before
+    rank = (jt.index(batch_idx.shape, dim=0) - (batch_idx.unsqueeze(0) < jt.index((batch_size, 1), dim=0)).int32().sum(1)[batch_idx])
+    top_rank = (rank < max_dets)
+    (top_detection_idx, batch_idx, rank) = (top_detection_idx[top_rank], batch_idx[top_rank], rank[top_rank])
     boxes = boxes[top_detection_idx]
     scores = scores[(top_detection_idx, None)]
     classes = classes[(top_detection_idx, None)]
     boxes[:, 2] -= boxes[:, 0]
     boxes[:, 3] -= boxes[:, 1]
-    boxes *= image_scale
+    boxes *= image_scales.reshape((- 1))[batch_idx].unsqueeze(1)
     classes += 1
-    detections = jt.contrib.concat([boxes, scores, classes.float()], dim=1)
-    if (len(top_detection_idx) < max_dets):
-        detections = jt.contrib.concat([detections, jt.zeros(((max_dets - len(top_detection_idx)), 6), dtype=detections.dtype)], dim=0)
+    detections[(batch_idx, rank)] = jt.contrib.concat([boxes, scores, classes.float()], dim=1)
     return detections
 
 class Anchors(nn.Module):
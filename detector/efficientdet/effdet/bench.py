@@ -31,11 +31,7 @@ class DetBenchEval(nn.Module):
     def execute(self, x, image_scales):
         (class_out, box_out) = self.model(x)
         (class_out, box_out, indices, classes) = _post_process(self.config, class_out, box_out)
-        batch_detections = []
-        for i in range(x.shape[0]):
-            detections = generate_detections(class_out[i], box_out[i], self.anchors.boxes, indices[i], classes[i], image_scales[i], nms_thres=self.nms_thres, max_dets=self.max_dets)
-            batch_detections.append(detections)
-        return jt.stack(batch_detections, dim=0)
+        return generate_detections(class_out, box_out, self.anchors.boxes, indices, classes, image_scales, nms_thres=self.nms_thres, max_dets=self.max_dets)
 
 class DetBenchTrain(nn.Module):
 
@@ -8,6 +8,36 @@ def nms(boxes,scores,thresh):
     dets = jt.concat([boxes,scores],dim=1)
     return jt.nms(dets,thresh)
 
+def batched_nms(boxes,scores,idxs,thresh):
+    """NMS run separately for every value of `idxs` (e.g. the image of each box of a batch), in one pass.
+
+    Args:
+        boxes (Var): shape (n, 4), x1, y1, x2, y2
+        scores (Var): shape (n) or (n, 1)
+        idxs (Var): shape (n) or (n, 1), boxes with different idxs never suppress each other
+        thresh (float): NMS IoU threshold
+
+    Returns:
+        Var: indices of the kept boxes, grouped by increasing idxs and by decreasing
+            score within a group, the order of `nms` run on each group in turn.
+    """
+    assert boxes.shape[-1]==4 and len(scores)==len(boxes)==len(idxs)
+    scores = scores.reshape((-1,1))
+    idxs = idxs.reshape((-1,1)).float32()
+    # scores are in [0, 1] for the detectors, so this key sorts by group first, exactly in float64
+    order = jt.argsort((idxs.float64()*4-scores.float64()).reshape(-1))[0]
+    dets = jt.concat([boxes,scores,idxs],dim=1)[order]
+    threshold = str(thresh)
+    s_1 = '(@x(j,2)-@x(j,0)+1)*(@x(j,3)-@x(j,1)+1)'
+    s_2 = '(@x(i,2)-@x(i,0)+1)*(@x(i,3)-@x(i,1)+1)'
+    s_inter_w = 'max((Tx)0,min(@x(j,2),@x(i,2))-max(@x(j,0),@x(i,0))+1)'
+    s_inter_h = 'max((Tx)0,min(@x(j,3),@x(i,3))-max(@x(j,1),@x(i,1))+1)'
+    s_inter = s_inter_h+'*'+s_inter_w
+    iou = s_inter + '/(' + s_1 +'+' + s_2 + '-' + s_inter + ')'
+    fail_cond = '(@x(j,5)==@x(i,5))&&(' + iou + '>' + threshold + ')'
+    selected = jt.candidate(dets, fail_cond)
+    return order[selected]
+
 def multiclass_nms(mlvl_bboxes, mlvl_scores, score_thr, nms, max_per_img=-1):
     """NMS for multi-class bboxes.
 
@@ -1,7 +1,7 @@
 
+from __future__ import division
 import jittor as jt
 from jittor import init
-from __future__ import division
 from jittor import nn
 import numpy as np
 import cv2
@@ -63,6 +63,18 @@ class Tracker(BaseDetector):
             raise IOError('Unknown image source type: {}'.format(type(img_source)))
         return img
 
+    def warmup(self, batch_size=1):
+        """
+        Load the model and run the network once on a blank batch, images_detection would also start the tracks
+        Input: batch_size: batch size the tracker will be run with
+        """
+        if (not self.model):
+            self.load_model()
+        (w, h) = self.img_size
+        with jt.no_grad():
+            self.model(jt.zeros((batch_size, 3, h, w)))
+        jt.sync_all(True)
+
     def images_detection(self, imgs, orig_dim_list):
         '\n        Feed the img data into object detection network and \n        collect bbox w.r.t original image size\n        Input: imgs(torch.FloatTensor,(b,3,h,w)): pre-processed mini-batch image input\n               orig_dim_list(torch.FloatTensor, (b,(w,h,w,h))): original mini-batch image size\n        Output: dets(torch.cuda.FloatTensor,(n,(batch_idx,x1,y1,x2,y2,c,s,idx of cls))): human detection results\n        '
         args = self.tracker_opt
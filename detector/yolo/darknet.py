@@ -288,11 +288,11 @@ class Darknet(nn.Module):
             return 0
 
     def load_weights(self, weightfile):
-        fp = open(weightfile, 'rb')
-        header = np.fromfile(fp, dtype=np.int32, count=5)
+        header = np.fromfile(weightfile, dtype=np.int32, count=5)
         self.header = jt.array(header)
         self.seen = self.header[3]
-        weights = np.fromfile(fp, dtype=np.float32)
+        # after the header the file is one float32 array in layer order, mapped rather than read up front
+        weights = np.asarray(np.memmap(weightfile, dtype=np.float32, mode='r', offset=header.nbytes))
         ptr = 0
         for i in range(len(self.module_list)):
             module_type = self.blocks[(i + 1)]['type']
@@ -314,10 +314,10 @@ class Darknet(nn.Module):
                     ptr += num_bn_biases
                     bn_running_var = jt.array(weights[ptr:(ptr + num_bn_biases)])
                     ptr += num_bn_biases
-                    bn_biases = bn_biases.view_as(bn.bias.data)
-                    bn_weights = bn_weights.view_as(bn.weight.data)
-                    bn_running_mean = bn_running_mean.view_as(bn.running_mean)
-                    bn_running_var = bn_running_var.view_as(bn.running_var)
+                    bn_biases = bn_biases.reshape(bn.bias.shape)
+                    bn_weights = bn_weights.reshape(bn.weight.shape)
+                    bn_running_mean = bn_running_mean.reshape(bn.running_mean.shape)
+                    bn_running_var = bn_running_var.reshape(bn.running_var.shape)
                     bn.bias=(bn_biases)
                     bn.weight=(bn_weights)
                     bn.running_mean=(bn_running_mean)
@@ -326,12 +326,12 @@ class Darknet(nn.Module):
                     num_biases = conv.bias.numel()
                     conv_biases = jt.array(weights[ptr:(ptr + num_biases)])
                     ptr = (ptr + num_biases)
-                    conv_biases = conv_biases.view_as(conv.bias.data)
+                    conv_biases = conv_biases.reshape(conv.bias.shape)
                     conv.bias=(conv_biases)
                 num_weights = conv.weight.numel()
                 conv_weights = jt.array(weights[ptr:(ptr + num_weights)])
                 ptr = (ptr + num_weights)
-                conv_weights = conv_weights.view_as(conv.weight.data)
+                conv_weights = conv_weights.reshape(conv.weight.shape)
                 conv.weight=(conv_weights)
 
     def save_weights(self, savedfile, cutoff=0):
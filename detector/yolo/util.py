@@ -22,6 +22,25 @@ def convert2cpu(matrix):
     else:
         return matrix
 
+# constant x/y offsets and anchor sizes of the YOLO heads, see get_grid_offsets
+_grid_offsets = {}
+
+def get_grid_offsets(grid_size, anchors, num_anchors):
+    """
+    x/y offsets of the grid cells and anchor sizes, in grid units, for the rows of a YOLO head
+    Input: grid_size, anchors: (w, h) of each anchor in grid units, num_anchors
+    Output: x_y_offset(jt.Var,(1,grid_size*grid_size*num_anchors,2)), anchors(jt.Var,(1,grid_size*grid_size*num_anchors,2))
+    They only depend on the head and the input size, so they are built once and cached.
+    """
+    key = (grid_size, tuple(anchors), num_anchors)
+    if (key not in _grid_offsets):
+        grid_len = np.arange(grid_size)
+        (a, b) = np.meshgrid(grid_len, grid_len)
+        x_y_offset = np.repeat(np.stack((a.reshape((- 1)), b.reshape((- 1))), axis=1), num_anchors, axis=0)
+        anchor_wh = np.tile(np.float32(anchors), ((grid_size * grid_size), 1))
+        _grid_offsets[key] = (jt.float32(x_y_offset).unsqueeze(0), jt.float32(anchor_wh).unsqueeze(0))
+    return _grid_offsets[key]
+
 def predict_transform(prediction, inp_dim, anchors, num_classes, args):
     batch_size = prediction.shape[0]
     stride = (inp_dim // prediction.shape[2])
@@ -32,31 +51,12 @@ def predict_transform(prediction, inp_dim, anchors, num_classes, args):
     prediction = prediction.view((batch_size, (bbox_attrs * num_anchors), (grid_size * grid_size)))
     prediction = prediction.transpose(1, 2)
     prediction = prediction.view((batch_size, ((grid_size * grid_size) * num_anchors), bbox_attrs))
-    prediction[:, :, 0] = jt.sigmoid(prediction[:, :, 0])
-    prediction[:, :, 1] = jt.sigmoid(prediction[:, :, 1])
-    prediction[:, :, 4] = jt.sigmoid(prediction[:, :, 4])
-    grid_len = np.arange(grid_size)
-    (a, b) = np.meshgrid(grid_len, grid_len)
-    x_offset = jt.float32(a).view(((- 1), 1))
-    y_offset = jt.float32(b).view(((- 1), 1))
-    # if args:
-    #     x_offset = x_offset.to(args.device)
-    #     y_offset = y_offset.to(args.device)
-    # else:
-    #     x_offset = x_offset
-    #     y_offset = y_offset
-    x_y_offset = jt.concat((x_offset, y_offset), 1).repeat(1, num_anchors).view(((- 1), 2)).unsqueeze(0)
-    prediction[:, :, :2] += x_y_offset
-    anchors = jt.float32(anchors)
-    # if args:
-    #     anchors = anchors.to(args.device)
-    # else:
-    #     anchors = anchors
-    anchors = anchors.repeat((grid_size * grid_size), 1).unsqueeze(0)
-    prediction[:, :, 2:4] = (jt.exp(prediction[:, :, 2:4]) * anchors)
-    prediction[:, :, 5:(5 + num_classes)] = jt.sigmoid(prediction[:, :, 5:(5 + num_classes)])
-    prediction[:, :, :4] *= stride
-    return prediction
+    (x_y_offset, anchors) = get_grid_offsets(grid_size, anchors, num_anchors)
+    # one fused decode into a single new layout: center, size, then objectness and class scores
+    box_xy = ((jt.sigmoid(prediction[:, :, :2]) + x_y_offset) * stride)
+    box_wh = ((jt.exp(prediction[:, :, 2:4]) * anchors) * stride)
+    scores = jt.sigmoid(prediction[:, :, 4:(5 + num_classes)])
+    return jt.concat((box_xy, box_wh, scores), dim=2)
 
 def load_classes(namesfile):
     fp = open(namesfile, 'r')
@@ -29,6 +29,7 @@ class YOLODetector(BaseDetector):
         self.nms_thres = cfg.get('NMS_THRES', 0.6)
         self.confidence = (0.3 if (False if (not hasattr(opt, 'tracking')) else opt.tracking) else cfg.get('CONFIDENCE', 0.05))
         self.num_classes = cfg.get('NUM_CLASSES', 80)
+        self.set_tiling(cfg)
         self.model = None
 
     def load_model(self):
@@ -71,17 +72,18 @@ class YOLODetector(BaseDetector):
             dets = self.dynamic_write_results(prediction, self.confidence, self.num_classes, nms=True, nms_conf=self.nms_thres)
             if (isinstance(dets, int) or (dets.shape[0] == 0)):
                 return 0
-            orig_dim_list = orig_dim_list[dets[:, 0].long()]
-            scaling_factor = jt.min((self.inp_dim / orig_dim_list), 1)[0].view((- 1), 1)
-            dets[:, [1, 3]] -= ((self.inp_dim - (scaling_factor * orig_dim_list[:, 0].view(((- 1), 1)))) / 2)
-            dets[:, [2, 4]] -= ((self.inp_dim - (scaling_factor * orig_dim_list[:, 1].view(((- 1), 1)))) / 2)
-            dets[:, 1:5] /= scaling_factor
-            for i in range(dets.shape[0]):
-                dets[(i, [1, 3])] = jt.clamp(dets[(i, [1, 3])], min_v=0.0, max_v=orig_dim_list[(i, 0)])
-                dets[(i, [2, 4])] = jt.clamp(dets[(i, [2, 4])], min_v=0.0, max_v=orig_dim_list[(i, 1)])
-            return dets
+            return self.rescale_dets(dets, orig_dim_list, self.inp_dim)
 
     def dynamic_write_results(self, prediction, confidence, num_classes, nms=True, nms_conf=0.4):
+        if (platform.system() != 'Windows'):
+            dets = self.write_person_results(prediction, confidence, num_classes)
+            if (isinstance(dets, int) or (not nms)):
+                return dets
+            keep = nms_wrapper.batched_nms(dets[:, 1:5], dets[:, 5], dets[:, 0], nms_conf)
+            if (keep.shape[0] > 100):
+                # only the nms runs again on the same candidates
+                keep = nms_wrapper.batched_nms(dets[:, 1:5], dets[:, 5], dets[:, 0], (nms_conf - 0.05))
+            return dets[keep]
         prediction_bak = prediction.clone()
         dets = self.write_results(prediction.clone(), confidence, num_classes, nms, nms_conf)
         if isinstance(dets, int):
@@ -91,6 +93,23 @@ class YOLODetector(BaseDetector):
             dets = self.write_results(prediction_bak.clone(), confidence, num_classes, nms, nms_conf)
         return dets
 
+    def write_person_results(self, prediction, confidence, num_classes):
+        '\n        Person candidates of the whole batch, the boxes write_results keeps before the nms\n        Input: prediction(jt.Var,(b,n,5+num_classes)): center x, center y, w, h, objectness and class scores\n        Output: dets(jt.Var,(n,(batch_idx,x1,y1,x2,y2,c,s,idx of cls))), or 0 if there is no candidate\n        '
+        (batch_inds, anchor_inds) = jt.nonzero((prediction[:, :, 4] > confidence)).transpose(0, 1)
+        if (batch_inds.shape[0] == 0):
+            return 0
+        image_pred = prediction[(batch_inds, anchor_inds)]
+        class_scores = image_pred[:, 5:(5 + num_classes)]
+        # argmax keeps the first of equal scores, so a box is a person as soon as no class scores higher
+        max_conf = class_scores.max(dim=1)
+        is_person = ((class_scores[:, 0] >= max_conf) & (max_conf != 0))
+        person_inds = jt.nonzero(is_person).reshape((- 1))
+        if (person_inds.shape[0] == 0):
+            return 0
+        (image_pred, max_conf) = (image_pred[person_inds], max_conf[person_inds])
+        (x, y, w, h) = (image_pred[:, 0], image_pred[:, 1], image_pred[:, 2], image_pred[:, 3])
+        return jt.stack([batch_inds[person_inds].float32(), (x - (w / 2)), (y - (h / 2)), (x + (w / 2)), (y + (h / 2)), image_pred[:, 4], max_conf, jt.zeros_like(max_conf)], dim=1)
+
     def write_results(self, prediction, confidence, num_classes, nms=True, nms_conf=0.4):
         args = self.detector_opt
         conf_mask = (prediction[:, :, 4] > confidence).float().float().unsqueeze(2)
@@ -179,14 +198,8 @@ class YOLODetector(BaseDetector):
             if (isinstance(dets, int) or (dets.shape[0] == 0)):
                 return None
             # dets = dets.cpu()
-            img_dim_list = img_dim_list[dets[:, 0].long()]
-            scaling_factor = jt.min((self.inp_dim / img_dim_list), 1).view((- 1), 1)
-            dets[:, [1, 3]] -= ((self.inp_dim - (scaling_factor * img_dim_list[:, 0].view(((- 1), 1)))) / 2)
-            dets[:, [2, 4]] -= ((self.inp_dim - (scaling_factor * img_dim_list[:, 1].view(((- 1), 1)))) / 2)
-            dets[:, 1:5] /= scaling_factor
+            dets = self.rescale_dets(dets, img_dim_list, self.inp_dim).numpy()
             for i in range(dets.shape[0]):
-                dets[(i, [1, 3])] = jt.clamp(dets[(i, [1, 3])], min_v=0.0, max_v=img_dim_list[(i, 0)])
-                dets[(i, [2, 4])] = jt.clamp(dets[(i, [2, 4])], min_v=0.0, max_v=img_dim_list[(i, 1)])
                 det_dict = {}
                 x = float(dets[(i, 1)])
                 y = float(dets[(i, 2)])
@@ -7,3 +7,7 @@ cfg.INP_DIM =  608
 cfg.NMS_THRES =  0.6
 cfg.CONFIDENCE = 0.1
 cfg.NUM_CLASSES = 80
+# tiled detection for frames much larger than INP_DIM, TILE_SIZE 0 detects on the whole frame only
+cfg.TILE_SIZE = 0
+cfg.TILE_OVERLAP = 128
+cfg.TILE_BATCH = 8
@@ -3,10 +3,10 @@ import jittor as jt
 from jittor import init
 from jittor import nn
 import numpy as np
-from detector.nms.nms_wrapper import nms, multiclass_nms
+from detector.nms.nms_wrapper import nms, batched_nms, multiclass_nms
 
 
-__all__ = ['filter_box', 'postprocess', 'bboxes_iou', 'matrix_iou', 'adjust_box_anns', 'xyxy2xywh', 'xyxy2cxcywh']
+__all__ = ['filter_box', 'postprocess', 'postprocess_candidates', 'postprocess_nms', 'bboxes_iou', 'matrix_iou', 'adjust_box_anns', 'xyxy2xywh', 'xyxy2cxcywh']
 
 def filter_box(output, scale_range):
     '\n    output: (N, 5+class) shape\n    '
@@ -17,36 +17,32 @@ def filter_box(output, scale_range):
     return output[keep]
 
 def postprocess(prediction, num_classes, conf_thre=0.7, nms_thre=0.45, classes=0, class_agnostic=False):
-    box_corner = jt.rand(prediction.shape)
-    box_corner[:, :, 0] = (prediction[:, :, 0] - (prediction[:, :, 2] / 2))
-    box_corner[:, :, 1] = (prediction[:, :, 1] - (prediction[:, :, 3] / 2))
-    box_corner[:, :, 2] = (prediction[:, :, 0] + (prediction[:, :, 2] / 2))
-    box_corner[:, :, 3] = (prediction[:, :, 1] + (prediction[:, :, 3] / 2))
-    prediction[:, :, :4] = box_corner[:, :, :4]
-    output = 0
-    for (i, image_pred) in enumerate(prediction):
-        if (not image_pred.shape[0]):
-            continue
-        (class_pred, class_conf) = jt.argmax(image_pred[:, 5:(5 + num_classes)], dim=1, keepdims=True)
-        conf_mask = ((image_pred[:, 4] * class_conf.squeeze(-1)) >= conf_thre).flatten()
-        detections = jt.contrib.concat((image_pred[:, :5], class_conf, class_pred.float()), dim=1)
-        detections = detections[conf_mask]
-        if (classes is not None):
-            detections = detections[(detections[:, 6:7] == jt.array(classes)).any(1)]
-        if (not detections.shape[0]):
-            continue
-        if class_agnostic:
-            nms_out_index = nms(detections[:, :4], (detections[:, 4] * detections[:, 5]), nms_thre)
-        else:
-            nms_out_index = nms(detections[:, :4], (detections[:, 4] * detections[:, 5]), nms_thre)
-        detections = detections[nms_out_index]
-        batch_idx = jt.full_like(jt.rand(detections.shape[0], 1), i)
-        detections = jt.contrib.concat((batch_idx, detections), dim=1)
-        if (isinstance(output, int) and (output == 0)):
-            output = detections
-        else:
-            output = jt.contrib.concat((output, detections))
-    return output
+    # the nms is class agnostic either way, only the boxes of one image suppress each other
+    dets = postprocess_candidates(prediction, num_classes, conf_thre=conf_thre, classes=classes)
+    if isinstance(dets, int):
+        return dets
+    return postprocess_nms(dets, nms_thre=nms_thre)
+
+def postprocess_candidates(prediction, num_classes, conf_thre=0.7, classes=0):
+    '\n    Candidates of the whole batch, the boxes postprocess keeps before the nms\n    Input: prediction(jt.Var,(b,n,5+num_classes)): center x, center y, w, h, objectness and class scores\n    Output: dets(jt.Var,(n,(batch_idx,x1,y1,x2,y2,obj,class_conf,class_pred))), or 0 if there is no candidate\n    '
+    (class_pred, class_conf) = jt.argmax(prediction[:, :, 5:(5 + num_classes)], dim=2)
+    keep = ((prediction[:, :, 4] * class_conf) >= conf_thre)
+    if (classes is not None):
+        in_classes = (class_pred == int(np.atleast_1d(classes)[0]))
+        for c in np.atleast_1d(classes)[1:]:
+            in_classes = (in_classes | (class_pred == int(c)))
+        keep = (keep & in_classes)
+    (batch_inds, anchor_inds) = jt.nonzero(keep).transpose(0, 1)
+    if (batch_inds.shape[0] == 0):
+        return 0
+    image_pred = prediction[(batch_inds, anchor_inds)]
+    (x, y, w, h) = (image_pred[:, 0], image_pred[:, 1], image_pred[:, 2], image_pred[:, 3])
+    return jt.stack([batch_inds.float32(), (x - (w / 2)), (y - (h / 2)), (x + (w / 2)), (y + (h / 2)), image_pred[:, 4], class_conf[(batch_inds, anchor_inds)], class_pred[(batch_inds, anchor_inds)].float32()], dim=1)
+
+def postprocess_nms(dets, nms_thre=0.45):
+    '\n    One nms over the candidates of all the images of a batch, the boxes of different images never suppress each other\n    Input: dets(jt.Var,(n,8)): output of postprocess_candidates\n    Output: jt.Var,(k,8): the kept candidates, by image and by decreasing score\n    '
+    keep = batched_nms(dets[:, 1:5], (dets[:, 5] * dets[:, 6]), dets[:, 0], nms_thre)
+    return dets[keep]
 
 def bboxes_iou(bboxes_a, bboxes_b, xyxy=True):
     if ((bboxes_a.shape[1] != 4) or (bboxes_b.shape[1] != 4)):
@@ -9,7 +9,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 import numpy as np
 from yolox.yolox.exp import get_exp
 from yolox.utils import prep_image, prep_frame
-from yolox.yolox.utils import postprocess
+from yolox.yolox.utils import postprocess_candidates, postprocess_nms
 from detector.apis import BaseDetector
 
 class YOLOXDetector(BaseDetector):
@@ -26,6 +26,7 @@ class YOLOXDetector(BaseDetector):
         self.nms_thres = cfg.get('NMS_THRES', 0.6)
         self.inp_dim = cfg.get('INP_DIM', 640)
         self.img_size = [self.inp_dim, self.inp_dim]
+        self.set_tiling(cfg)
         self.model = None
 
     def load_model(self):
@@ -68,23 +69,21 @@ class YOLOXDetector(BaseDetector):
             if (isinstance(dets, int) or (dets.shape[0] == 0)):
                 return 0
             # dets = dets.cpu()
-            orig_dim_list = orig_dim_list[dets[:, 0].long()]
-            scaling_factor = jt.min((self.inp_dim / orig_dim_list), 1).view((- 1), 1)
-            dets[:, 1:5] /= scaling_factor
-            for i in range(dets.shape[0]):
-                dets[(i, [1, 3])] = jt.clamp(dets[(i, [1, 3])], min_v=0.0, max_v=orig_dim_list[(i, 0)])
-                dets[(i, [2, 4])] = jt.clamp(dets[(i, [2, 4])], min_v=0.0, max_v=orig_dim_list[(i, 1)])
-            return dets
+            return self.rescale_dets(dets, orig_dim_list, self.inp_dim, center=False)
 
     def dynamic_write_results(self, prediction, num_classes, conf_thres, nms_thres, classes=0):
-        prediction_bak = prediction.clone()
-        dets = postprocess(prediction.clone(), num_classes=num_classes, conf_thre=conf_thres, nms_thre=nms_thres, classes=classes)
+        dets = postprocess_candidates(prediction, num_classes=num_classes, conf_thre=conf_thres, classes=classes)
         if isinstance(dets, int):
             return dets
-        if (dets.shape[0] > 100):
-            nms_thres -= 0.05
-            dets = postprocess(prediction.clone(), num_classes=num_classes, conf_thre=conf_thres, nms_thre=nms_thres, classes=classes)
-        return dets
+        kept = postprocess_nms(dets, nms_thre=nms_thres)
+        if (kept.shape[0] > 100):
+            # only the nms runs again on the same candidates
+            kept = postprocess_nms(dets, nms_thre=(nms_thres - 0.05))
+        return kept
+
+    def nms_scores(self, dets):
+        """YOLOX ranks its detections by objectness times class confidence, as postprocess_nms does"""
+        return (dets[:, 5] * dets[:, 6])
 
     def detect_one_img(self, img_name):
         '\n        Detect bboxs in one image\n        Input: \'str\', full path of image\n        Output: \'[{"category_id":1,"score":float,"bbox":[x,y,w,h],"image_id":str},...]\',\n        The output results are similar with coco results type, except that image_id uses full path str\n        instead of coco %012d id for generalization.\n        '
@@ -107,12 +106,8 @@ class YOLOXDetector(BaseDetector):
             if (isinstance(dets, int) or (dets.shape[0] == 0)):
                 return None
             # dets = dets.cpu()
-            img_dim_list = img_dim_list[dets[:, 0].long()]
-            scaling_factor = jt.min((self.inp_dim / img_dim_list), 1).view((- 1), 1)
-            dets[:, 1:5] /= scaling_factor
+            dets = self.rescale_dets(dets, img_dim_list, self.inp_dim, center=False).numpy()
             for i in range(dets.shape[0]):
-                dets[(i, [1, 3])] = jt.clamp(dets[(i, [1, 3])], min_v=0.0, max_v=img_dim_list[(i, 0)])
-                dets[(i, [2, 4])] = jt.clamp(dets[(i, [2, 4])], min_v=0.0, max_v=img_dim_list[(i, 1)])
                 det_dict = {}
                 x = float(dets[(i, 1)])
                 y = float(dets[(i, 2)])
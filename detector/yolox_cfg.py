@@ -6,3 +6,7 @@ cfg.MODEL_WEIGHTS = "detector/yolox/data/yolox_x.pth"
 cfg.INP_DIM = 640
 cfg.CONF_THRES = 0.1
 cfg.NMS_THRES = 0.6
+# tiled detection for frames much larger than INP_DIM, TILE_SIZE 0 detects on the whole frame only
+cfg.TILE_SIZE = 0
+cfg.TILE_OVERLAP = 128
+cfg.TILE_BATCH = 8
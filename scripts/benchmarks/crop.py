@@ -0,0 +1,77 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the person crop step: per-box test_transform against test_transform_batch.'
+import argparse
+import time
+import cv2
+import natsort
+import jittor as jt
+import numpy as np
+from alphapose.utils.presets import SimpleTransform, SimpleTransform3DSMPL
+
+parser = argparse.ArgumentParser(description='AlphaPose Crop Benchmark')
+parser.add_argument('--indir', dest='inputpath', help='image-directory', default='examples/demo')
+parser.add_argument('--boxes', type=int, nargs='+', default=[1, 5, 20, 60], help='number of boxes per frame')
+parser.add_argument('--repeat', type=int, default=5, help='number of passes over the image directory')
+args = parser.parse_args()
+
+
+class DummyDataset():
+    joint_pairs = []
+    bbox_3d_shape = (2200, 2200, 2200)
+
+
+def random_boxes(img, num, rng):
+    (h, w) = img.shape[:2]
+    xy = (rng.rand(num, 2) * [(w * 0.8), (h * 0.8)])
+    wh = ((rng.rand(num, 2) * [(w * 0.5), (h * 0.5)]) + 8)
+    boxes = np.concatenate([xy, np.minimum((xy + wh), [(w - 1), (h - 1)])], axis=1)
+    return jt.array(boxes.astype(np.float32))
+
+
+def crop_loop(transformation, img, boxes):
+    inps = jt.zeros((boxes.shape[0], 3, *transformation._input_size))
+    cropped_boxes = jt.zeros((boxes.shape[0], 4))
+    for (i, box) in enumerate(boxes):
+        (inps[i], cropped_box) = transformation.test_transform(img, box)
+        cropped_boxes[i] = jt.float32(cropped_box)
+    return (inps, cropped_boxes)
+
+
+def crop_batch(transformation, img, boxes):
+    return transformation.test_transform_batch(img, boxes)
+
+
+def run(transformation, frames, func):
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for (img, boxes) in frames:
+            (inps, cropped_boxes) = func(transformation, img, boxes)
+            inps.sync()
+    return ((time.perf_counter() - start) / (len(frames) * args.repeat))
+
+
+if (__name__ == '__main__'):
+    transformations = {
+        'simple': SimpleTransform(DummyDataset(), scale_factor=0, input_size=[256, 192], output_size=[64, 48], rot=0, sigma=2, train=False, add_dpg=False, gpu_device=None),
+        'smpl': SimpleTransform3DSMPL(DummyDataset(), scale_factor=0, color_factor=0, occlusion=False, input_size=[256, 256], output_size=[64, 64], depth_dim=64, bbox_3d_shape=(2200, 2200, 2200), rot=0, sigma=2, train=False, add_dpg=False, two_d=True),
+    }
+    im_names = [os.path.join(args.inputpath, f) for f in natsort.natsorted(os.listdir(args.inputpath)) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
+    assert (len(im_names) > 0), 'No image found in {}'.format(args.inputpath)
+    imgs = [cv2.cvtColor(cv2.imread(im_name), cv2.COLOR_BGR2RGB) for im_name in im_names]
+    rng = np.random.RandomState(0)
+    print('{:<8} {:>6} {:>12} {:>12} {:>9}'.format('preset', 'boxes', 'loop ms', 'batch ms', 'speedup'))
+    for (name, transformation) in transformations.items():
+        for num in args.boxes:
+            frames = [(img, random_boxes(img, num, rng)) for img in imgs]
+            for (img, boxes) in frames:
+                (inps_loop, cropped_loop) = crop_loop(transformation, img, boxes)
+                (inps_batch, cropped_batch) = crop_batch(transformation, img, boxes)
+                assert np.array_equal(inps_loop.numpy(), inps_batch.numpy())
+                assert np.array_equal(cropped_loop.numpy(), cropped_batch.numpy())
+            (inps_multi, _) = transformation.test_transform_batch([f[0] for f in frames], [f[1] for f in frames])
+            assert np.array_equal(inps_multi.numpy(), np.concatenate([crop_loop(transformation, *f)[0].numpy() for f in frames]))
+            loop_time = run(transformation, frames, crop_loop)
+            batch_time = run(transformation, frames, crop_batch)
+            print('{:<8} {:>6} {:>12.2f} {:>12.2f} {:>8.1f}x'.format(name, num, (loop_time * 1000), (batch_time * 1000), (loop_time / batch_time)))
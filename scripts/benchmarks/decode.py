@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of per-frame image decoding in DetectionLoader.image_preprocess.'
+import argparse
+import time
+import cv2
+import natsort
+import numpy as np
+from easydict import EasyDict as edict
+from detector.apis import get_detector
+
+parser = argparse.ArgumentParser(description='AlphaPose Decode Benchmark')
+parser.add_argument('--indir', dest='inputpath', help='image-directory', default='examples/demo')
+parser.add_argument('--detector', dest='detector', help='detector name', default='yolo')
+parser.add_argument('--repeat', type=int, default=5, help='number of passes over the image directory')
+args = parser.parse_args()
+
+
+def count_imread():
+    'Wrap cv2.imread so that every decode is timed.'
+    stats = {'calls': 0, 'time': 0.0}
+    imread = cv2.imread
+
+    def timed_imread(*a, **kw):
+        start = time.perf_counter()
+        img = imread(*a, **kw)
+        stats['time'] += (time.perf_counter() - start)
+        stats['calls'] += 1
+        return img
+    return (stats, imread, timed_imread)
+
+
+def preprocess_before(detector, im_name):
+    img = detector.image_preprocess(im_name)
+    orig_img = cv2.cvtColor(cv2.imread(im_name), cv2.COLOR_BGR2RGB)
+    return (img, orig_img)
+
+
+def preprocess_after(detector, im_name):
+    (img, orig_img) = detector.image_preprocess_with_orig(im_name)
+    orig_img = cv2.cvtColor(orig_img, cv2.COLOR_BGR2RGB)
+    return (img, orig_img)
+
+
+def run(detector, im_names, func):
+    (stats, imread, timed_imread) = count_imread()
+    cv2.imread = timed_imread
+    try:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for im_name in im_names:
+                func(detector, im_name)
+        total = (time.perf_counter() - start)
+    finally:
+        cv2.imread = imread
+    num_frames = (len(im_names) * args.repeat)
+    return ((stats['time'] / num_frames), (stats['calls'] / num_frames), (total / num_frames))
+
+
+if (__name__ == '__main__'):
+    opt = edict({'detector': args.detector, 'gpus': [(- 1)], 'tracking': False})
+    detector = get_detector(opt)
+    im_names = [os.path.join(args.inputpath, f) for f in natsort.natsorted(os.listdir(args.inputpath)) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
+    assert (len(im_names) > 0), 'No image found in {}'.format(args.inputpath)
+    (img_before, orig_before) = preprocess_before(detector, im_names[0])
+    (img_after, orig_after) = preprocess_after(detector, im_names[0])
+    assert np.array_equal(orig_before, orig_after)
+    assert np.array_equal(img_before.numpy(), img_after.numpy())
+    print('{:<8} {:>14} {:>14} {:>18}'.format('mode', 'decodes/frame', 'decode ms', 'preprocess ms'))
+    for (mode, func) in (('before', preprocess_before), ('after', preprocess_after)):
+        (decode_time, decode_calls, total_time) = run(detector, im_names, func)
+        print('{:<8} {:>14.1f} {:>14.2f} {:>18.2f}'.format(mode, decode_calls, (decode_time * 1000), (total_time * 1000)))
@@ -0,0 +1,124 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'detector'))
+'Benchmark of the YOLO detector startup: weight loading, and the first batch with and without BaseDetector.warmup.'
+import argparse
+import subprocess
+import tempfile
+import time
+import numpy as np
+import jittor as jt
+from easydict import EasyDict as edict
+from yolo.darknet import Darknet
+
+parser = argparse.ArgumentParser(description='AlphaPose Detector Startup Benchmark')
+parser.add_argument('--cfg', default='detector/yolo/cfg/yolov3-spp.cfg', help='darknet cfg file')
+parser.add_argument('--weights', default='', help='darknet weights file, random weights of the cfg if empty')
+parser.add_argument('--inp_dim', type=int, default=128, help='input size of the network for the first batch')
+parser.add_argument('--detbatch', type=int, default=1, help='detection batch size')
+parser.add_argument('--first_batch', action='store_true', default=False, help='also time the first two batches, the first one compiles the forward pass unless warmed up')
+parser.add_argument('--run', default='', help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+
+def load_weights_read(model, weightfile):
+    'Darknet.load_weights before mapping the weights, it reads the file and fetches the initial parameters.'
+    fp = open(weightfile, 'rb')
+    header = np.fromfile(fp, dtype=np.int32, count=5)
+    weights = np.fromfile(fp, dtype=np.float32)
+    ptr = 0
+    for i in range(len(model.module_list)):
+        if (model.blocks[(i + 1)]['type'] == 'convolutional'):
+            conv = model.module_list[i][0]
+            if int(model.blocks[(i + 1)].get('batch_normalize', 0)):
+                bn = model.module_list[i][1]
+                num_bn_biases = bn.bias.numel()
+                values = []
+                for _ in range(4):
+                    values.append(jt.array(weights[ptr:(ptr + num_bn_biases)]))
+                    ptr += num_bn_biases
+                bn.bias = values[0].view_as(bn.bias.data)
+                bn.weight = values[1].view_as(bn.weight.data)
+                bn.running_mean = values[2].view_as(bn.running_mean)
+                bn.running_var = values[3].view_as(bn.running_var)
+            else:
+                num_biases = conv.bias.numel()
+                conv.bias = jt.array(weights[ptr:(ptr + num_biases)]).view_as(conv.bias.data)
+                ptr += num_biases
+            num_weights = conv.weight.numel()
+            conv.weight = jt.array(weights[ptr:(ptr + num_weights)]).view_as(conv.weight.data)
+            ptr += num_weights
+
+
+def random_weights(path):
+    model = Darknet(args.cfg)
+    num = 0
+    for i in range(len(model.module_list)):
+        if (model.blocks[(i + 1)]['type'] == 'convolutional'):
+            conv = model.module_list[i][0]
+            if int(model.blocks[(i + 1)].get('batch_normalize', 0)):
+                num += (4 * model.module_list[i][1].bias.numel())
+            else:
+                num += conv.bias.numel()
+            num += conv.weight.numel()
+    with open(path, 'wb') as fp:
+        np.int32([0, 2, 0, 0, 0]).tofile(fp)
+        (np.random.RandomState(0).randn(num).astype(np.float32) * 0.01).tofile(fp)
+
+
+def time_load(mode, weights):
+    'Load time of a fresh process, as at the start of a run.'
+    start = time.perf_counter()
+    model = Darknet(args.cfg)
+    if (mode == 'read'):
+        load_weights_read(model, weights)
+    else:
+        model.load_weights(weights)
+    jt.sync_all(True)
+    load_time = (time.perf_counter() - start)
+    if (not args.first_batch):
+        return (load_time, 0.0, 0.0)
+    from detector.yolo_api import YOLODetector
+    detector = YOLODetector(edict({'CONFIG': args.cfg, 'WEIGHTS': weights, 'INP_DIM': args.inp_dim}))
+    (detector.model, model.net_info['height']) = (model, args.inp_dim)
+    model.eval()
+    if (mode == 'warmup'):
+        detector.warmup(args.detbatch)
+    times = []
+    for _ in range(2):
+        imgs = jt.zeros((args.detbatch, 3, args.inp_dim, args.inp_dim))
+        start = time.perf_counter()
+        detector.images_detection(imgs, jt.float32([[args.inp_dim, args.inp_dim]]).repeat(args.detbatch, 2))
+        jt.sync_all(True)
+        times.append((time.perf_counter() - start))
+    return (load_time, *times)
+
+
+if (__name__ == '__main__'):
+    if args.run:
+        (mode, weights) = args.run.split(',', 1)
+        print('{} {} {}'.format(*time_load(mode, weights)))
+        sys.exit(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        weights = args.weights
+        if (not weights):
+            weights = os.path.join(tmp, 'random.weights')
+            random_weights(weights)
+        (model_read, model_mapped) = (Darknet(args.cfg), Darknet(args.cfg))
+        load_weights_read(model_read, weights)
+        model_mapped.load_weights(weights)
+        (params_read, params_mapped) = (model_read.state_dict(), model_mapped.state_dict())
+        for name in params_read:
+            if (name != 'header'):
+                assert np.array_equal(params_read[name].numpy(), params_mapped[name].numpy()), name
+        print('{:<16} {:>8} {:>15} {:>15}'.format('startup', 'load s', 'first batch s', 'next batch s'))
+        for (mode, name) in (('read', 'read'), ('mapped', 'mapped'), ('warmup', 'mapped, warmup')):
+            if ((mode == 'warmup') and (not args.first_batch)):
+                continue
+            cmd = [sys.executable, os.path.abspath(__file__), '--cfg', args.cfg, '--inp_dim', str(args.inp_dim), '--detbatch', str(args.detbatch), '--run', '{},{}'.format(mode, weights)]
+            if args.first_batch:
+                cmd.append('--first_batch')
+            out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+            (load_time, first_time, next_time) = [float(v) for v in out.split()[(- 3):]]
+            print('{:<16} {:>8.2f} {:>15.2f} {:>15.2f}'.format(name, load_time, first_time, next_time))
@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of host heatmap decoding against --device_decode: bytes fetched from the pose model per frame and time.'
+import argparse
+import time
+import jittor as jt
+import numpy as np
+from alphapose.utils.transforms import heatmap_to_coord_simple_batch, heatmap_to_coord_simple_device
+
+parser = argparse.ArgumentParser(description='AlphaPose Device Decode Benchmark')
+parser.add_argument('--people', type=int, nargs='+', default=[1, 5, 20], help='number of people per frame')
+parser.add_argument('--joints', type=int, nargs='+', default=[17, 136], help='number of joints of the pose model')
+parser.add_argument('--gpu', default=False, action='store_true', help='run the jittor ops with cuda')
+parser.add_argument('--repeat', type=int, default=5, help='number of timed runs')
+args = parser.parse_args()
+hm_shape = (64, 48)
+
+
+def host_decode(hms, bboxes):
+    hm_data = hms.numpy()
+    (coords, scores) = heatmap_to_coord_simple_batch(hm_data, bboxes.numpy())
+    return (np.concatenate((coords, scores), axis=2), hm_data.nbytes)
+
+
+def device_decode(hms, bboxes):
+    (coords, scores) = heatmap_to_coord_simple_device(hms, bboxes)
+    kps = jt.contrib.concat((coords, scores), dim=2).numpy()
+    return (kps, kps.nbytes)
+
+
+def timed(func, *a):
+    func(*[(x + 0) for x in a])
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        # fresh input so that no result is reused between runs
+        func(*[(x + 0) for x in a])
+    return (((time.perf_counter() - start) / args.repeat) * 1000)
+
+
+if (__name__ == '__main__'):
+    jt.flags.use_cuda = int((args.gpu and jt.has_cuda))
+    rng = np.random.RandomState(0)
+    print('{:>6} {:>7} {:>14} {:>14} {:>10} {:>10} {:>10}'.format('joints', 'people', 'host bytes', 'device bytes', 'host ms', 'device ms', 'max diff'))
+    for joints in args.joints:
+        for num in args.people:
+            hms = jt.array(rng.rand(num, joints, *hm_shape).astype(np.float32))
+            bboxes = jt.array(np.concatenate([(rng.rand(num, 2) * 300), ((rng.rand(num, 2) * 300) + 310)], axis=1).astype(np.float32))
+            (kps_host, host_bytes) = host_decode(hms, bboxes)
+            (kps_device, device_bytes) = device_decode(hms, bboxes)
+            assert np.array_equal(kps_host[:, :, 2], kps_device[:, :, 2])
+            diff = np.abs((kps_host - kps_device)).max()
+            print('{:>6} {:>7} {:>14} {:>14} {:>10.2f} {:>10.2f} {:>10.2e}'.format(joints, num, host_bytes, device_bytes, timed(host_decode, hms, bboxes), timed(device_decode, hms, bboxes), diff))
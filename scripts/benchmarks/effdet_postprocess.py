@@ -0,0 +1,117 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'detector'))
+'Benchmark of the EfficientDet post-processing (--detbatch sweep): per-sample generate_detections and per-row extraction against the batched path.'
+import argparse
+import time
+import numpy as np
+import jittor as jt
+from easydict import EasyDict as edict
+from efficientdet.effdet import get_efficientdet_config
+from efficientdet.effdet.anchors import Anchors, MAX_DETECTION_POINTS, decode_box_outputs, generate_detections
+from detector.effdet_api import EffDetDetector
+from detector.nms.nms_wrapper import batched_nms
+
+parser = argparse.ArgumentParser(description='AlphaPose EfficientDet Post-processing Benchmark')
+parser.add_argument('--detector', default='efficientdet_d0', help='efficientdet config, for the anchors')
+parser.add_argument('--detbatch', type=int, nargs='+', default=[1, 5, 10, 20], help='detection batch sizes')
+parser.add_argument('--people', type=int, default=10, help='average number of people per image')
+parser.add_argument('--repeat', type=int, default=5, help='number of batches per setting')
+args = parser.parse_args()
+
+
+def random_outputs(batch_size, num_anchors, num_classes, rng):
+    'Top-k outputs of _post_process: class logit, box regression, anchor index and class, mostly background with a few clusters of candidates on the anchors of each person.'
+    cls_out = (rng.randn(batch_size, MAX_DETECTION_POINTS, 1).astype(np.float32) - 8)
+    box_out = (rng.randn(batch_size, MAX_DETECTION_POINTS, 4).astype(np.float32) * 0.1)
+    indices = np.stack([rng.choice(num_anchors, MAX_DETECTION_POINTS, replace=False) for _ in range(batch_size)])
+    classes = np.where((rng.rand(batch_size, MAX_DETECTION_POINTS) < 0.5), 0, rng.randint(1, num_classes, (batch_size, MAX_DETECTION_POINTS)))
+    for b in range(batch_size):
+        for _ in range(rng.poisson(args.people)):
+            points = rng.choice(MAX_DETECTION_POINTS, 20, replace=False)
+            (indices[b, points], classes[b, points]) = (rng.randint(num_anchors), 0)
+            cls_out[b, points, 0] = rng.uniform((- 2), 3, 20)
+    # the top-k comes by decreasing logit
+    order = np.argsort((- cls_out[:, :, 0]), axis=1, kind='stable')
+    take = (lambda a: np.take_along_axis(a, (order if (a.ndim == 2) else order[:, :, None]), axis=1))
+    return (jt.array(take(cls_out)), jt.array(take(box_out)), jt.array(take(indices)), jt.array(take(classes)), jt.array((rng.rand(batch_size, 1).astype(np.float32) + 1)))
+
+
+def generate_detections_loop(cls_outputs, box_outputs, anchor_boxes, indices, classes, image_scale, nms_thres=0.5, max_dets=100):
+    'generate_detections of one sample, before the batched path.'
+    anchor_boxes = anchor_boxes[indices, :]
+    boxes = decode_box_outputs(box_outputs.transpose(1, 0).float(), anchor_boxes.transpose(1, 0), output_xyxy=True)
+    scores = cls_outputs.sigmoid().squeeze(1).float()
+    human_idx = (classes == 0)
+    boxes = boxes[human_idx]
+    scores = scores[human_idx]
+    classes = classes[human_idx]
+    top_detection_idx = batched_nms(boxes, scores, classes, nms_thres)
+    top_detection_idx = top_detection_idx[:max_dets]
+    boxes = boxes[top_detection_idx]
+    scores = scores[(top_detection_idx, None)]
+    classes = classes[(top_detection_idx, None)]
+    boxes[:, 2] -= boxes[:, 0]
+    boxes[:, 3] -= boxes[:, 1]
+    boxes *= image_scale
+    classes += 1
+    detections = jt.contrib.concat([boxes, scores, classes.float()], dim=1)
+    if (len(top_detection_idx) < max_dets):
+        detections = jt.contrib.concat([detections, jt.zeros(((max_dets - len(top_detection_idx)), 6), dtype=detections.dtype)], dim=0)
+    return detections
+
+
+def person_dets_loop(detector, prediction):
+    'The row by row extraction of images_detection, before write_person_results, with the score in both score columns.'
+    write = False
+    for (index, sample) in enumerate(prediction):
+        for det in sample:
+            score = float(det[4])
+            if (score < 0.001):
+                break
+            if ((int(det[5]) != 1) or (score < detector.confidence)):
+                continue
+            det_new = jt.zeros((1, 8))
+            det_new[(0, 0)] = index
+            det_new[0, 1:3] = det[0:2]
+            det_new[0, 3:5] = (det[0:2] + det[2:4])
+            det_new[0, 5:6] = det[4]
+            det_new[0, 6:7] = det[4]
+            det_new[(0, 7)] = det[5]
+            if (not write):
+                dets = det_new
+                write = True
+            else:
+                dets = jt.contrib.concat((dets, det_new))
+    return (dets if write else 0)
+
+
+def run(func, outputs):
+    start = time.perf_counter()
+    for output in outputs:
+        dets = func(output)
+        if (not isinstance(dets, int)):
+            dets.sync()
+    return ((time.perf_counter() - start) / len(outputs))
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    config = get_efficientdet_config(args.detector)
+    detector = EffDetDetector({}, edict({'detector': args.detector}))
+    anchor_boxes = Anchors(config.min_level, config.max_level, config.num_scales, config.aspect_ratios, config.anchor_scale, config.image_size).boxes
+    loop = (lambda output: person_dets_loop(detector, jt.stack([generate_detections_loop(output[0][i], output[1][i], anchor_boxes, output[2][i], output[3][i], output[4][i], detector.nms_thres, detector.max_dets) for i in range(output[0].shape[0])], dim=0)))
+    batched = (lambda output: detector.write_person_results(generate_detections(*output[:2], anchor_boxes, *output[2:], nms_thres=detector.nms_thres, max_dets=detector.max_dets)))
+    print('{:>9} {:>10} {:>12} {:>12} {:>9}'.format('detbatch', 'dets', 'loop ms', 'batched ms', 'speedup'))
+    for batch_size in args.detbatch:
+        outputs = [random_outputs(batch_size, anchor_boxes.shape[0], config.num_classes, rng) for _ in range(args.repeat)]
+        num_dets = 0
+        for output in outputs:
+            (dets_loop, dets_batched) = (loop(output), batched(output))
+            assert np.array_equal(dets_loop.numpy(), dets_batched.numpy())
+            num_dets += dets_batched.shape[0]
+        run(batched, outputs[:1])
+        loop_time = run(loop, outputs)
+        batched_time = run(batched, outputs)
+        print('{:>9} {:>10.1f} {:>12.2f} {:>12.2f} {:>8.1f}x'.format(batch_size, (num_dets / len(outputs)), (loop_time * 1000), (batched_time * 1000), (loop_time / batched_time)))
@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of per-person heatmap decoding against the batch decoders.'
+import argparse
+import time
+import jittor as jt
+import numpy as np
+from alphapose.utils.transforms import heatmap_to_coord_simple, heatmap_to_coord_simple_batch, heatmap_to_coord_simple_regress, heatmap_to_coord_simple_regress_batch
+
+parser = argparse.ArgumentParser(description='AlphaPose Heatmap Decode Benchmark')
+parser.add_argument('--people', type=int, nargs='+', default=[1, 10, 50], help='number of people per batch')
+parser.add_argument('--joints', type=int, default=17, help='number of joints')
+parser.add_argument('--repeat', type=int, default=5, help='number of timed runs')
+args = parser.parse_args()
+hm_shape = (64, 48)
+
+
+def decode_loop(decoder, hms, bboxes, **kwargs):
+    results = [decoder(hms[i], bboxes[i].tolist(), hm_shape=hm_shape, norm_type='softmax', **kwargs) for i in range(len(hms))]
+    return (np.stack([r[0] for r in results]), np.stack([r[1] for r in results]))
+
+
+def timed(func, *a):
+    func(*a)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        func(*a)
+    return (((time.perf_counter() - start) / args.repeat) * 1000)
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    print('{:<8} {:>7} {:>10} {:>10} {:>9}'.format('decoder', 'people', 'loop ms', 'batch ms', 'speedup'))
+    for num in args.people:
+        hms = rng.rand(num, args.joints, *hm_shape).astype(np.float32)
+        bboxes = np.concatenate([(rng.rand(num, 2) * 300), ((rng.rand(num, 2) * 300) + 310)], axis=1).astype(np.float32)
+        for (name, loop_args, batch_args) in (('simple', (heatmap_to_coord_simple, hms, bboxes), (hms, bboxes)), ('regress', (heatmap_to_coord_simple_regress, [jt.array(hm) for hm in hms], bboxes), (hms, bboxes, hm_shape, 'softmax'))):
+            batch_decoder = (heatmap_to_coord_simple_batch if (name == 'simple') else heatmap_to_coord_simple_regress_batch)
+            (coords_loop, scores_loop) = decode_loop(*loop_args)
+            (coords_batch, scores_batch) = batch_decoder(*batch_args)
+            assert np.array_equal(coords_loop, coords_batch)
+            assert np.array_equal(scores_loop, scores_batch)
+            loop_time = timed(decode_loop, *loop_args)
+            batch_time = timed(batch_decoder, *batch_args)
+            print('{:<8} {:>7} {:>10.2f} {:>10.2f} {:>8.1f}x'.format(name, num, loop_time, batch_time, (loop_time / batch_time)))
@@ -0,0 +1,140 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of keyframe detection (--det_interval) on a synthetic video: detector passes against box quality of the frames in between.'
+import argparse
+import tempfile
+import time
+import cv2
+import numpy as np
+import jittor as jt
+from easydict import EasyDict as edict
+from alphapose.utils.config import update_config
+from alphapose.utils.detector import DetectionLoader
+from detector.apis import BaseDetector
+
+parser = argparse.ArgumentParser(description='AlphaPose Keyframe Detection Benchmark')
+parser.add_argument('--cfg', default='configs/coco/resnet/256x192_res50_lr1e-3_1x.yaml', help='pose config, for the crops')
+parser.add_argument('--size', type=int, nargs=2, default=[640, 360], help='frame width and height')
+parser.add_argument('--frames', type=int, default=150, help='number of frames')
+parser.add_argument('--people', type=int, default=6, help='number of people, some of them entering late')
+parser.add_argument('--speed', type=float, default=4, help='largest speed of the people, pixels per frame')
+parser.add_argument('--det_interval', type=int, nargs='+', default=[1, 2, 5, 10], help='--det_interval settings')
+parser.add_argument('--det_drop', type=float, default=0.2, help='--det_drop')
+parser.add_argument('--detbatch', type=int, default=5, help='detection batch size')
+parser.add_argument('--det_ms', type=float, default=20, help='simulated detector time per image of a batch, ms')
+args = parser.parse_args()
+# keypoints of a standing person, relative to the box
+LAYOUT = np.array([[0.5, 0.05], [0.45, 0.03], [0.55, 0.03], [0.4, 0.05], [0.6, 0.05], [0.3, 0.2], [0.7, 0.2], [0.2, 0.38], [0.8, 0.38], [0.15, 0.52], [0.85, 0.52], [0.35, 0.55], [0.65, 0.55], [0.35, 0.77], [0.65, 0.77], [0.35, 0.97], [0.65, 0.97]], dtype=np.float32)
+CODE_BITS = 12
+
+
+def random_people(rng):
+    'Box of every person in every frame, nan before they enter.'
+    (width, height) = args.size
+    boxes = np.full((args.frames, args.people, 4), np.nan, dtype=np.float32)
+    for p in range(args.people):
+        start = (0 if (p < (args.people // 2)) else rng.randint(args.frames))
+        h = rng.uniform(80, 160)
+        w = (h * 0.4)
+        (pos, vel) = ((rng.rand(2) * [(width - w), (height - h)]), (rng.uniform((- 1), 1, 2) * args.speed))
+        for t in range(start, args.frames):
+            pos += vel
+            for d in range(2):
+                if ((pos[d] < 0) or (pos[d] > ((width - w) if (d == 0) else (height - h)))):
+                    vel[d] = (- vel[d])
+                    pos[d] += (2 * vel[d])
+            boxes[(t, p)] = [pos[0], pos[1], (pos[0] + w), (pos[1] + h)]
+    return boxes
+
+
+def write_video(path):
+    'Frames carrying their index in black and white blocks, readable after compression.'
+    (width, height) = args.size
+    stream = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, (width, height))
+    for t in range(args.frames):
+        frame = np.full((height, width, 3), 100, dtype=np.uint8)
+        for b in range(CODE_BITS):
+            frame[0:16, (16 * b):(16 * (b + 1))] = (255 * ((t >> b) & 1))
+        stream.write(frame)
+    stream.release()
+
+
+class TruthDetector(BaseDetector):
+    'Stand-in detector returning the true boxes of the frames, taking det_ms per image of the batch.'
+
+    def __init__(self, people):
+        super(TruthDetector, self).__init__()
+        (self.people, self.images) = (people, 0)
+
+    def image_preprocess(self, img):
+        t = sum(((1 << b) for b in range(CODE_BITS) if (img[8, ((16 * b) + 8), 0] > 127)))
+        return jt.full((1, 3, 8, 8), t)
+
+    def images_detection(self, imgs, orig_dim_list):
+        self.images += imgs.shape[0]
+        time.sleep(((args.det_ms * imgs.shape[0]) / 1000))
+        dets = []
+        for (k, t) in enumerate(imgs[:, 0, 0, 0].numpy().astype(np.int64)):
+            for box in self.people[t]:
+                if (not np.isnan(box[0])):
+                    dets.append([k, *box, 0.9, 0.9, 0])
+        return (jt.float32(dets) if dets else 0)
+
+    def detect_one_img(self, img_name):
+        pass
+
+
+def estimate_poses(people, t, cropped_boxes):
+    'Stand-in pose model: the keypoints of the person covering the crop best, low scores where they leave it.'
+    truth = people[t][(~ np.isnan(people[t, :, 0]))]
+    poses = []
+    for crop in cropped_boxes:
+        (lt, rb) = (np.maximum(truth[:, :2], crop[:2]), np.minimum(truth[:, 2:], crop[2:]))
+        box = truth[np.clip((rb - lt), 0, None).prod(axis=1).argmax()]
+        keypoints = (box[:2] + (LAYOUT * (box[2:] - box[:2])))
+        inside = ((keypoints >= crop[:2]) & (keypoints <= crop[2:])).all(axis=1)
+        poses.append(np.concatenate([np.clip(keypoints, crop[:2], crop[2:]), np.where(inside, 0.9, 0.05)[:, None]], axis=1))
+    return np.float32(poses)
+
+
+def match(boxes, truth):
+    (lt, rb) = (np.maximum(truth[:, None, :2], boxes[None, :, :2]), np.minimum(truth[:, None, 2:], boxes[None, :, 2:]))
+    inter = np.clip((rb - lt), 0, None).prod(axis=2)
+    union = (((truth[:, 2:] - truth[:, :2]).prod(axis=1)[:, None] + (boxes[:, 2:] - boxes[:, :2]).prod(axis=1)[None]) - inter)
+    return (inter / union).max(axis=1)
+
+
+def run(path, people, cfg, det_interval):
+    'The loop of demo_inference, with the stand-in pose model giving its poses back as update_poses.'
+    opt = edict({'sp': True, 'tracking': False, 'roi': '', 'det_interval': det_interval, 'det_drop': args.det_drop})
+    detector = TruthDetector(people)
+    det_loader = DetectionLoader(path, detector, cfg, opt, mode='video', batchSize=args.detbatch)
+    (ious, start) = ([], time.perf_counter())
+    det_loader.start()
+    for t in range(det_loader.length):
+        (inps, orig_img, im_name, boxes, scores, ids, cropped_boxes) = det_loader.read()
+        truth = people[t][(~ np.isnan(people[t, :, 0]))]
+        if ((boxes is None) or (len(boxes) == 0)):
+            det_loader.update_poses(None)
+            ious.append(np.zeros(len(truth)))
+            continue
+        poses = estimate_poses(people, t, cropped_boxes.numpy())
+        det_loader.update_poses(poses, scores, ids)
+        ious.append(match(boxes.numpy(), truth))
+    run_time = (time.perf_counter() - start)
+    ious = np.concatenate(ious)
+    return (detector.images, (run_time / args.frames), ious.mean(), (ious >= 0.5).mean())
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    cfg = update_config(args.cfg)
+    people = random_people(rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'people.avi')
+        write_video(path)
+        print('{:>13} {:>16} {:>10} {:>9} {:>8}'.format('det_interval', 'detector images', 'ms/frame', 'mean IoU', 'recall'))
+        for det_interval in args.det_interval:
+            (images, frame_time, mean_iou, recall) = run(path, people, cfg, det_interval)
+            print('{:>13} {:>16} {:>10.1f} {:>9.3f} {:>8.3f}'.format(det_interval, images, (frame_time * 1000), mean_iou, recall))
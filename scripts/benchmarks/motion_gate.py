@@ -0,0 +1,50 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the motion gate (--motion_thres) on a synthetic fixed camera: frames skipped, frames with motion missed and cost per frame.'
+import argparse
+import time
+import numpy as np
+from alphapose.utils.motion_gate import MotionGate
+
+parser = argparse.ArgumentParser(description='AlphaPose Motion Gate Benchmark')
+parser.add_argument('--size', type=int, nargs=2, default=[1920, 1080], help='frame width and height')
+parser.add_argument('--frames', type=int, default=300, help='number of frames')
+parser.add_argument('--active', type=float, default=0.3, help='fraction of the frames where a person walks through')
+parser.add_argument('--person', type=int, default=120, help='height of the person, pixels')
+parser.add_argument('--noise', type=float, default=3, help='sensor noise, gray levels')
+parser.add_argument('--motion_thres', type=float, nargs='+', default=[0.0005, 0.001, 0.005], help='--motion_thres settings')
+args = parser.parse_args()
+
+
+def random_stream(rng):
+    'Frames of a static scene with sensor noise, and whether a person moves in them, walking 3 px per frame.'
+    (width, height) = args.size
+    background = rng.randint(40, 200, (((height // 40) + 1), ((width // 40) + 1), 3)).astype(np.uint8).repeat(40, axis=0).repeat(40, axis=1)[:height, :width]
+    (h, w) = (args.person, (args.person // 3))
+    active = np.zeros(args.frames, dtype=bool)
+    # a few walks, each in its own part of the video
+    for start in range(0, args.frames, (args.frames // 3)):
+        active[start:(start + int(((args.active * args.frames) / 3)))] = True
+    (x, y) = (0, ((height - h) // 2))
+    noise = [np.clip((background + rng.normal(0, args.noise, background.shape)), 0, 255).astype(np.uint8) for _ in range(8)]
+    for t in range(args.frames):
+        frame = noise[(t % len(noise))].copy()
+        if active[t]:
+            x = ((x + 3) % (width - w))
+        frame[y:(y + h), x:(x + w)] = 20
+        yield (frame, active[t])
+
+
+if (__name__ == '__main__'):
+    print('{:>13} {:>10} {:>16} {:>9}'.format('motion_thres', 'skipped', 'moving reused', 'ms/frame'))
+    for threshold in args.motion_thres:
+        gate = MotionGate(threshold)
+        (skipped, missed, gate_time) = (0, 0, 0.0)
+        for (frame, active) in random_stream(np.random.RandomState(0)):
+            start = time.perf_counter()
+            moving = gate.moving(frame)
+            gate_time += (time.perf_counter() - start)
+            skipped += (not moving)
+            missed += ((not moving) and active)
+        print('{:>13} {:>9.2f} {:>16} {:>9.2f}'.format(threshold, (skipped / args.frames), missed, ((gate_time / args.frames) * 1000)))
@@ -0,0 +1,100 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of oks_pose_nms (scripts/validate.py --oks-nms): per-detection loops against the OKS matrix kernel.'
+import argparse
+import copy
+import time
+from collections import defaultdict
+import numpy as np
+from alphapose.utils import pPose_nms
+
+parser = argparse.ArgumentParser(description='AlphaPose OKS NMS Benchmark')
+parser.add_argument('--images', type=int, default=5000, help='number of images, 5000 in COCO val2017')
+parser.add_argument('--dets', type=int, default=20, help='average number of detections per image')
+parser.add_argument('--keypoints', type=int, nargs='+', default=[17, 136], help='number of keypoints per pose')
+args = parser.parse_args()
+
+
+def oks_iou_loop(g, d, a_g, a_d):
+    vars = ((pPose_nms.OKS_SIGMAS.get((len(g) // 3), pPose_nms.OKS_SIGMAS[17]) * 2) ** 2)
+    xg = g[0::3]
+    yg = g[1::3]
+    ious = np.zeros(len(d))
+    for n_d in range(0, len(d)):
+        dx = (d[n_d, 0::3] - xg)
+        dy = (d[n_d, 1::3] - yg)
+        e = (((((dx ** 2) + (dy ** 2)) / vars) / (((a_g + a_d[n_d]) / 2) + np.spacing(1))) / 2)
+        ious[n_d] = ((np.sum(np.exp((- e))) / len(e)) if (len(e) != 0) else 0.0)
+    return ious
+
+
+def oks_nms_loop(kpts_db, thr):
+    scores = np.array([k['score'] for k in kpts_db])
+    kpts = np.array([k['keypoints'] for k in kpts_db])
+    areas = np.array([k['area'] for k in kpts_db])
+    order = scores.argsort()[::(- 1)]
+    keep = []
+    while (len(order) > 0):
+        i = order[0]
+        keep.append(i)
+        oks_ovr = oks_iou_loop(kpts[i], kpts[order[1:]], areas[i], areas[order[1:]])
+        order = order[(np.where((oks_ovr <= thr))[0] + 1)]
+    return keep
+
+
+def oks_pose_nms_loop(data):
+    'oks_pose_nms before the OKS matrix kernel.'
+    kpts = defaultdict(list)
+    post_data = []
+    for item in data:
+        kpts[item['image_id']].append(item)
+    for (img_id, img_res) in kpts.items():
+        for n_p in img_res:
+            box_score = n_p['score']
+            kpt_score = 0
+            valid_num = 0
+            kpt = np.array(n_p['keypoints']).reshape((- 1), 3)
+            for n_np in range(kpt.shape[0]):
+                t_s = kpt[n_np][2]
+                if (t_s > pPose_nms.vis_thr):
+                    kpt_score += t_s
+                    valid_num += 1
+            if (valid_num != 0):
+                kpt_score = (kpt_score / valid_num)
+            n_p['score'] = (kpt_score * box_score)
+        keep = oks_nms_loop(img_res, pPose_nms.oks_thr)
+        post_data += [img_res[_keep] for _keep in keep]
+    return post_data
+
+
+def random_results(kp_num, rng):
+    'Detections of scripts/validate.py: duplicated, jittered poses, images in a shuffled order.'
+    data = []
+    for img_id in rng.permutation(args.images):
+        num_people = max(1, rng.poisson((args.dets / 4)))
+        centers = (rng.rand(num_people, 1, 2) * [640, 480])
+        sizes = ((rng.rand(num_people, 1, 1) * 200) + 20)
+        skeletons = (centers + ((rng.rand(num_people, kp_num, 2) - 0.5) * sizes))
+        for _ in range(max(1, rng.poisson(args.dets))):
+            owner = rng.randint(num_people)
+            pose = (skeletons[owner] + (rng.randn(kp_num, 2) * rng.choice([1.0, 5.0, 30.0])))
+            keypoints = np.concatenate([pose, rng.rand(kp_num, 1)], axis=1)
+            data.append({'image_id': int(img_id), 'category_id': 1, 'keypoints': keypoints.reshape((- 1)).tolist(), 'area': float((sizes[(owner, 0, 0)] ** 2)), 'score': float((rng.rand() * 3))})
+    return data
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    print('{:>9} {:>12} {:>10} {:>12} {:>12} {:>9}'.format('keypoints', 'detections', 'kept', 'loop s', 'matrix s', 'speedup'))
+    for kp_num in args.keypoints:
+        data = random_results(kp_num, rng)
+        (data_loop, data_matrix) = (copy.deepcopy(data), copy.deepcopy(data))
+        start = time.perf_counter()
+        res_loop = oks_pose_nms_loop(data_loop)
+        loop_time = (time.perf_counter() - start)
+        start = time.perf_counter()
+        res_matrix = pPose_nms.oks_pose_nms(data_matrix)
+        matrix_time = (time.perf_counter() - start)
+        assert (res_loop == res_matrix)
+        print('{:>9} {:>12} {:>10} {:>12.2f} {:>12.2f} {:>8.1f}x'.format(kp_num, len(data), len(res_matrix), loop_time, matrix_time, (loop_time / matrix_time)))
@@ -0,0 +1,49 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of per-frame pose batches against cross-frame batches built by PoseBatcher.'
+import argparse
+import time
+import jittor as jt
+import numpy as np
+from alphapose.models import builder
+from alphapose.utils.config import update_config
+from alphapose.utils.pose_batcher import PoseBatcher
+
+parser = argparse.ArgumentParser(description='AlphaPose Pose Batch Benchmark')
+parser.add_argument('--cfg', type=str, default='configs/coco/resnet/256x192_res50_lr1e-3_1x.yaml', help='experiment configure file name')
+parser.add_argument('--frames', type=int, default=32, help='number of simulated frames')
+parser.add_argument('--people', type=int, nargs='+', default=[1, 2, 4], help='number of people per frame')
+parser.add_argument('--targets', type=int, nargs='+', default=[0, 16, 64], help='values of --pose_target_batch')
+args = parser.parse_args()
+
+
+def run(pose_model, frames, target):
+    pose_batcher = PoseBatcher(target, max_delay=float('inf'))
+    hms = []
+    start = time.perf_counter()
+    with jt.no_grad():
+        for (k, inps) in enumerate(frames):
+            pose_batcher.put(inps, k)
+            if pose_batcher.ready():
+                hms.extend((hm.numpy() for (_, hm, _) in pose_batcher.flush(pose_model)))
+        if len(pose_batcher):
+            hms.extend((hm.numpy() for (_, hm, _) in pose_batcher.flush(pose_model)))
+    return ((time.perf_counter() - start), hms)
+
+
+if (__name__ == '__main__'):
+    cfg = update_config(args.cfg)
+    pose_model = builder.build_sppe(cfg.MODEL, preset_cfg=cfg.DATA_PRESET)
+    pose_model.eval()
+    (inp_h, inp_w) = cfg.DATA_PRESET.IMAGE_SIZE
+    rng = np.random.RandomState(0)
+    print('{:>7} {:>7} {:>12} {:>10} {:>9}'.format('people', 'target', 'frames/s', 'max diff', 'speedup'))
+    for people in args.people:
+        frames = [jt.array(rng.randn(people, 3, inp_h, inp_w).astype(np.float32)) for _ in range(args.frames)]
+        run(pose_model, frames[:2], 0)
+        (base_time, base_hms) = run(pose_model, frames, 0)
+        for target in args.targets:
+            (t, hms) = (base_time, base_hms) if (target == 0) else run(pose_model, frames, target)
+            diff = max((np.abs((a - b)).max() for (a, b) in zip(hms, base_hms)))
+            print('{:>7} {:>7} {:>12.2f} {:>10.2e} {:>8.2f}x'.format(people, target, (args.frames / t), diff, (base_time / t)))
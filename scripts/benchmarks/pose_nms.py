@@ -0,0 +1,80 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of parametric pose NMS: per-pick loop (pose_nms_body/fullbody) against the matrix form.'
+import argparse
+import time
+import numpy as np
+from alphapose.utils import pPose_nms
+
+parser = argparse.ArgumentParser(description='AlphaPose Pose NMS Benchmark')
+parser.add_argument('--proposals', type=int, nargs='+', default=[10, 50, 200], help='number of pose proposals per frame')
+parser.add_argument('--keypoints', type=int, nargs='+', default=[17, 136], help='number of keypoints per pose')
+parser.add_argument('--dups', type=int, default=4, help='average number of proposals per person')
+parser.add_argument('--repeat', type=int, default=5, help='number of frames per setting')
+args = parser.parse_args()
+
+
+def random_frame(num, kp_num, rng):
+    'Crowded frame: `num` proposals, jittered copies of num / dups people.'
+    num_people = max(1, (num // args.dups))
+    centers = (rng.rand(num_people, 2) * [1280, 720])
+    sizes = ((rng.rand(num_people, 1) * 150) + 50)
+    skeletons = (centers[:, None] + ((rng.rand(num_people, kp_num, 2) - 0.5) * sizes[:, None] * [0.5, 1.0]))
+    owner = rng.randint(0, num_people, num)
+    pose_preds = (skeletons[owner] + (rng.randn(num, kp_num, 2) * rng.choice([0.5, 3.0, 20.0], (num, 1, 1))))
+    pose_scores = rng.rand(num, kp_num, 1)
+    pose_scores[(rng.rand(num, kp_num, 1) < 0.05)] = 0
+    mins = pose_preds.min(axis=1)
+    maxs = pose_preds.max(axis=1)
+    bboxes = np.concatenate([mins, maxs], axis=1)
+    bbox_scores = rng.rand(num, 1)
+    bbox_ids = np.arange(num).reshape((- 1), 1)
+    return (bboxes.astype(np.float32), bbox_scores.astype(np.float32), bbox_ids, pose_preds.astype(np.float32), pose_scores.astype(np.float32))
+
+
+def snap_frame(frame):
+    'Same frame on a coarse pixel grid, so that many distances fall right on the NMS thresholds.'
+    (bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores) = frame
+    return (np.round(bboxes), bbox_scores, bbox_ids, np.round((pose_preds / 4)), pose_scores)
+
+
+def call(func, frame):
+    (bboxes, bbox_scores, bbox_ids, pose_preds, pose_scores) = frame
+    return func(bboxes.copy(), bbox_scores.copy(), bbox_ids.copy(), pose_preds.copy(), pose_scores.copy())
+
+
+def assert_same(res_loop, res_matrix):
+    assert (len(res_loop) == len(res_matrix))
+    for (a, b) in zip(res_loop, res_matrix):
+        assert (len(a) == len(b))
+        for (x, y) in zip(a, b):
+            assert np.array_equal(np.asarray(x), np.asarray(y), equal_nan=True)
+
+
+def run(func, frames):
+    start = time.perf_counter()
+    for frame in frames:
+        call(func, frame)
+    return ((time.perf_counter() - start) / len(frames))
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    funcs = {'body': (pPose_nms.pose_nms_body, pPose_nms.pose_nms_body_matrix),
+             'fullbody': (pPose_nms.pose_nms_fullbody, pPose_nms.pose_nms_fullbody_matrix)}
+    print('{:<9} {:>9} {:>10} {:>8} {:>12} {:>12} {:>9}'.format('mode', 'keypoints', 'proposals', 'kept', 'loop ms', 'matrix ms', 'speedup'))
+    for kp_num in args.keypoints:
+        mode = ('fullbody' if (kp_num in (133, 136)) else 'body')
+        (loop_func, matrix_func) = funcs[mode]
+        for num in args.proposals:
+            frames = [random_frame(num, kp_num, rng) for _ in range(args.repeat)]
+            kept = 0
+            for frame in frames:
+                res_matrix = call(matrix_func, frame)
+                assert_same(call(loop_func, frame), res_matrix)
+                assert_same(call(loop_func, snap_frame(frame)), call(matrix_func, snap_frame(frame)))
+                kept += len(res_matrix[0])
+            loop_time = run(loop_func, frames)
+            matrix_time = run(matrix_func, frames)
+            print('{:<9} {:>9} {:>10} {:>8.1f} {:>12.2f} {:>12.2f} {:>8.1f}x'.format(mode, kp_num, num, (kept / len(frames)), (loop_time * 1000), (matrix_time * 1000), (loop_time / matrix_time)))
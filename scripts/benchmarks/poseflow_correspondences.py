@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the PoseFlow correspondences: text files written and read back every frame against in-memory arrays and the analytic fake correspondences.'
+import argparse
+import tempfile
+import time
+import cv2
+import numpy as np
+from trackers.PoseFlow.matching import generate_fake_cor, orb_matching
+from trackers.PoseFlow.utils import best_matching_hungarian
+
+parser = argparse.ArgumentParser(description='AlphaPose PoseFlow Correspondences Benchmark')
+parser.add_argument('--size', type=int, nargs=2, default=[1920, 1080], help='frame width and height')
+parser.add_argument('--people', type=int, default=10, help='people per frame, for the grades')
+parser.add_argument('--repeat', type=int, default=3, help='number of frame pairs per case')
+args = parser.parse_args()
+
+
+def random_frames(rng, textured):
+    'A frame and the next one, the scene moved by a few pixels; without texture ORB finds no features.'
+    (width, height) = args.size
+    if (not textured):
+        return (np.full((height, width, 3), 128, dtype=np.uint8),) * 2
+    blocks = rng.randint(0, 255, (((height // 8) + 2), ((width // 8) + 2), 3)).astype(np.uint8)
+    scene = blocks.repeat(8, axis=0).repeat(8, axis=1)
+    return (scene[:height, :width].copy(), scene[3:(height + 3), 5:(width + 5)].copy())
+
+
+def random_people(rng):
+    'Tracked people of the last frame and people of the next frame, as stack_all_pids and convert_notrack_to_track give them.'
+    (width, height) = args.size
+    (prev, next_) = ([], {'num_boxes': args.people})
+    for p in range(args.people):
+        (x, y) = (rng.rand(2) * [(width - 150), (height - 300)])
+        for frame in (prev, next_):
+            pose = ((x, y) + (rng.rand(17, 2) * [120, 280]))
+            info = {'box_pos': [int(pose[:, 0].min()), int(pose[:, 0].max()), int(pose[:, 1].min()), int(pose[:, 1].max())], 'box_score': 1.0, 'box_pose_pos': pose}
+            if isinstance(frame, list):
+                frame.append(info)
+            else:
+                frame[(p + 1)] = info
+    return (prev, [True] * args.people, next_)
+
+
+def orb_matching_files(img1, img2, vidname, img1_id, img2_id):
+    'orb_matching before the in-memory correspondences, one write per match, and the file read back as PoseFlowWrapper.step did.'
+    out_path = ('%s/%s_%s_orb.txt' % (vidname, img1_id, img2_id))
+    orb = cv2.ORB_create(nfeatures=10000, scoreType=cv2.ORB_FAST_SCORE)
+    (kp1, des1) = orb.detectAndCompute(cv2.cvtColor(img1, cv2.COLOR_BGR2RGB), None)
+    (kp2, des2) = orb.detectAndCompute(cv2.cvtColor(img2, cv2.COLOR_BGR2RGB), None)
+    if ((len(kp1) * len(kp2)) < 400):
+        generate_fake_cor(img1, out_path)
+        return np.loadtxt(out_path)
+    flann = cv2.FlannBasedMatcher(dict(algorithm=6, table_number=12, key_size=12, multi_probe_level=2), dict(checks=100))
+    fd = open(out_path, 'w')
+    for m_n in flann.knnMatch(des1, des2, k=2):
+        if ((len(m_n) == 2) and (m_n[0].distance < (0.8 * m_n[1].distance))):
+            fd.write(('%d %d %d %d %f \n' % (kp1[m_n[0].queryIdx].pt[0], kp1[m_n[0].queryIdx].pt[1], kp2[m_n[0].trainIdx].pt[0], kp2[m_n[0].trainIdx].pt[1], m_n[0].distance)))
+    fd.close()
+    if (os.stat(out_path).st_size < 1000):
+        generate_fake_cor(img1, out_path)
+    return np.loadtxt(out_path)
+
+
+def grade(all_cors, people):
+    return best_matching_hungarian(all_cors, *people, [1, 2, 1, 2, 0, 0], [0, 1, 0, 1, 0, 0], 7, 30)[1]
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    print('{:>10} {:>12} {:>13} {:>14} {:>12} {:>12}'.format('frames', 'files MB', 'files ms', 'in-memory ms', 'grade ms', 'fake grade'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for textured in (True, False):
+            (file_time, memory_time, grade_time, file_bytes) = (0.0, 0.0, 0.0, 0)
+            for k in range(args.repeat):
+                (img1, img2) = random_frames(rng, textured)
+                people = random_people(rng)
+                # before: the file written by orb_matching, read back by PoseFlowWrapper.step
+                start = time.perf_counter()
+                cors_file = orb_matching_files(img1, img2, tmp, k, (k + 1))
+                file_time += (time.perf_counter() - start)
+                file_bytes += os.stat(os.path.join(tmp, '{}_{}_orb.txt'.format(k, (k + 1)))).st_size
+                start = time.perf_counter()
+                cors = orb_matching(img1, img2)
+                memory_time += (time.perf_counter() - start)
+                start = time.perf_counter()
+                cost = grade(cors, people)
+                grade_time += (time.perf_counter() - start)
+                # the LSH tables of FLANN are random, the array is compared with the file dumped by the same call
+                dumped = orb_matching(img1, img2, tmp, 'dump', k)
+                cors_dump = np.loadtxt(os.path.join(tmp, 'dump_{}_orb.txt'.format(k)))
+                if textured:
+                    assert (np.array_equal(cors_dump[:, :4], dumped[:, :4]) and np.allclose(cors_dump[:, 4], dumped[:, 4], atol=1e-06))
+                    assert np.allclose(grade(cors_dump, people), grade(dumped, people), rtol=0, atol=1e-12)
+                else:
+                    assert ((len(cors) == len(cors_file)) and np.allclose(grade(cors_file, people), cost, rtol=0, atol=1e-12))
+            print('{:>10} {:>12.1f} {:>13.0f} {:>14.0f} {:>12.1f} {:>12}'.format(('textured' if textured else 'flat'), (file_bytes / (args.repeat * 1000000.0)), ((file_time / args.repeat) * 1000), ((memory_time / args.repeat) * 1000), ((grade_time / args.repeat) * 1000), ('no' if textured else 'yes')))
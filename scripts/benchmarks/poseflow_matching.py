@@ -0,0 +1,110 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the PoseFlow matching (--people sweep): per-pair grades, in a pool created every frame or in a loop, against the vectorized cost matrix.'
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from trackers.PoseFlow.utils import best_matching_hungarian, cal_bbox_iou, cal_grade, cal_pose_iou, cal_pose_iou_dm, find_region_cors_last, find_region_cors_next
+
+parser = argparse.ArgumentParser(description='AlphaPose PoseFlow Matching Benchmark')
+parser.add_argument('--people', type=int, nargs='+', default=[5, 10, 20, 40], help='people per frame')
+parser.add_argument('--size', type=int, nargs=2, default=[1280, 720], help='frame width and height')
+parser.add_argument('--cors', type=int, default=5000, help='ORB correspondences per frame pair')
+parser.add_argument('--pool_size', type=int, default=5, help='processes of the pools')
+parser.add_argument('--repeat', type=int, default=3, help='number of frames per setting')
+args = parser.parse_args()
+(WEIGHTS, WEIGHTS_FFF, NUM, MAG) = ([1, 2, 1, 2, 0, 0], [0, 1, 0, 1, 0, 0], 7, 30)
+# keypoints of a standing person, relative to the box
+LAYOUT = np.array([[0.5, 0.05], [0.45, 0.03], [0.55, 0.03], [0.4, 0.05], [0.6, 0.05], [0.3, 0.2], [0.7, 0.2], [0.2, 0.38], [0.8, 0.38], [0.15, 0.52], [0.85, 0.52], [0.35, 0.55], [0.65, 0.55], [0.35, 0.77], [0.65, 0.77], [0.35, 0.97], [0.65, 0.97]])
+
+
+def random_frame_pair(rng, num_people):
+    'Tracked people of the last frame, people of the next frame moved a little, and ORB correspondences, a third of them on the people.'
+    (width, height) = args.size
+    (h, prev, next_) = (rng.uniform(100, 300, num_people), {}, {'num_boxes': num_people})
+    xy = (rng.rand(num_people, 2) * [(width - 120), (height - 300)])
+    motion = rng.randn(num_people, 2) * 5
+    cors = np.zeros((args.cors, 5))
+    cors[:, :2] = (rng.rand(args.cors, 2) * [width, height])
+    cors[:, 2:4] = (cors[:, :2] + (rng.randn(args.cors, 2) * 2))
+    cors[:, 4] = rng.rand(args.cors) * 64
+    on_people = rng.choice(args.cors, (args.cors // 3), replace=False)
+    owner = rng.randint(num_people, size=len(on_people))
+    cors[on_people, :2] = (xy[owner] + (rng.rand(len(on_people), 2) * np.stack([(h[owner] * 0.4), h[owner]], axis=1)))
+    cors[on_people, 2:4] = (cors[on_people, :2] + motion[owner])
+    prev = []
+    for p in range(num_people):
+        for (frame, offset) in ((prev, 0), (next_, motion[p])):
+            pose = ((xy[p] + offset) + (LAYOUT * [(h[p] * 0.4), h[p]]))
+            box = [int(pose[:, 0].min()), int(pose[:, 0].max()), int(pose[:, 1].min()), int(pose[:, 1].max())]
+            info = {'box_pos': box, 'box_score': rng.rand(), 'box_pose_pos': pose, 'new_pid': (p + 1)}
+            if isinstance(frame, list):
+                frame.append(info)
+            else:
+                frame[(p + 1)] = info
+    # people tracked in earlier frames are graded with weights_fff
+    return (cors, prev, list((rng.rand(num_people) < 0.8)), next_)
+
+
+def grade_kernel(pid1, pid2, all_cors, track_vid_next_fid, box1_pos, box1_region_ids, box1_score, box1_pose, box1_fff):
+    'Grade of one pair, the task the pool ran before the vectorized cost matrix.'
+    box2_pos = track_vid_next_fid[pid2]['box_pos']
+    box2_region_ids = find_region_cors_next(box2_pos, all_cors)
+    inter = box1_region_ids & box2_region_ids
+    union = box1_region_ids | box2_region_ids
+    dm_iou = len(inter) / (len(union) + 0.00001)
+    box_iou = cal_bbox_iou(box1_pos, box2_pos)
+    pose_iou_dm = cal_pose_iou_dm(all_cors, box1_pose, track_vid_next_fid[pid2]['box_pose_pos'], NUM, MAG)
+    pose_iou = cal_pose_iou(box1_pose, track_vid_next_fid[pid2]['box_pose_pos'], NUM, MAG)
+    grade = cal_grade([dm_iou, box_iou, pose_iou_dm, pose_iou, box1_score, track_vid_next_fid[pid2]['box_score']], (WEIGHTS if box1_fff else WEIGHTS_FFF))
+    return (pid1, pid2, grade)
+
+
+def matching_loop(all_cors, all_pids_info, all_pids_fff, track_vid_next_fid, pool_size=0):
+    'best_matching_hungarian before the vectorized cost matrix, with a new pool of pool_size processes per frame, or in a loop.'
+    cost_matrix = np.zeros((len(all_pids_info), track_vid_next_fid['num_boxes']))
+    pool = (ProcessPoolExecutor(max_workers=pool_size) if pool_size else None)
+    results = []
+    for (pid1, info) in enumerate(all_pids_info):
+        box1_region_ids = find_region_cors_last(info['box_pos'], all_cors)
+        for pid2 in range(1, (track_vid_next_fid['num_boxes'] + 1)):
+            task = (pid1, pid2, all_cors, track_vid_next_fid, info['box_pos'], box1_region_ids, info['box_score'], info['box_pose_pos'], all_pids_fff[pid1])
+            results.append((pool.submit(grade_kernel, *task) if pool else grade_kernel(*task)))
+    if pool:
+        pool.shutdown(True)
+        results = [future.result() for future in results]
+    for (pid1, pid2, grade) in results:
+        cost_matrix[(pid1, (pid2 - 1))] = grade
+    (rows, cols) = linear_sum_assignment((- cost_matrix))
+    return (list(zip(rows.tolist(), cols.tolist())), cost_matrix)
+
+
+def run(func, pairs):
+    start = time.perf_counter()
+    for pair in pairs:
+        func(*pair)
+    return ((time.perf_counter() - start) / len(pairs))
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    pool = ProcessPoolExecutor(max_workers=args.pool_size)
+    vectorized = (lambda *pair: best_matching_hungarian(*pair, WEIGHTS, WEIGHTS_FFF, NUM, MAG))
+    pooled = (lambda *pair: best_matching_hungarian(*pair, WEIGHTS, WEIGHTS_FFF, NUM, MAG, pool=pool, pool_size=args.pool_size))
+    print('{:>7} {:>13} {:>10} {:>15} {:>15} {:>9}'.format('people', 'pool/frame ms', 'loop ms', 'vectorized ms', 'long pool ms', 'speedup'))
+    for num_people in args.people:
+        pairs = [random_frame_pair(rng, num_people) for _ in range(args.repeat)]
+        for pair in pairs:
+            (indexes_loop, cost_loop) = matching_loop(*pair)
+            for (indexes, cost) in (vectorized(*pair), pooled(*pair)):
+                assert np.allclose(cost_loop, cost, rtol=0, atol=1e-12) and (indexes == indexes_loop)
+        pooled(*pairs[0])
+        pool_frame_time = run((lambda *pair: matching_loop(*pair, pool_size=args.pool_size)), pairs)
+        loop_time = run(matching_loop, pairs)
+        vectorized_time = run(vectorized, pairs)
+        pooled_time = run(pooled, pairs)
+        print('{:>7} {:>13.1f} {:>10.1f} {:>15.2f} {:>15.2f} {:>8.0f}x'.format(num_people, (pool_frame_time * 1000), (loop_time * 1000), (vectorized_time * 1000), (pooled_time * 1000), (pool_frame_time / vectorized_time)))
+    pool.shutdown()
@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the PoseFlow ORB matching on a panning synthetic video: every pair described from scratch against the cached features, at full and reduced scale.'
+import argparse
+import time
+import cv2
+import numpy as np
+from trackers.PoseFlow.matching import OrbMatcher, orb_matching
+
+parser = argparse.ArgumentParser(description='AlphaPose PoseFlow ORB Benchmark')
+parser.add_argument('--size', type=int, nargs=2, default=[1920, 1080], help='frame width and height')
+parser.add_argument('--frames', type=int, default=6, help='number of frames')
+parser.add_argument('--pan', type=int, nargs=2, default=[5, 3], help='motion of the scene between frames, pixels')
+parser.add_argument('--orb_scale', type=float, nargs='+', default=[1.0, 0.5], help='orb_scale settings of the cached matcher')
+args = parser.parse_args()
+
+
+def panning_video(rng):
+    'Frames of a textured scene moving by --pan pixels per frame.'
+    (width, height) = args.size
+    (dx, dy) = args.pan
+    blocks = rng.randint(0, 255, ((((height + (dy * args.frames)) // 8) + 2), (((width + (dx * args.frames)) // 8) + 2), 3)).astype(np.uint8)
+    scene = cv2.GaussianBlur(blocks.repeat(8, axis=0).repeat(8, axis=1), (3, 3), 0)
+    return [scene[(dy * t):((dy * t) + height), (dx * t):((dx * t) + width)].copy() for t in range(args.frames)]
+
+
+def quality(cors):
+    'Correspondences per pair and the fraction of them within 2 pixels of the true motion.'
+    (dx, dy) = args.pan
+    error = np.abs(((cors[:, 2:4] - cors[:, 0:2]) + [dx, dy])).max(axis=1)
+    return (len(cors), (error <= 2).mean())
+
+
+if (__name__ == '__main__'):
+    frames = panning_video(np.random.RandomState(0))
+    # the features of describe are those orb_matching computed on each frame of a pair
+    orb = cv2.ORB_create(nfeatures=10000, scoreType=cv2.ORB_FAST_SCORE)
+    (kp, des) = orb.detectAndCompute(cv2.cvtColor(frames[0], cv2.COLOR_BGR2RGB), None)
+    (pts, des_cached) = OrbMatcher().describe(frames[0])
+    assert (np.array_equal(pts, np.array([k.pt for k in kp])) and np.array_equal(des, des_cached))
+    print('{:<22} {:>10} {:>10} {:>10}'.format('', 'ms/frame', 'cors', 'inliers'))
+    (start, results) = (time.perf_counter(), [])
+    for t in range(1, args.frames):
+        results.append(quality(orb_matching(frames[(t - 1)], frames[t])))
+    pair_time = ((time.perf_counter() - start) / (args.frames - 1))
+    print('{:<22} {:>10.0f} {:>10.0f} {:>10.3f}'.format('orb_matching per pair', (pair_time * 1000), *np.mean(results, axis=0)))
+    for scale in args.orb_scale:
+        matcher = OrbMatcher(scale=scale)
+        (start, results) = (time.perf_counter(), [])
+        prev_features = matcher.describe(frames[0])
+        for t in range(1, args.frames):
+            features = matcher.describe(frames[t])
+            results.append(quality(matcher.match(prev_features, features, frames[t].shape)))
+            prev_features = features
+        cached_time = ((time.perf_counter() - start) / (args.frames - 1))
+        print('{:<22} {:>10.0f} {:>10.0f} {:>10.3f}'.format('cached, orb_scale {}'.format(scale), (cached_time * 1000), *np.mean(results, axis=0)))
@@ -0,0 +1,83 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the PoseFlow region queries (--people and --cors sweeps): boxes tested against every correspondence against the sorted correspondence index.'
+import argparse
+import time
+import numpy as np
+from trackers.PoseFlow import utils
+from trackers.PoseFlow.utils import CorrespondenceIndex, cal_cost_matrix
+
+parser = argparse.ArgumentParser(description='AlphaPose PoseFlow Region Query Benchmark')
+parser.add_argument('--people', type=int, nargs='+', default=[5, 10, 20, 40], help='people per frame')
+parser.add_argument('--cors', type=int, nargs='+', default=[2000, 10000, 40000], help='correspondences per frame pair')
+parser.add_argument('--size', type=int, nargs=2, default=[1920, 1080], help='frame width and height')
+parser.add_argument('--repeat', type=int, default=3, help='number of frame pairs per setting')
+args = parser.parse_args()
+(WEIGHTS, WEIGHTS_FFF, NUM, MAG) = ([1, 2, 1, 2, 0, 0], [0, 1, 0, 1, 0, 0], 7, 30)
+COR_CHUNK = (1 << 16)
+
+
+def cal_dm_iou_dense(boxes1, boxes2, all_cors):
+    'cal_dm_iou_batch before the correspondence index: every box tested against every correspondence.'
+    inter = np.zeros((boxes1.shape[:(- 1)] + boxes2.shape[(- 2):(- 1)]))
+    num1 = np.zeros(boxes1.shape[:(- 1)])
+    num2 = np.zeros(boxes2.shape[:(- 1)])
+    for start in range(0, len(all_cors), COR_CHUNK):
+        (x1, y1, x2, y2) = [all_cors[start:(start + COR_CHUNK), col] for col in range(4)]
+        region1 = ((((x1 >= boxes1[..., 0:1]) & (x1 <= boxes1[..., 1:2])) & (y1 >= boxes1[..., 2:3])) & (y1 <= boxes1[..., 3:4])).astype(np.float32)
+        region2 = ((((x2 >= boxes2[..., 0:1]) & (x2 <= boxes2[..., 1:2])) & (y2 >= boxes2[..., 2:3])) & (y2 <= boxes2[..., 3:4])).astype(np.float32)
+        inter += np.matmul(region1, np.swapaxes(region2, (- 1), (- 2)))
+        num1 += region1.sum((- 1))
+        num2 += region2.sum((- 1))
+    union = ((num1[..., :, None] + num2[..., None, :]) - inter)
+    return (inter / (union + 1e-05))
+
+
+def random_frame_pair(rng, num_people, num_cors):
+    'Boxes, poses and scores of the people of two frames, and correspondences, a third of them on the people, in truncated pixel coordinates.'
+    (width, height) = args.size
+    h = rng.uniform(100, 400, num_people)
+    xy = (rng.rand(num_people, 2) * [(width - 160), (height - 400)])
+    motion = (rng.randn(num_people, 2) * 5)
+    cors = np.zeros((num_cors, 5))
+    cors[:, :2] = (rng.rand(num_cors, 2) * [width, height])
+    cors[:, 2:4] = (cors[:, :2] + (rng.randn(num_cors, 2) * 2))
+    on_people = rng.choice(num_cors, (num_cors // 3), replace=False)
+    owner = rng.randint(num_people, size=len(on_people))
+    cors[on_people, :2] = (xy[owner] + (rng.rand(len(on_people), 2) * np.stack([(h[owner] * 0.4), h[owner]], axis=1)))
+    cors[on_people, 2:4] = (cors[on_people, :2] + motion[owner])
+    cors[:, :4] = np.trunc(np.clip(cors[:, :4], 0, None))
+    frames = []
+    for offset in (0, motion):
+        poses = (((xy + offset)[:, None]) + (rng.rand(num_people, 17, 2) * np.stack([(h * 0.4), h], axis=1)[:, None]))
+        boxes = np.stack([poses[..., 0].min(1), poses[..., 0].max(1), poses[..., 1].min(1), poses[..., 1].max(1)], axis=1).astype(np.int64).astype(np.float64)
+        frames.append((boxes, poses, rng.rand(num_people)))
+    ((boxes1, poses1, scores1), (boxes2, poses2, scores2)) = frames
+    return (cors, boxes1, poses1, scores1, (rng.rand(num_people) < 0.8), boxes2, poses2, scores2, WEIGHTS, WEIGHTS_FFF, NUM, MAG)
+
+
+def run(pairs, indexed):
+    'Cost matrices of the pairs, with the index built per pair as best_matching_hungarian does, or with the dense region test.'
+    dm_iou = utils.cal_dm_iou_batch
+    if (not indexed):
+        utils.cal_dm_iou_batch = cal_dm_iou_dense
+    try:
+        start = time.perf_counter()
+        costs = [cal_cost_matrix(*(((CorrespondenceIndex(pair[0]),) if indexed else pair[:1]) + pair[1:])) for pair in pairs]
+        return (costs, ((time.perf_counter() - start) / len(pairs)))
+    finally:
+        utils.cal_dm_iou_batch = dm_iou
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    print('{:>7} {:>7} {:>10} {:>12} {:>9}'.format('people', 'cors', 'dense ms', 'indexed ms', 'speedup'))
+    for num_cors in args.cors:
+        for num_people in args.people:
+            pairs = [random_frame_pair(rng, num_people, num_cors) for _ in range(args.repeat)]
+            (costs_dense, dense_time) = run(pairs, False)
+            (costs_indexed, indexed_time) = run(pairs, True)
+            for (cost_dense, cost_indexed) in zip(costs_dense, costs_indexed):
+                assert np.array_equal(cost_dense, cost_indexed)
+            print('{:>7} {:>7} {:>10.1f} {:>12.2f} {:>8.1f}x'.format(num_people, num_cors, (dense_time * 1000), (indexed_time * 1000), (dense_time / indexed_time)))
@@ -0,0 +1,99 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the online PoseFlow state on a long stream: every frame kept and re-sorted each step against the link_len window flushed to a sink.'
+import argparse
+import copy
+import tempfile
+import time
+import numpy as np
+from trackers.PoseFlow.poseflow_infer import PoseFlowWrapper
+from trackers.PoseFlow.utils import best_matching_hungarian, stack_all_pids
+
+parser = argparse.ArgumentParser(description='AlphaPose PoseFlow Window Benchmark')
+parser.add_argument('--frames', type=int, default=4000, help='length of the stream')
+parser.add_argument('--people', type=int, default=5, help='people per frame')
+parser.add_argument('--size', type=int, nargs=2, default=[320, 180], help='frame width and height, frames without texture give the fake correspondences')
+parser.add_argument('--at', type=int, nargs='+', default=[100, 1000, 2000, 4000], help='stream positions to report, the 100 steps before each')
+args = parser.parse_args()
+
+
+class HistoryPoseFlowWrapper(PoseFlowWrapper):
+    'PoseFlowWrapper before the window: every frame kept, the frame names sorted every step and the history walked for the ids.'
+
+    def step(self, img, alphapose_results):
+        frame_name = os.path.basename(alphapose_results['imgname'])
+        _notrack = self.convert_results_to_no_track(alphapose_results)
+        self.notrack.update(_notrack)
+        self.track.update(self.convert_notrack_to_track(_notrack, img.shape[0], img.shape[1]))
+        if (len(self.track.keys()) == 1):
+            for pid in range(1, (self.track[frame_name]['num_boxes'] + 1)):
+                self.track[frame_name][pid]['new_pid'] = pid
+                self.track[frame_name][pid]['match_score'] = 0
+            self.prev_features = self.matcher.describe(img)
+            return self.final_result_by_name(frame_name)
+        frame_id_list = sorted([(int(os.path.splitext(i)[0]), os.path.splitext(i)[1]) for i in self.track.keys()])
+        frame_list = [''.join([str(i[0]), i[1]]) for i in frame_id_list]
+        prev_frame_name = frame_list[(- 2)]
+        self.max_pid_id = max(self.max_pid_id, self.track[prev_frame_name]['num_boxes'])
+        features = self.matcher.describe(img)
+        all_cors = self.matcher.match(self.prev_features, features, img.shape)
+        self.prev_features = features
+        if (self.track[frame_name]['num_boxes'] == 0):
+            self.track[frame_name] = copy.deepcopy(self.track[prev_frame_name])
+            return self.final_result_by_name(frame_name)
+        (cur_all_pids, cur_all_pids_fff) = stack_all_pids(self.track, frame_list, (len(frame_list) - 2), self.max_pid_id, self.link_len)
+        (match_indexes, match_scores) = best_matching_hungarian(all_cors, cur_all_pids, cur_all_pids_fff, self.track[frame_name], self.weights, self.weights_fff, self.num, self.mag)
+        for (pid1, pid2) in match_indexes:
+            if (match_scores[pid1][pid2] > self.match_thres):
+                self.track[frame_name][(pid2 + 1)]['new_pid'] = cur_all_pids[pid1]['new_pid']
+                self.max_pid_id = max(self.max_pid_id, self.track[frame_name][(pid2 + 1)]['new_pid'])
+                self.track[frame_name][(pid2 + 1)]['match_score'] = match_scores[pid1][pid2]
+        for next_pid in range(1, (self.track[frame_name]['num_boxes'] + 1)):
+            if ('new_pid' not in self.track[frame_name][next_pid]):
+                self.max_pid_id += 1
+                self.track[frame_name][next_pid]['new_pid'] = self.max_pid_id
+                self.track[frame_name][next_pid]['match_score'] = 0
+        return self.final_result_by_name(frame_name)
+
+    @property
+    def num_persons(self):
+        return max((self.track[frame_name][pid]['new_pid'] for frame_name in self.track for pid in range(1, (self.track[frame_name]['num_boxes'] + 1))), default=0)
+
+
+def random_stream(rng):
+    'Results of the pose model for people walking across the frame, a few of them leaving and coming back.'
+    (width, height) = args.size
+    pos = (rng.rand(args.people, 2) * [(width - 40), (height - 90)])
+    vel = rng.uniform((- 1), 1, (args.people, 2))
+    for t in range(args.frames):
+        pos = np.clip((pos + vel), 0, [(width - 40), (height - 90)])
+        vel[((pos <= 0) | (pos >= [(width - 40), (height - 90)]))] *= (- 1)
+        visible = ((np.arange(args.people) + (t // 50)) % 7 != 0)
+        result = [{'keypoints': (pos[p] + (rng.rand(17, 2) * [40, 90])), 'kp_score': rng.rand(17, 1), 'proposal_score': rng.rand(1)} for p in np.flatnonzero(visible)]
+        yield {'imgname': '{}.jpg'.format(t), 'result': result}
+
+
+def run(wrapper):
+    'Seconds of every step, and the ids of the people of every frame.'
+    img = np.full((args.size[1], args.size[0], 3), 128, dtype=np.uint8)
+    (step_times, ids) = ([], [])
+    for result in random_stream(np.random.RandomState(0)):
+        start = time.perf_counter()
+        people = wrapper.step(img, result)
+        # a live display reading the number of people of the video every frame
+        wrapper.num_persons
+        step_times.append((time.perf_counter() - start))
+        ids.append([person['idx'] for person in people])
+    return (np.array(step_times), ids)
+
+
+if (__name__ == '__main__'):
+    with tempfile.TemporaryDirectory() as tmp:
+        (history_times, history_ids) = run(HistoryPoseFlowWrapper(save_path=tmp))
+        window = PoseFlowWrapper(save_path=tmp, sink=(lambda frame_name, people: None))
+        (window_times, window_ids) = run(window)
+    assert (history_ids == window_ids)
+    print('{:>8} {:>14} {:>13} {:>16} {:>15}'.format('frame', 'history ms', 'window ms', 'history frames', 'window frames'))
+    for at in args.at:
+        print('{:>8} {:>14.2f} {:>13.2f} {:>16} {:>15}'.format(at, (history_times[max((at - 100), 0):at].mean() * 1000), (window_times[max((at - 100), 0):at].mean() * 1000), at, min(at, window.link_len)))
@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the render-and-write stage of DataWriter: inline against RenderPool (--render_workers).'
+import argparse
+import tempfile
+import time
+import cv2
+import numpy as np
+from easydict import EasyDict as edict
+from alphapose.utils.render_pool import RenderPool
+from alphapose.utils.vis import vis_frame_composite, vis_frame_fast
+
+parser = argparse.ArgumentParser(description='AlphaPose Render Pool Benchmark')
+parser.add_argument('--size', type=int, nargs=2, default=[1280, 720], help='frame width and height')
+parser.add_argument('--frames', type=int, default=60, help='number of frames')
+parser.add_argument('--people', type=int, default=5, help='number of people per frame')
+parser.add_argument('--keypoints', type=int, default=17, help='number of keypoints per pose')
+parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='number of render workers')
+parser.add_argument('--vis_fast', action='store_true', default=False, help='render with vis_frame_fast')
+parser.add_argument('--processes', action='store_true', default=False, help='use worker processes instead of threads')
+args = parser.parse_args()
+
+
+def random_result(rng, name):
+    (width, height) = args.size
+    result = []
+    for k in range(args.people):
+        size = ((rng.rand() * (height / 2)) + (height / 8))
+        center = (rng.rand(2) * [width, height])
+        keypoints = (center + ((rng.rand(args.keypoints, 2) - 0.5) * [(size / 2), size]))
+        kp_score = rng.rand(args.keypoints, 1)
+        (x_min, y_min) = keypoints.min(axis=0)
+        (x_max, y_max) = keypoints.max(axis=0)
+        result.append({'keypoints': keypoints.astype(np.float32), 'kp_score': kp_score.astype(np.float32), 'idx': k, 'box': [x_min, y_min, (x_max - x_min), (y_max - y_min)]})
+    return {'imgname': name, 'result': result}
+
+
+class JpegWriter():
+    'write_image of DataWriter with --save_img, keeping the order of the written frames.'
+
+    def __init__(self, outputpath):
+        self.outputpath = outputpath
+        self.names = []
+
+    def __call__(self, img, im_name):
+        cv2.imwrite(os.path.join(self.outputpath, im_name), img)
+        self.names.append(im_name)
+
+
+def run_inline(vis_frame, frames, opt, vis_thres, write_func):
+    start = time.perf_counter()
+    for (img, result) in frames:
+        write_func(vis_frame(img, result, opt, vis_thres), result['imgname'])
+    return (time.perf_counter() - start)
+
+
+def run_pool(vis_frame, frames, opt, vis_thres, write_func, num_workers):
+    start = time.perf_counter()
+    render_pool = RenderPool(num_workers, write_func, use_threads=(not args.processes)).start()
+    for (img, result) in frames:
+        render_pool.put(vis_frame, img, result, opt, list(vis_thres), result['imgname'])
+    assert (render_pool.stop() is None)
+    return (time.perf_counter() - start)
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    (width, height) = args.size
+    frames = [(rng.randint(0, 256, (height, width, 3)).astype(np.uint8), random_result(rng, '{}.jpg'.format(i))) for i in range(args.frames)]
+    opt = edict({'tracking': False, 'pose_track': False, 'showbox': True})
+    vis_frame = (vis_frame_fast if args.vis_fast else vis_frame_composite)
+    vis_thres = ([0.4] * args.keypoints)
+    names = [result['imgname'] for (_, result) in frames]
+    with tempfile.TemporaryDirectory() as outputpath:
+        write_func = JpegWriter(outputpath)
+        inline_time = run_inline(vis_frame, frames, opt, list(vis_thres), write_func)
+        assert (write_func.names == names)
+        reference = [cv2.imread(os.path.join(outputpath, name)) for name in names]
+        print('{:>8} {:>10} {:>9}'.format('workers', 'frames/s', 'speedup'))
+        print('{:>8} {:>10.1f} {:>8.1f}x'.format('inline', (len(frames) / inline_time), 1.0))
+        for num_workers in args.workers:
+            write_func = JpegWriter(outputpath)
+            pool_time = run_pool(vis_frame, frames, opt, vis_thres, write_func, num_workers)
+            assert (write_func.names == names), 'frames written out of order'
+            for (name, img) in zip(names, reference):
+                assert np.array_equal(cv2.imread(os.path.join(outputpath, name)), img)
+            print('{:>8} {:>10.1f} {:>8.1f}x'.format(num_workers, (len(frames) / pool_time), (inline_time / pool_time)))
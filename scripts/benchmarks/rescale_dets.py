@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the last step of the detectors: per-detection rescale and clamp against BaseDetector.rescale_dets.'
+import argparse
+import time
+import numpy as np
+import jittor as jt
+from detector.apis import BaseDetector
+
+parser = argparse.ArgumentParser(description='AlphaPose Detection Rescale Benchmark')
+parser.add_argument('--dets', type=int, nargs='+', default=[5, 50, 200], help='number of detections per batch')
+parser.add_argument('--inp_dim', type=int, default=608, help='input size of the network')
+parser.add_argument('--repeat', type=int, default=10, help='number of batches per setting')
+args = parser.parse_args()
+
+
+class Detector(BaseDetector):
+
+    def image_preprocess(self, img_name):
+        pass
+
+    def images_detection(self, imgs, orig_dim_list):
+        pass
+
+    def detect_one_img(self, img_name):
+        pass
+
+
+def rescale_loop(dets, orig_dim_list, inp_dim, center):
+    'End of images_detection of YOLODetector (center) and YOLOXDetector before rescale_dets.'
+    orig_dim_list = orig_dim_list[dets[:, 0].long()]
+    scaling_factor = jt.min((inp_dim / orig_dim_list), 1).view((- 1), 1)
+    if center:
+        dets[:, [1, 3]] -= ((inp_dim - (scaling_factor * orig_dim_list[:, 0].view(((- 1), 1)))) / 2)
+        dets[:, [2, 4]] -= ((inp_dim - (scaling_factor * orig_dim_list[:, 1].view(((- 1), 1)))) / 2)
+    dets[:, 1:5] /= scaling_factor
+    for i in range(dets.shape[0]):
+        dets[(i, [1, 3])] = jt.clamp(dets[(i, [1, 3])], min_v=0.0, max_v=orig_dim_list[(i, 0)])
+        dets[(i, [2, 4])] = jt.clamp(dets[(i, [2, 4])], min_v=0.0, max_v=orig_dim_list[(i, 1)])
+    return dets
+
+
+def run(func, batches, center):
+    start = time.perf_counter()
+    for (dets, orig_dim_list) in batches:
+        func(jt.array(dets), orig_dim_list, args.inp_dim, center).sync()
+    return ((time.perf_counter() - start) / len(batches))
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    detector = Detector()
+    orig_dim_list = jt.float32([[1920, 1080], [640, 480], [480, 640], [1280, 720]]).repeat(1, 2)
+    print('{:>6} {:>8} {:>12} {:>12} {:>9}'.format('dets', 'center', 'loop ms', 'shared ms', 'speedup'))
+    for num in args.dets:
+        batches = [(np.concatenate([rng.randint(0, orig_dim_list.shape[0], (num, 1)), ((rng.rand(num, 4) * (args.inp_dim + 80)) - 40), rng.rand(num, 3)], axis=1).astype(np.float32), orig_dim_list) for _ in range(args.repeat)]
+        for center in (True, False):
+            for (dets, _) in batches:
+                assert np.array_equal(rescale_loop(jt.array(dets), orig_dim_list, args.inp_dim, center).numpy(), detector.rescale_dets(jt.array(dets), orig_dim_list, args.inp_dim, center).numpy())
+            loop_time = run(rescale_loop, batches, center)
+            shared_time = run(detector.rescale_dets, batches, center)
+            print('{:>6} {:>8} {:>12.2f} {:>12.2f} {:>8.1f}x'.format(num, str(center), (loop_time * 1000), (shared_time * 1000), (loop_time / shared_time)))
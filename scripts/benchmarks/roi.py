@@ -0,0 +1,58 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the ROI of a fixed camera (--roi): detector input scale, pose crops and the cost of mapping the detections back.'
+import argparse
+import time
+import numpy as np
+from alphapose.utils.roi import RegionOfInterest
+
+parser = argparse.ArgumentParser(description='AlphaPose ROI Benchmark')
+parser.add_argument('--size', type=int, nargs=2, default=[1920, 1080], help='frame width and height')
+parser.add_argument('--inp_dim', type=int, default=608, help='input size of the detector')
+parser.add_argument('--detbatch', type=int, default=5, help='detection batch size')
+parser.add_argument('--dets', type=int, default=20, help='detections per frame, spread over the whole frame')
+parser.add_argument('--repeat', type=int, default=100, help='number of batches')
+args = parser.parse_args()
+
+
+def random_dets(rng, roi_size):
+    'Detections of a batch in crop coordinates: batch_idx, x1, y1, x2, y2, scores and class.'
+    (w, h) = roi_size
+    dets = np.zeros(((args.detbatch * args.dets), 8), dtype=np.float32)
+    dets[:, 0] = np.repeat(np.arange(args.detbatch), args.dets)
+    xy = (rng.rand(len(dets), 2) * [w, h])
+    size = ((rng.rand(len(dets), 2) * [80, 200]) + 20)
+    dets[:, 1:3] = np.clip((xy - (size / 2)), 0, None)
+    dets[:, 3:5] = np.minimum((xy + (size / 2)), [w, h])
+    dets[:, 5:7] = rng.rand(len(dets), 2)
+    return dets
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    (width, height) = args.size
+    # walkway seen from above: people can only be on it, a trapezoid narrowing to the top of the frame
+    roi = RegionOfInterest(polygons=[[[int((width * 0.4)), int((height * 0.3))], [int((width * 0.6)), int((height * 0.3))], [int((width * 0.75)), (height - 1)], [int((width * 0.25)), (height - 1)]]])
+    frames = [np.zeros((height, width, 3), dtype=np.uint8)] * args.detbatch
+    (crop, _) = roi.crop(frames[0])
+    (mask, _) = roi.region(width, height)
+    print('{:<28} {:>12} {:>12}'.format('', 'full frame', 'roi'))
+    print('{:<28} {:>12} {:>12}'.format('detector input (w x h)', '{}x{}'.format(width, height), '{}x{}'.format(crop.shape[1], crop.shape[0])))
+    print('{:<28} {:>12.3f} {:>12.3f}'.format('input px per frame px', min((args.inp_dim / width), (args.inp_dim / height)), min((args.inp_dim / crop.shape[1]), (args.inp_dim / crop.shape[0]))))
+    # INP_DIM (a multiple of 32) seeing the people of the roi as large as the full frame at inp_dim
+    scale = min((args.inp_dim / width), (args.inp_dim / height))
+    roi_dim = (32 * int(np.ceil(((max(crop.shape[:2]) * scale) / 32))))
+    print('{:<28} {:>12} {:>12}'.format('INP_DIM, same scale', args.inp_dim, roi_dim))
+    print('{:<28} {:>12.2f} {:>12.2f}'.format('detector FLOPs, same scale', 1.0, ((roi_dim / args.inp_dim) ** 2)))
+    print('{:<28} {:>12.2f} {:>12.2f}'.format('area searched', 1.0, (mask.sum() / (width * height))))
+    (kept, start) = (0, time.perf_counter())
+    for _ in range(args.repeat):
+        dets = random_dets(rng, (width, height))
+        # the same people as seen on the crop
+        (_, (x0, y0, _, _)) = roi.region(width, height)
+        dets[:, 1:5] -= np.float32([x0, y0, x0, y0])
+        kept += len(roi.restore(dets, frames))
+    restore_time = ((time.perf_counter() - start) / args.repeat)
+    print('{:<28} {:>12.1f} {:>12.1f}'.format('pose crops per frame', args.dets, (kept / (args.repeat * args.detbatch))))
+    print('{:<28} {:>12} {:>12.3f}'.format('restore ms per batch', '-', (restore_time * 1000)))
@@ -0,0 +1,107 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the tiled detection mode (TILE_SIZE) on high-resolution frames: recall of small people and network input memory against whole-frame detection.'
+import argparse
+import time
+import cv2
+import numpy as np
+import jittor as jt
+from detector.apis import BaseDetector, tile_starts
+
+parser = argparse.ArgumentParser(description='AlphaPose Tiled Detection Benchmark')
+parser.add_argument('--size', type=int, nargs=2, default=[3840, 2160], help='frame width and height')
+parser.add_argument('--frames', type=int, default=4, help='number of frames')
+parser.add_argument('--people', type=int, default=40, help='number of people per frame')
+parser.add_argument('--inp_dim', type=int, default=608, help='input size of the network')
+parser.add_argument('--min_size', type=int, default=8, help='smallest person height the network resolves, in input pixels')
+parser.add_argument('--tile_size', type=int, nargs='+', default=[640, 1024], help='TILE_SIZE settings')
+parser.add_argument('--tile_overlap', type=int, default=128, help='TILE_OVERLAP')
+parser.add_argument('--tile_batch', type=int, default=8, help='TILE_BATCH')
+args = parser.parse_args()
+
+
+class BlobDetector(BaseDetector):
+    'Stand-in for a network with a fixed input size: finds the bright people on the letterboxed input, missing those under min_size.'
+
+    def __init__(self, inp_dim, min_size):
+        super(BlobDetector, self).__init__()
+        (self.inp_dim, self.min_size, self.nms_thres) = (inp_dim, min_size, 0.6)
+
+    def image_preprocess(self, img):
+        (h, w) = img.shape[:2]
+        scale = min((self.inp_dim / w), (self.inp_dim / h))
+        (new_w, new_h) = (int((w * scale)), int((h * scale)))
+        canvas = np.full((self.inp_dim, self.inp_dim), 0, dtype=np.float32)
+        (x0, y0) = (((self.inp_dim - new_w) // 2), ((self.inp_dim - new_h) // 2))
+        canvas[y0:(y0 + new_h), x0:(x0 + new_w)] = (cv2.resize(img[:, :, 0], (new_w, new_h), interpolation=cv2.INTER_AREA) / 255.0)
+        return jt.array(canvas[(None, None)])
+
+    def images_detection(self, imgs, orig_dim_list):
+        dets = []
+        for (k, img) in enumerate(imgs.numpy()):
+            (num, _, stats, _) = cv2.connectedComponentsWithStats((img[0] > 0.5).astype(np.uint8))
+            for (x, y, w, h, _) in stats[1:num]:
+                if (h >= self.min_size):
+                    dets.append([k, x, y, (x + w), (y + h), 0.9, 0.9, 0])
+        if (len(dets) == 0):
+            return 0
+        return self.rescale_dets(jt.float32(dets), orig_dim_list, self.inp_dim)
+
+    def detect_one_img(self, img_name):
+        pass
+
+
+def random_frame(rng):
+    'Dark frame with people as bright 1:2.5 boxes, from far away (a few pixels) to close up, without overlaps.'
+    (width, height) = args.size
+    img = rng.randint(0, 60, (height, width, 3)).astype(np.uint8)
+    occupied = np.zeros((height, width), dtype=bool)
+    boxes = []
+    while (len(boxes) < args.people):
+        h = int(np.exp(rng.uniform(np.log(20), np.log((height / 3)))))
+        w = max(int((h / 2.5)), 4)
+        (x, y) = (rng.randint(0, (width - w)), rng.randint(0, (height - h)))
+        if occupied[max((y - 4), 0):((y + h) + 4), max((x - 4), 0):((x + w) + 4)].any():
+            continue
+        occupied[y:(y + h), x:(x + w)] = True
+        img[y:(y + h), x:(x + w)] = 230
+        boxes.append([x, y, (x + w), (y + h)])
+    return (img, np.float32(boxes))
+
+
+def recall(dets, boxes, thresh=0.5):
+    if isinstance(dets, int):
+        return 0
+    dets = dets[:, 1:5]
+    (lt, rb) = (np.maximum(boxes[:, None, :2], dets[None, :, :2]), np.minimum(boxes[:, None, 2:], dets[None, :, 2:]))
+    inter = np.clip((rb - lt), 0, None).prod(axis=2)
+    union = (((boxes[:, 2:] - boxes[:, :2]).prod(axis=1)[:, None] + (dets[:, 2:] - dets[:, :2]).prod(axis=1)[None]) - inter)
+    return int(((inter / union).max(axis=1) >= thresh).sum())
+
+
+def run(func, frames):
+    (found, start) = (0, time.perf_counter())
+    for (img, boxes) in frames:
+        dets = func(img)
+        found += recall((dets if isinstance(dets, int) else dets.numpy()), boxes)
+    return ((found / (len(frames) * args.people)), ((time.perf_counter() - start) / len(frames)))
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    frames = [random_frame(rng) for _ in range(args.frames)]
+    (width, height) = args.size
+    print('{:<14} {:>7} {:>9} {:>10} {:>14}'.format('mode', 'views', 'recall', 'ms/frame', 'input MB/pass'))
+    detector = BlobDetector(args.inp_dim, args.min_size)
+    whole = (lambda img: detector.images_detection(detector.image_preprocess(img), jt.float32([[width, height]]).repeat(1, 2)))
+    (found, run_time) = run(whole, frames)
+    print('{:<14} {:>7} {:>9.2f} {:>10.1f} {:>14.1f}'.format('whole frame', 1, found, (run_time * 1000), (((12 * args.inp_dim) * args.inp_dim) / 1000000.0)))
+    # float32 BGR network input, at the size that keeps the smallest people resolvable without tiles
+    full_dim = max(width, height)
+    print('{:<14} {:>7} {:>9} {:>10} {:>14.1f}'.format('full res', 1, '-', '-', (((12 * full_dim) * full_dim) / 1000000.0)))
+    for tile_size in args.tile_size:
+        detector.set_tiling({'TILE_SIZE': tile_size, 'TILE_OVERLAP': args.tile_overlap, 'TILE_BATCH': args.tile_batch})
+        (found, run_time) = run((lambda img: detector.images_detection_tiled([img])), frames)
+        views = (1 + (len(tile_starts(width, tile_size, args.tile_overlap)) * len(tile_starts(height, tile_size, args.tile_overlap))))
+        print('{:<14} {:>7} {:>9.2f} {:>10.1f} {:>14.1f}'.format('tiles {}'.format(tile_size), views, found, (run_time * 1000), ((((12 * args.tile_batch) * args.inp_dim) * args.inp_dim) / 1000000.0)))
@@ -0,0 +1,62 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the frame renderers: vis_frame and vis_frame_fast against vis_frame_composite.'
+import argparse
+import time
+import numpy as np
+from easydict import EasyDict as edict
+from alphapose.utils.vis import vis_frame, vis_frame_fast, vis_frame_composite
+
+parser = argparse.ArgumentParser(description='AlphaPose Rendering Benchmark')
+parser.add_argument('--size', type=int, nargs=2, default=[1920, 1080], help='frame width and height')
+parser.add_argument('--people', type=int, nargs='+', default=[1, 10], help='number of people per frame')
+parser.add_argument('--keypoints', type=int, nargs='+', default=[17, 136], help='number of keypoints per pose')
+parser.add_argument('--repeat', type=int, default=3, help='number of frames per setting')
+parser.add_argument('--showbox', action='store_true', default=False, help='draw the boxes')
+args = parser.parse_args()
+
+
+def vis_thres_for(kp_num):
+    'vis_thres of DataWriter.'
+    if (kp_num == 136):
+        return (([0.4] * (kp_num - 110)) + ([0.05] * 110))
+    return ([0.4] * kp_num)
+
+
+def random_result(kp_num, num_people, rng):
+    (width, height) = args.size
+    result = []
+    for k in range(num_people):
+        size = ((rng.rand() * (height / 2)) + (height / 8))
+        center = (rng.rand(2) * [width, height])
+        keypoints = (center + ((rng.rand(kp_num, 2) - 0.5) * [(size / 2), size]))
+        kp_score = rng.rand(kp_num, 1)
+        (x_min, y_min) = keypoints.min(axis=0)
+        (x_max, y_max) = keypoints.max(axis=0)
+        result.append({'keypoints': keypoints.astype(np.float32), 'kp_score': kp_score.astype(np.float32), 'idx': k, 'box': [x_min, y_min, (x_max - x_min), (y_max - y_min)]})
+    return {'imgname': 'bench.jpg', 'result': result}
+
+
+def run(func, frame, results, opt, kp_num):
+    imgs = []
+    start = time.perf_counter()
+    for result in results:
+        imgs.append(func(frame, result, opt, vis_thres_for(kp_num)))
+    return (((time.perf_counter() - start) / len(results)), imgs)
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    (width, height) = args.size
+    frame = rng.randint(0, 256, (height, width, 3)).astype(np.uint8)
+    opt = edict({'tracking': False, 'pose_track': False, 'showbox': args.showbox})
+    print('{:>9} {:>7} {:>14} {:>12} {:>14} {:>9} {:>14}'.format('keypoints', 'people', 'vis_frame ms', 'fast ms', 'composite ms', 'speedup', 'diff mean/max'))
+    for kp_num in args.keypoints:
+        for num_people in args.people:
+            results = [random_result(kp_num, num_people, rng) for _ in range(args.repeat)]
+            (vis_time, vis_imgs) = run(vis_frame, frame, results, opt, kp_num)
+            (fast_time, _) = run(vis_frame_fast, frame, results, opt, kp_num)
+            (composite_time, composite_imgs) = run(vis_frame_composite, frame, results, opt, kp_num)
+            diff = np.abs((np.stack(vis_imgs).astype(np.int16) - np.stack(composite_imgs)))
+            print('{:>9} {:>7} {:>14.1f} {:>12.1f} {:>14.1f} {:>8.1f}x {:>8.3f}/{:<5}'.format(kp_num, num_people, (vis_time * 1000), (fast_time * 1000), (composite_time * 1000), (vis_time / composite_time), diff.mean(), diff.max()))
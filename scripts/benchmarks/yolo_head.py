@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'detector'))
+'Benchmark of the YOLO head decode: predict_transform rebuilding its grid every pass against the cached grid and fused decode.'
+import argparse
+import time
+import numpy as np
+import jittor as jt
+from yolo.util import predict_transform
+
+parser = argparse.ArgumentParser(description='AlphaPose YOLO Head Benchmark')
+parser.add_argument('--detbatch', type=int, nargs='+', default=[1, 5, 10], help='detection batch sizes')
+parser.add_argument('--inp_dim', type=int, default=608, help='input size of the network')
+parser.add_argument('--repeat', type=int, default=10, help='number of passes per setting')
+args = parser.parse_args()
+# anchors of the three heads of yolov3-spp.cfg
+ANCHORS = [[(116, 90), (156, 198), (373, 326)], [(30, 61), (62, 45), (59, 119)], [(10, 13), (16, 30), (33, 23)]]
+NUM_CLASSES = 80
+
+
+def predict_transform_loop(prediction, inp_dim, anchors, num_classes, args):
+    'predict_transform before the grid cache.'
+    batch_size = prediction.shape[0]
+    stride = (inp_dim // prediction.shape[2])
+    grid_size = (inp_dim // stride)
+    bbox_attrs = (5 + num_classes)
+    num_anchors = len(anchors)
+    anchors = [((a[0] / stride), (a[1] / stride)) for a in anchors]
+    prediction = prediction.view((batch_size, (bbox_attrs * num_anchors), (grid_size * grid_size)))
+    prediction = prediction.transpose(1, 2)
+    prediction = prediction.view((batch_size, ((grid_size * grid_size) * num_anchors), bbox_attrs))
+    prediction[:, :, 0] = jt.sigmoid(prediction[:, :, 0])
+    prediction[:, :, 1] = jt.sigmoid(prediction[:, :, 1])
+    prediction[:, :, 4] = jt.sigmoid(prediction[:, :, 4])
+    grid_len = np.arange(grid_size)
+    (a, b) = np.meshgrid(grid_len, grid_len)
+    x_offset = jt.float32(a).view(((- 1), 1))
+    y_offset = jt.float32(b).view(((- 1), 1))
+    x_y_offset = jt.concat((x_offset, y_offset), 1).repeat(1, num_anchors).view(((- 1), 2)).unsqueeze(0)
+    prediction[:, :, :2] += x_y_offset
+    anchors = jt.float32(anchors)
+    anchors = anchors.repeat((grid_size * grid_size), 1).unsqueeze(0)
+    prediction[:, :, 2:4] = (jt.exp(prediction[:, :, 2:4]) * anchors)
+    prediction[:, :, 5:(5 + num_classes)] = jt.sigmoid(prediction[:, :, 5:(5 + num_classes)])
+    prediction[:, :, :4] *= stride
+    return prediction
+
+
+def decode(func, heads):
+    return jt.concat([func(x, args.inp_dim, anchors, NUM_CLASSES, None) for (x, anchors) in heads], dim=1)
+
+
+def run(func, heads):
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        decode(func, heads).sync()
+    return ((time.perf_counter() - start) / args.repeat)
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    print('{:>9} {:>12} {:>12} {:>9} {:>10}'.format('detbatch', 'loop ms', 'cached ms', 'speedup', 'max diff'))
+    for batch_size in args.detbatch:
+        heads = [(jt.array(rng.randn(batch_size, (3 * (5 + NUM_CLASSES)), (args.inp_dim // stride), (args.inp_dim // stride)).astype(np.float32)), anchors) for (stride, anchors) in zip((32, 16, 8), ANCHORS)]
+        (pred_loop, pred_cached) = (decode(predict_transform_loop, heads).numpy(), decode(predict_transform, heads).numpy())
+        # the fused kernel may round a sigmoid to the next float32
+        assert np.allclose(pred_loop, pred_cached, rtol=1e-06, atol=0)
+        loop_time = run(predict_transform_loop, heads)
+        cached_time = run(predict_transform, heads)
+        print('{:>9} {:>12.2f} {:>12.2f} {:>8.1f}x {:>10.1e}'.format(batch_size, (loop_time * 1000), (cached_time * 1000), (loop_time / cached_time), np.abs((pred_loop - pred_cached)).max()))
@@ -0,0 +1,77 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+'Benchmark of the YOLO post-processing (--detbatch sweep): per-image, per-class write_results against the batched person path.'
+import argparse
+import time
+import numpy as np
+import jittor as jt
+from detector.yolo_api import YOLODetector
+from detector.yolo_cfg import cfg
+
+parser = argparse.ArgumentParser(description='AlphaPose YOLO Post-processing Benchmark')
+parser.add_argument('--detbatch', type=int, nargs='+', default=[1, 5, 10, 20], help='detection batch sizes')
+parser.add_argument('--inp_dim', type=int, default=608, help='input size of the network')
+parser.add_argument('--people', type=int, default=10, help='average number of people per image')
+parser.add_argument('--confidence', type=float, default=0.05, help='objectness threshold')
+parser.add_argument('--repeat', type=int, default=5, help='number of batches per setting')
+args = parser.parse_args()
+
+
+def random_prediction(batch_size, num_classes, rng):
+    'Output of Darknet: center x, center y, w, h, objectness and class scores, a few clusters of candidates around each person.'
+    num = (3 * sum((((args.inp_dim // stride) ** 2) for stride in (32, 16, 8))))
+    pred = np.zeros((batch_size, num, (5 + num_classes)), dtype=np.float32)
+    pred[:, :, :2] = (rng.rand(batch_size, num, 2) * args.inp_dim)
+    pred[:, :, 2:4] = ((rng.rand(batch_size, num, 2) * 200) + 8)
+    pred[:, :, 4] = (rng.rand(batch_size, num) ** 8)
+    pred[:, :, 5:] = rng.rand(batch_size, num, num_classes)
+    for b in range(batch_size):
+        for _ in range(rng.poisson(args.people)):
+            (center, size) = ((rng.rand(2) * args.inp_dim), ((rng.rand(2) * [100, 250]) + 20))
+            anchors = rng.choice(num, 30, replace=False)
+            pred[b, anchors, :2] = (center + (rng.randn(30, 2) * 6))
+            pred[b, anchors, 2:4] = (size * (1 + (rng.randn(30, 2) * 0.1)))
+            pred[b, anchors, 4] = rng.rand(30)
+            pred[b, anchors, 5] = (1 + rng.rand(30))
+    return jt.array(pred)
+
+
+def dynamic_write_results_loop(detector, prediction, confidence, num_classes, nms=True, nms_conf=0.4):
+    'dynamic_write_results before the batched person path.'
+    prediction_bak = prediction.clone()
+    dets = detector.write_results(prediction.clone(), confidence, num_classes, nms, nms_conf)
+    if isinstance(dets, int):
+        return dets
+    if (dets.shape[0] > 100):
+        nms_conf -= 0.05
+        dets = detector.write_results(prediction_bak.clone(), confidence, num_classes, nms, nms_conf)
+    return dets
+
+
+def run(func, predictions):
+    start = time.perf_counter()
+    for prediction in predictions:
+        dets = func(prediction)
+        if (not isinstance(dets, int)):
+            dets.sync()
+    return ((time.perf_counter() - start) / len(predictions))
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    detector = YOLODetector(cfg)
+    loop = (lambda prediction: dynamic_write_results_loop(detector, prediction, args.confidence, detector.num_classes, nms=True, nms_conf=detector.nms_thres))
+    batched = (lambda prediction: detector.dynamic_write_results(prediction, args.confidence, detector.num_classes, nms=True, nms_conf=detector.nms_thres))
+    print('{:>9} {:>10} {:>12} {:>12} {:>9}'.format('detbatch', 'dets', 'loop ms', 'batched ms', 'speedup'))
+    for batch_size in args.detbatch:
+        predictions = [random_prediction(batch_size, detector.num_classes, rng) for _ in range(args.repeat)]
+        num_dets = 0
+        for prediction in predictions:
+            (dets_loop, dets_batched) = (loop(prediction), batched(prediction))
+            assert np.array_equal(dets_loop.numpy(), dets_batched.numpy())
+            num_dets += dets_batched.shape[0]
+        run(batched, predictions[:1])
+        loop_time = run(loop, predictions)
+        batched_time = run(batched, predictions)
+        print('{:>9} {:>10.1f} {:>12.2f} {:>12.2f} {:>8.1f}x'.format(batch_size, (num_dets / len(predictions)), (loop_time * 1000), (batched_time * 1000), (loop_time / batched_time)))
@@ -0,0 +1,103 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'detector'))
+'Benchmark of the YOLOX post-processing (--detbatch sweep): per-image postprocess run twice on a cloned prediction against the batched candidates and nms.'
+import argparse
+import time
+import numpy as np
+import jittor as jt
+from detector.nms.nms_wrapper import nms
+from detector.yolox_api import YOLOXDetector
+
+parser = argparse.ArgumentParser(description='AlphaPose YOLOX Post-processing Benchmark')
+parser.add_argument('--detbatch', type=int, nargs='+', default=[1, 5, 10, 20], help='detection batch sizes')
+parser.add_argument('--inp_dim', type=int, default=640, help='input size of the network')
+parser.add_argument('--people', type=int, default=10, help='average number of people per image')
+parser.add_argument('--crowd', type=float, default=0.2, help='fraction of the batches crowded enough to run the nms twice')
+parser.add_argument('--repeat', type=int, default=5, help='number of batches per setting')
+args = parser.parse_args()
+
+
+def random_prediction(batch_size, num_classes, rng, people):
+    'Output of YOLOX: center x, center y, w, h, objectness and class scores, a few clusters of candidates around each person.'
+    num = sum((((args.inp_dim // stride) ** 2) for stride in (32, 16, 8)))
+    pred = np.zeros((batch_size, num, (5 + num_classes)), dtype=np.float32)
+    pred[:, :, :2] = (rng.rand(batch_size, num, 2) * args.inp_dim)
+    pred[:, :, 2:4] = ((rng.rand(batch_size, num, 2) * 200) + 8)
+    pred[:, :, 4] = (rng.rand(batch_size, num) ** 4)
+    pred[:, :, 5:] = (rng.rand(batch_size, num, num_classes) ** 4)
+    for b in range(batch_size):
+        for _ in range(rng.poisson(people)):
+            (center, size) = ((rng.rand(2) * args.inp_dim), ((rng.rand(2) * [100, 250]) + 20))
+            anchors = rng.choice(num, 30, replace=False)
+            pred[b, anchors, :2] = (center + (rng.randn(30, 2) * 6))
+            pred[b, anchors, 2:4] = (size * (1 + (rng.randn(30, 2) * 0.1)))
+            pred[b, anchors, 4] = rng.rand(30)
+            pred[b, anchors, 5] = (1 + rng.rand(30))
+    return jt.array(pred)
+
+
+def postprocess_loop(prediction, num_classes, conf_thre=0.7, nms_thre=0.45, classes=0):
+    'postprocess before the batched candidates and nms.'
+    box_corner = jt.rand(prediction.shape)
+    box_corner[:, :, 0] = (prediction[:, :, 0] - (prediction[:, :, 2] / 2))
+    box_corner[:, :, 1] = (prediction[:, :, 1] - (prediction[:, :, 3] / 2))
+    box_corner[:, :, 2] = (prediction[:, :, 0] + (prediction[:, :, 2] / 2))
+    box_corner[:, :, 3] = (prediction[:, :, 1] + (prediction[:, :, 3] / 2))
+    prediction[:, :, :4] = box_corner[:, :, :4]
+    output = 0
+    for (i, image_pred) in enumerate(prediction):
+        (class_pred, class_conf) = jt.argmax(image_pred[:, 5:(5 + num_classes)], dim=1, keepdims=True)
+        conf_mask = ((image_pred[:, 4] * class_conf.squeeze(-1)) >= conf_thre).flatten()
+        detections = jt.contrib.concat((image_pred[:, :5], class_conf, class_pred.float()), dim=1)
+        detections = detections[conf_mask]
+        if (classes is not None):
+            detections = detections[(detections[:, 6:7] == jt.array(classes)).any(1)]
+        if (not detections.shape[0]):
+            continue
+        detections = detections[nms(detections[:, :4], (detections[:, 4] * detections[:, 5]), nms_thre)]
+        batch_idx = jt.full_like(jt.rand(detections.shape[0], 1), i)
+        detections = jt.contrib.concat((batch_idx, detections), dim=1)
+        output = (detections if isinstance(output, int) else jt.contrib.concat((output, detections)))
+    return output
+
+
+def dynamic_write_results_loop(prediction, num_classes, conf_thres, nms_thres, classes=0):
+    'dynamic_write_results before the batched candidates and nms.'
+    prediction_bak = prediction.clone()
+    dets = postprocess_loop(prediction.clone(), num_classes, conf_thres, nms_thres, classes)
+    if isinstance(dets, int):
+        return dets
+    if (dets.shape[0] > 100):
+        dets = postprocess_loop(prediction_bak.clone(), num_classes, conf_thres, (nms_thres - 0.05), classes)
+    return dets
+
+
+def run(func, predictions):
+    start = time.perf_counter()
+    for prediction in predictions:
+        dets = func(prediction)
+        if (not isinstance(dets, int)):
+            dets.sync()
+    return ((time.perf_counter() - start) / len(predictions))
+
+
+if (__name__ == '__main__'):
+    rng = np.random.RandomState(0)
+    detector = YOLOXDetector({'INP_DIM': args.inp_dim})
+    loop = (lambda prediction: dynamic_write_results_loop(prediction, detector.num_classes, detector.conf_thres, detector.nms_thres))
+    batched = (lambda prediction: detector.dynamic_write_results(prediction, detector.num_classes, detector.conf_thres, detector.nms_thres))
+    print('{:>9} {:>10} {:>12} {:>12} {:>9}'.format('detbatch', 'dets', 'loop ms', 'batched ms', 'speedup'))
+    for batch_size in args.detbatch:
+        # a crowded batch has more than 100 people left after the first nms
+        predictions = [random_prediction(batch_size, detector.num_classes, rng, (args.people if (rng.rand() >= args.crowd) else max(args.people, (120 // batch_size)))) for _ in range(args.repeat)]
+        num_dets = 0
+        for prediction in predictions:
+            (dets_loop, dets_batched) = (loop(prediction), batched(prediction))
+            assert np.array_equal(dets_loop.numpy(), dets_batched.numpy())
+            num_dets += dets_batched.shape[0]
+        run(batched, predictions[:1])
+        loop_time = run(loop, predictions)
+        batched_time = run(batched, predictions)
+        print('{:>9} {:>10.1f} {:>12.2f} {:>12.2f} {:>8.1f}x'.format(batch_size, (num_dets / len(predictions)), (loop_time * 1000), (batched_time * 1000), (loop_time / batched_time)))
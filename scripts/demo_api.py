@@ -11,7 +11,7 @@ import math
 import time
 import cv2
 import numpy as np
-from alphapose.utils.transforms import get_func_heatmap_to_coord
+from alphapose.utils.transforms import get_func_heatmap_to_coord_batch
 from alphapose.utils.pPose_nms import pose_nms
 from alphapose.utils.presets import SimpleTransform, SimpleTransform3DSMPL
 from alphapose.utils.transforms import flip, flip_heatmap
@@ -119,9 +119,8 @@ class DetectionLoader():
         if (isinstance(boxes, int) or (boxes.shape[0] == 0)):
             self.det = (orig_imgs, im_names, None, None, None, None, None)
             return
-        inps = jt.zeros((boxes.shape[0], 3, *self._input_size))
-        cropped_boxes = jt.zeros((boxes.shape[0], 4))
-        self.det = (orig_imgs, im_names, boxes, scores[(dets[:, 0] == 0)], ids[(dets[:, 0] == 0)], inps, cropped_boxes)
+        # the crops and their boxes are made by image_postprocess
+        self.det = (orig_imgs, im_names, boxes, scores[(dets[:, 0] == 0)], ids[(dets[:, 0] == 0)], None, None)
 
     def image_postprocess(self):
         with jt.no_grad():
@@ -132,9 +131,7 @@ class DetectionLoader():
             if ((boxes is None) or (len(boxes) == 0)):
                 self.pose = (None, orig_img, im_name, boxes, scores, ids, None)
                 return
-            for (i, box) in enumerate(boxes):
-                (inps[i], cropped_box) = self.transformation.test_transform(orig_img, box)
-                cropped_boxes[i] = jt.float32(cropped_box)
+            (inps, cropped_boxes) = self.transformation.test_transform_batch(orig_img, boxes)
             self.pose = (inps, orig_img, im_name, boxes, scores, ids, cropped_boxes)
 
     def read(self):
@@ -146,7 +143,7 @@ class DataWriter():
         self.cfg = cfg
         self.opt = opt
         self.eval_joints = list(range(cfg.DATA_PRESET.NUM_JOINTS))
-        self.heatmap_to_coord = get_func_heatmap_to_coord(cfg)
+        self.heatmap_to_coord = get_func_heatmap_to_coord_batch(cfg)
         self.item = (None, None, None, None, None, None, None)
         loss_type = self.cfg.DATA_PRESET.get('LOSS_TYPE', 'MSELoss')
         num_joints = self.cfg.DATA_PRESET.NUM_JOINTS
@@ -195,21 +192,9 @@ class DataWriter():
                 self.eval_joints = [*range(0, 26)]
             elif (hm_data.shape[1] == 133):
                 self.eval_joints = [*range(0, 133)]
-            pose_coords = []
-            pose_scores = []
-            for i in range(hm_data.shape[0]):
-                bbox = cropped_boxes[i].tolist()
-                if isinstance(self.heatmap_to_coord, list):
-                    (pose_coords_body_foot, pose_scores_body_foot) = self.heatmap_to_coord[0](hm_data[i][self.eval_joints[:(- 110)]], bbox, hm_shape=hm_size, norm_type=norm_type)
-                    (pose_coords_face_hand, pose_scores_face_hand) = self.heatmap_to_coord[1](hm_data[i][self.eval_joints[(- 110):]], bbox, hm_shape=hm_size, norm_type=norm_type)
-                    pose_coord = np.concatenate((pose_coords_body_foot, pose_coords_face_hand), axis=0)
-                    pose_score = np.concatenate((pose_scores_body_foot, pose_scores_face_hand), axis=0)
-                else:
-                    (pose_coord, pose_score) = self.heatmap_to_coord(hm_data[i][self.eval_joints], bbox, hm_shape=hm_size, norm_type=norm_type)
-                pose_coords.append(pose_coord)
-                pose_scores.append(pose_score)
-            preds_img = np.float32(pose_coords)
-            preds_scores = np.float32(pose_scores)
+            (preds_img, preds_scores) = self.heatmap_to_coord(hm_data[:, self.eval_joints], cropped_boxes, hm_shape=hm_size, norm_type=norm_type, face_hand_num=110)
+            preds_img = np.float32(preds_img)
+            preds_scores = np.float32(preds_scores)
             (boxes, scores, ids, preds_img, preds_scores, pick_ids) = pose_nms(boxes, scores, ids, preds_img, preds_scores, self.opt.min_box_area, use_heatmap_loss=self.use_heatmap_loss)
             _result = []
             for k in range(len(scores)):
@@ -220,7 +205,7 @@ class DataWriter():
             elif self.opt.vis_fast:
                 from alphapose.utils.vis import vis_frame_fast as vis_frame
             else:
-                from alphapose.utils.vis import vis_frame
+                from alphapose.utils.vis import vis_frame_composite as vis_frame
             self.vis_frame = vis_frame
         return result
 
@@ -8,6 +8,7 @@ from jittor import nn
 import argparse
 import platform
 import time
+from queue import Empty
 import numpy as np
 from tqdm import tqdm
 import natsort
@@ -17,9 +18,10 @@ from trackers.tracker_cfg import cfg as tcfg
 from trackers import track
 from alphapose.models import builder
 from alphapose.utils.config import update_config
-from alphapose.utils.detector import DetectionLoader
+from alphapose.utils.detector import STATIC, DetectionLoader
 from alphapose.utils.file_detector import FileDetectionLoader
-from alphapose.utils.transforms import flip, flip_heatmap
+from alphapose.utils.pose_batcher import PoseBatcher
+from alphapose.utils.transforms import flip, flip_heatmap, get_func_heatmap_to_coord_device
 from alphapose.utils.vis import getTime
 from alphapose.utils.webcam_detector import WebCamDetectionLoader
 from alphapose.utils.writer import DataWriter
@@ -43,20 +45,30 @@ parser.add_argument('--vis', default=False, action='store_true', help='visualize
 parser.add_argument('--showbox', default=False, action='store_true', help='visualize human bbox')
 parser.add_argument('--profile', default=False, action='store_true', help='add speed profiling at screen output')
 parser.add_argument('--format', type=str, help='save in the format of cmu or coco or openpose, option: coco/cmu/open')
+parser.add_argument('--roi', type=str, default='', help='region of interest of a fixed camera, a mask image (non-zero inside) or a json of polygons, the detector only runs on its bounding box and drops the people outside of it')
 parser.add_argument('--min_box_area', type=int, default=0, help='min box area to filter out')
+parser.add_argument('--det_interval', type=int, default=1, help='video: run the detector on every N-th frame only, the boxes of the frames in between come from the poses of the frame before')
+parser.add_argument('--det_drop', type=float, default=0.2, help='with --det_interval, run the detector early when the mean keypoint score of a person drops by more than this fraction')
+parser.add_argument('--motion_thres', type=float, default=0, help='video/webcam: fraction of the pixels of a downscaled frame that must change for it to be processed, the results of the frames under it are repeated, 0 processes every frame')
 parser.add_argument('--detbatch', type=int, default=5, help='detection batch size PER GPU')
 parser.add_argument('--posebatch', type=int, default=64, help='pose estimation maximum batch size PER GPU')
+parser.add_argument('--pose_target_batch', type=int, default=0, help='gather the crops of consecutive frames until this many are pending before running pose estimation, 0 runs every frame on its own')
+parser.add_argument('--pose_max_delay', type=float, default=50, help='maximum time (ms) a frame waits for --pose_target_batch crops before pose estimation runs anyway')
+parser.add_argument('--stream_results', default=False, action='store_true', help='write the results of every frame to alphapose-results.ndjson as they finish instead of keeping them in memory until the end')
+parser.add_argument('--fsync_interval', type=int, default=100, help='with --stream_results, fsync the result stream every this many frames, 0 leaves it to the os')
 parser.add_argument('--eval', dest='eval', default=False, action='store_true', help='save the result json as coco format, using image index(int) instead of image name(str)')
 # parser.add_argument('--gpus', type=str, dest='gpus', default='0', help='choose which cuda device to use by index and input comma to use multi gpus, e.g. 0,1,2,3. (input -1 for cpu only)')
 parser.add_argument('--gpus', default=False, action='store_true', help='enable cuda model, if GPU ID is')
 parser.add_argument('--qsize', type=int, dest='qsize', default=1024, help='the length of result buffer, where reducing it will lower requirement of cpu memory')
 parser.add_argument('--flip', default=False, action='store_true', help='enable flip testing')
+parser.add_argument('--device_decode', default=False, action='store_true', help='decode heatmaps into keypoints right after the pose model, so that only keypoints are passed to the writer')
 parser.add_argument('--debug', default=False, action='store_true', help='print detail information')
 '----------------------------- Video options -----------------------------'
 parser.add_argument('--video', dest='video', help='video-name', default='')
 parser.add_argument('--webcam', dest='webcam', type=int, help='webcam number', default=(- 1))
 parser.add_argument('--save_video', dest='save_video', help='whether to save rendered video', default=False, action='store_true')
 parser.add_argument('--vis_fast', dest='vis_fast', help='use fast rendering', action='store_true', default=False)
+parser.add_argument('--render_workers', type=int, default=0, help='render the frames of --save_img/--save_video/--vis on this many workers, written in frame order, 0 renders them on the writer itself')
 '----------------------------- Tracking options -----------------------------'
 parser.add_argument('--pose_flow', dest='pose_flow', help='track humans in video with PoseFlow', action='store_true', default=False)
 parser.add_argument('--pose_track', dest='pose_track', help='track humans in video with reid', action='store_true', default=False)
@@ -127,10 +139,77 @@ def check_input():
 
 def print_finish_info():
     print('===========================> Finish Model Running.')
+    if ((args.motion_thres > 0) and (mode in ('video', 'webcam'))):
+        print('===========================> {} static frames skipped detection and pose estimation.'.format(det_loader.static_frames))
     if ((args.save_img or args.save_video) and (not args.vis_fast)):
         print('===========================> Rendering remaining images in the queue...')
         print('===========================> If this step takes too long, you can enable the --vis_fast flag to use fast rendering (real-time).')
 
+def run_pose(inps):
+    datalen = inps.size(0)
+    leftover = 0
+    if (datalen % batchSize):
+        leftover = 1
+    num_batches = ((datalen // batchSize) + leftover)
+    hm = []
+    for j in range(num_batches):
+        inps_j = inps[(j * batchSize):min(((j + 1) * batchSize), datalen)]
+        if args.flip:
+            inps_j = jt.contrib.concat((inps_j, flip(inps_j)))
+        hm_j = pose_model(inps_j)
+        if args.flip:
+            hm_j_flip = flip_heatmap(hm_j[int((len(hm_j) / 2)):], pose_dataset.joint_pairs, shift=True)
+            hm_j = ((hm_j[0:int((len(hm_j) / 2))] + hm_j_flip) / 2)
+        hm.append(hm_j)
+    return jt.contrib.concat(hm)
+
+def decode_on_device(hm, cropped_boxes):
+    if (not isinstance(cropped_boxes, jt.Var)):
+        cropped_boxes = jt.array(np.float32(cropped_boxes))
+    face_hand_num = (42 if (hm.shape[1] == 68) else 110)
+    (coords, scores) = heatmap_to_coord(hm, cropped_boxes, hm_shape=cfg.DATA_PRESET.HEATMAP_SIZE, norm_type=cfg.LOSS.get('NORM_TYPE', None), face_hand_num=face_hand_num)
+    return jt.contrib.concat((coords, scores), dim=2).numpy()
+
+def write_pose_batch():
+    ckpt_time = getTime()
+    results = pose_batcher.flush(run_pose)
+    if args.profile:
+        (ckpt_time, pose_time) = getTime(ckpt_time)
+        runtime_profile['pt'].append(pose_time)
+    for (inps, hm, (orig_img, im_name, boxes, scores, ids, cropped_boxes, mark)) in results:
+        if (hm is None):
+            if (mark == STATIC):
+                # static frame: the writer repeats the results of the frame before
+                writer.save(None, None, None, None, None, orig_img, im_name, mark=STATIC)
+                continue
+            if propagate:
+                det_loader.update_poses(None)
+            writer.save(None, None, None, None, None, orig_img, im_name)
+            continue
+        if args.pose_track:
+            (boxes, scores, ids, hm, cropped_boxes) = track(tracker, args, orig_img, inps, boxes, hm, cropped_boxes, im_name, scores)
+        if propagate:
+            # the boxes of the next frame come from these poses
+            poses = decode_on_device(hm, cropped_boxes)
+            det_loader.update_poses(poses, scores, ids)
+            if args.device_decode:
+                hm = poses
+        elif args.device_decode:
+            hm = decode_on_device(hm, cropped_boxes)
+        # hm = hm.cpu()
+        writer.save(boxes, scores, ids, hm, cropped_boxes, orig_img, im_name)
+    if args.profile:
+        (ckpt_time, post_time) = getTime(ckpt_time)
+        runtime_profile['pn'].append(post_time)
+
+def read_frame():
+    # wait for the next frame at most until the pending frames are due, and flush them when none comes
+    while True:
+        try:
+            return det_loader.read_marked(timeout=pose_batcher.time_left())
+        except Empty:
+            write_pose_batch()
+
 def loop():
     n = 0
     while True:
@@ -142,13 +221,19 @@ if (__name__ == '__main__'):
     if (not os.path.exists(args.outputpath)):
         os.makedirs(args.outputpath)
     if (mode == 'webcam'):
-        det_loader = WebCamDetectionLoader(input_source, get_detector(args), cfg, args)
+        detector = get_detector(args)
+        # load and compile the detector before the first frame instead of inside it
+        detector.warmup(batch_size=1)
+        det_loader = WebCamDetectionLoader(input_source, detector, cfg, args)
         det_worker = det_loader.start()
     elif (mode == 'detfile'):
         det_loader = FileDetectionLoader(input_source, cfg, args)
         det_worker = det_loader.start()
     else:
-        det_loader = DetectionLoader(input_source, get_detector(args), cfg, args, batchSize=args.detbatch, mode=mode, queueSize=args.qsize)
+        detector = get_detector(args)
+        det_loader = DetectionLoader(input_source, detector, cfg, args, batchSize=args.detbatch, mode=mode, queueSize=args.qsize)
+        # the detector runs on the keyframes of each batch only, padded to key_batch
+        detector.warmup(batch_size=det_loader.key_batch)
         det_worker = det_loader.start()
     pose_model = builder.build_sppe(cfg.MODEL, preset_cfg=cfg.DATA_PRESET)
     print(('Loading pose model from %s...' % (args.checkpoint,)))
@@ -179,49 +264,32 @@ if (__name__ == '__main__'):
     batchSize = args.posebatch
     if args.flip:
         batchSize = int((batchSize / 2))
+    # keyframe detection: each frame needs the poses of the one before, so they go through the pose model one by one
+    propagate = ((mode == 'video') and (args.det_interval > 1))
+    if (args.device_decode or propagate):
+        heatmap_to_coord = get_func_heatmap_to_coord_device(cfg)
+    pose_batcher = PoseBatcher((0 if propagate else args.pose_target_batch), max_delay=(args.pose_max_delay / 1000))
 
     try:
         for i in im_names_desc:
             start_time = getTime()
             with jt.no_grad():
-                (inps, orig_img, im_name, boxes, scores, ids, cropped_boxes) = det_loader.read()
+                ((inps, orig_img, im_name, boxes, scores, ids, cropped_boxes), mark) = read_frame()
                 if (orig_img is None):
                     break
-                if ((boxes is None) or (len(boxes) == 0)):
-                    writer.save(None, None, None, None, None, orig_img, im_name)
-                    continue
-                if args.profile:
+                if ((mark is not None) or (boxes is None) or (len(boxes) == 0)):
+                    inps = None
+                elif args.profile:
                     (ckpt_time, det_time) = getTime(start_time)
                     runtime_profile['dt'].append(det_time)
-                # inps = inps.to(args.device)
-                datalen = inps.size(0)
-                leftover = 0
-                if (datalen % batchSize):
-                    leftover = 1
-                num_batches = ((datalen // batchSize) + leftover)
-                hm = []
-                for j in range(num_batches):
-                    inps_j = inps[(j * batchSize):min(((j + 1) * batchSize), datalen)]
-                    if args.flip:
-                        inps_j = jt.contrib.concat((inps_j, flip(inps_j)))
-                    hm_j = pose_model(inps_j)
-                    if args.flip:
-                        hm_j_flip = flip_heatmap(hm_j[int((len(hm_j) / 2)):], pose_dataset.joint_pairs, shift=True)
-                        hm_j = ((hm_j[0:int((len(hm_j) / 2))] + hm_j_flip) / 2)
-                    hm.append(hm_j)
-                hm = jt.contrib.concat(hm)
-                if args.profile:
-                    (ckpt_time, pose_time) = getTime(ckpt_time)
-                    runtime_profile['pt'].append(pose_time)
-                if args.pose_track:
-                    (boxes, scores, ids, hm, cropped_boxes) = track(tracker, args, orig_img, inps, boxes, hm, cropped_boxes, im_name, scores)
-                # hm = hm.cpu()
-                writer.save(boxes, scores, ids, hm, cropped_boxes, orig_img, im_name)
-                if args.profile:
-                    (ckpt_time, post_time) = getTime(ckpt_time)
-                    runtime_profile['pn'].append(post_time)
+                pose_batcher.put(inps, (orig_img, im_name, boxes, scores, ids, cropped_boxes, mark))
+                if pose_batcher.ready():
+                    write_pose_batch()
             if args.profile:
                 im_names_desc.set_description('det time: {dt:.4f} | pose time: {pt:.4f} | post processing: {pn:.4f}'.format(dt=np.mean(runtime_profile['dt']), pt=np.mean(runtime_profile['pt']), pn=np.mean(runtime_profile['pn'])))
+        with jt.no_grad():
+            if len(pose_batcher):
+                write_pose_batch()
         print_finish_info()
         while writer.running():
             time.sleep(1)
@@ -233,6 +301,10 @@ if (__name__ == '__main__'):
         print('An error as above occurs when processing the images, please check it')
         pass
     except KeyboardInterrupt:
+        # the frames waiting for a pose batch still go to the writer
+        with jt.no_grad():
+            if len(pose_batcher):
+                write_pose_batch()
         print_finish_info()
         if args.sp:
             det_loader.terminate()
@@ -13,7 +13,7 @@ from alphapose.models import builder
 from alphapose.opt import cfg, logger, opt
 from alphapose.utils.logger import board_writing, debug_writing
 from alphapose.utils.metrics import DataLogger, calc_accuracy, calc_integral_accuracy, evaluate_mAP
-from alphapose.utils.transforms import get_func_heatmap_to_coord
+from alphapose.utils.transforms import get_func_heatmap_to_coord_batch
 from jittor_implementations.mpi import fork_with_mpi
 
 if opt.nThreads > 0:
@@ -122,7 +122,6 @@ def validate(m, opt, heatmap_to_coord, batch_size=20):
     m.eval()
     norm_type = cfg.LOSS.get('NORM_TYPE', None)
     hm_size = cfg.DATA_PRESET.HEATMAP_SIZE
-    combined_loss = (cfg.LOSS.get('TYPE') == 'Combined')
     halpe = ((cfg.DATA_PRESET.NUM_JOINTS == 133) or (cfg.DATA_PRESET.NUM_JOINTS == 136))
     for inps, crop_bboxes, bboxes, img_ids, scores, imghts, imgwds in tqdm(det_loader, dynamic_ncols=True):
         if isinstance(inps, list):
@@ -137,15 +136,10 @@ def validate(m, opt, heatmap_to_coord, batch_size=20):
             face_hand_num = 42
         else:
             face_hand_num = 110
+        (pose_coords_batch, pose_scores_batch) = heatmap_to_coord(pred[:, det_dataset.EVAL_JOINTS], crop_bboxes, hm_shape=hm_size, norm_type=norm_type, face_hand_num=face_hand_num)
         for i in range(output.shape[0]):
-            bbox = crop_bboxes[i].tolist()
-            if combined_loss:
-                (pose_coords_body_foot, pose_scores_body_foot) = heatmap_to_coord[0](pred[i][det_dataset.EVAL_JOINTS[:(- face_hand_num)]], bbox, hm_shape=hm_size, norm_type=norm_type)
-                (pose_coords_face_hand, pose_scores_face_hand) = heatmap_to_coord[1](pred[i][det_dataset.EVAL_JOINTS[(- face_hand_num):]], bbox, hm_shape=hm_size, norm_type=norm_type)
-                pose_coords = np.concatenate((pose_coords_body_foot, pose_coords_face_hand), axis=0)
-                pose_scores = np.concatenate((pose_scores_body_foot, pose_scores_face_hand), axis=0)
-            else:
-                (pose_coords, pose_scores) = heatmap_to_coord(pred[i][det_dataset.EVAL_JOINTS], bbox, hm_shape=hm_size, norm_type=norm_type)
+            pose_coords = pose_coords_batch[i]
+            pose_scores = pose_scores_batch[i]
             keypoints = np.concatenate((pose_coords, pose_scores), axis=1)
             keypoints = keypoints.reshape((- 1)).tolist()
             data = dict()
@@ -172,7 +166,6 @@ def validate_gt(m, opt, cfg, heatmap_to_coord, batch_size=20):
     m.eval()
     norm_type = cfg.LOSS.get('NORM_TYPE', None)
     hm_size = cfg.DATA_PRESET.HEATMAP_SIZE
-    combined_loss = (cfg.LOSS.get('TYPE') == 'Combined')
     halpe = ((cfg.DATA_PRESET.NUM_JOINTS == 133) or (cfg.DATA_PRESET.NUM_JOINTS == 136))
     for inps, labels, label_masks, img_ids, bboxes in tqdm(gt_val_loader, dynamic_ncols=True):
         if isinstance(inps, list):
@@ -187,15 +180,10 @@ def validate_gt(m, opt, cfg, heatmap_to_coord, batch_size=20):
             face_hand_num = 42
         else:
             face_hand_num = 110
+        (pose_coords_batch, pose_scores_batch) = heatmap_to_coord(pred[:, gt_val_dataset.EVAL_JOINTS], bboxes, hm_shape=hm_size, norm_type=norm_type, face_hand_num=face_hand_num)
         for i in range(output.shape[0]):
-            bbox = bboxes[i].tolist()
-            if combined_loss:
-                (pose_coords_body_foot, pose_scores_body_foot) = heatmap_to_coord[0](pred[i][gt_val_dataset.EVAL_JOINTS[:(- face_hand_num)]], bbox, hm_shape=hm_size, norm_type=norm_type)
-                (pose_coords_face_hand, pose_scores_face_hand) = heatmap_to_coord[1](pred[i][gt_val_dataset.EVAL_JOINTS[(- face_hand_num):]], bbox, hm_shape=hm_size, norm_type=norm_type)
-                pose_coords = np.concatenate((pose_coords_body_foot, pose_coords_face_hand), axis=0)
-                pose_scores = np.concatenate((pose_scores_body_foot, pose_scores_face_hand), axis=0)
-            else:
-                (pose_coords, pose_scores) = heatmap_to_coord(pred[i][gt_val_dataset.EVAL_JOINTS], bbox, hm_shape=hm_size, norm_type=norm_type)
+            pose_coords = pose_coords_batch[i]
+            pose_scores = pose_scores_batch[i]
             keypoints = np.concatenate((pose_coords, pose_scores), axis=1)
             keypoints = keypoints.reshape((- 1)).tolist()
             data = dict()
@@ -240,7 +228,7 @@ def main():
                                            ) # tycoer
     # train_loader = jt.utils.data.DataLoader(train_dataset, batch_size=(cfg.TRAIN.BATCH_SIZE * num_gpu), shuffle=True, num_workers=opt.nThreads)
 
-    heatmap_to_coord = get_func_heatmap_to_coord(cfg)
+    heatmap_to_coord = get_func_heatmap_to_coord_batch(cfg)
     opt.trainIters = 0
     for i in range(cfg.TRAIN.BEGIN_EPOCH, cfg.TRAIN.END_EPOCH):
         opt.epoch = i
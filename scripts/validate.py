@@ -13,7 +13,7 @@ import sys
 from alphapose.models import builder
 from alphapose.utils.config import update_config
 from alphapose.utils.metrics import evaluate_mAP
-from alphapose.utils.transforms import flip, flip_heatmap, get_func_heatmap_to_coord
+from alphapose.utils.transforms import flip, flip_heatmap, get_func_heatmap_to_coord_batch
 from jittor_implementations.mpi import fork_with_mpi
 
 parser = argparse.ArgumentParser(description='AlphaPose Validate')
@@ -48,7 +48,6 @@ def validate(m, heatmap_to_coord, batch_size=20, num_workers=0):
     m.eval()
     norm_type = cfg.LOSS.get('NORM_TYPE', None)
     hm_size = cfg.DATA_PRESET.HEATMAP_SIZE
-    combined_loss = (cfg.LOSS.get('TYPE') == 'Combined')
     halpe = ((cfg.DATA_PRESET.NUM_JOINTS == 133) or (cfg.DATA_PRESET.NUM_JOINTS == 136))
     bar = tqdm(range(len(det_loader) // det_loader.batch_size))
     for (inps, crop_bboxes, bboxes, img_ids, scores, imghts, imgwds) in det_loader:
@@ -74,21 +73,17 @@ def validate(m, heatmap_to_coord, batch_size=20, num_workers=0):
             face_hand_num = 42
         else:
             face_hand_num = 110
+        (pose_coords_batch, pose_scores_batch) = heatmap_to_coord(pred[:, det_dataset.EVAL_JOINTS], crop_bboxes, hm_shape=hm_size, norm_type=norm_type, hms_flip=(pred_flip[:, det_dataset.EVAL_JOINTS] if (pred_flip is not None) else None), face_hand_num=face_hand_num)
+        areas = ((crop_bboxes[:, 2] - crop_bboxes[:, 0]) * (crop_bboxes[:, 3] - crop_bboxes[:, 1])).tolist()
         for i in range(output.shape[0]):
-            bbox = crop_bboxes[i].tolist()
-            if combined_loss:
-                (pose_coords_body_foot, pose_scores_body_foot) = heatmap_to_coord[0](pred[i][det_dataset.EVAL_JOINTS[:(- face_hand_num)]], bbox, hm_shape=hm_size, norm_type=norm_type, hms_flip=(pred_flip[i][det_dataset.EVAL_JOINTS[:(- face_hand_num)]] if (pred_flip is not None) else None))
-                (pose_coords_face_hand, pose_scores_face_hand) = heatmap_to_coord[1](pred[i][det_dataset.EVAL_JOINTS[(- face_hand_num):]], bbox, hm_shape=hm_size, norm_type=norm_type, hms_flip=(pred_flip[i][det_dataset.EVAL_JOINTS[(- face_hand_num):]] if (pred_flip is not None) else None))
-                pose_coords = np.concatenate((pose_coords_body_foot, pose_coords_face_hand), axis=0)
-                pose_scores = np.concatenate((pose_scores_body_foot, pose_scores_face_hand), axis=0)
-            else:
-                (pose_coords, pose_scores) = heatmap_to_coord(pred[i][det_dataset.EVAL_JOINTS], bbox, hm_shape=hm_size, norm_type=norm_type, hms_flip=(pred_flip[i][det_dataset.EVAL_JOINTS] if (pred_flip is not None) else None))
+            pose_coords = pose_coords_batch[i]
+            pose_scores = pose_scores_batch[i]
             keypoints = np.concatenate((pose_coords, pose_scores), axis=1)
             keypoints = keypoints.reshape((- 1)).tolist()
             data = dict()
             data['bbox'] = bboxes[(i, 0)].tolist()
             data['image_id'] = int(img_ids[i])
-            data['area'] = ((bbox[2] - bbox[0]) * (bbox[3] - bbox[1]))
+            data['area'] = areas[i]
             data['score'] = float(((scores[i] + np.mean(pose_scores)) + (1.25 * np.max(pose_scores))))
             data['category_id'] = 1
             data['keypoints'] = keypoints
@@ -128,7 +123,6 @@ def validate_gt(m, cfg, heatmap_to_coord, batch_size=20, num_workers=0):
     m.eval()
     norm_type = cfg.LOSS.get('NORM_TYPE', None)
     hm_size = cfg.DATA_PRESET.HEATMAP_SIZE
-    combined_loss = (cfg.LOSS.get('TYPE') == 'Combined')
     halpe = ((cfg.DATA_PRESET.NUM_JOINTS == 133) or (cfg.DATA_PRESET.NUM_JOINTS == 136))
     bar = tqdm(range(len(gt_val_loader) // gt_val_loader.batch_size))
     for (inps, labels, label_masks, img_ids, bboxes) in gt_val_loader:
@@ -154,15 +148,10 @@ def validate_gt(m, cfg, heatmap_to_coord, batch_size=20, num_workers=0):
             face_hand_num = 42
         else:
             face_hand_num = 110
+        (pose_coords_batch, pose_scores_batch) = heatmap_to_coord(pred[:, gt_val_dataset.EVAL_JOINTS], bboxes, hm_shape=hm_size, norm_type=norm_type, hms_flip=(pred_flip[:, gt_val_dataset.EVAL_JOINTS] if (pred_flip is not None) else None), face_hand_num=face_hand_num)
         for i in range(output.shape[0]):
-            bbox = bboxes[i].tolist()
-            if combined_loss:
-                (pose_coords_body_foot, pose_scores_body_foot) = heatmap_to_coord[0](pred[i][gt_val_dataset.EVAL_JOINTS[:(- face_hand_num)]], bbox, hm_shape=hm_size, norm_type=norm_type, hms_flip=(pred_flip[i][gt_val_dataset.EVAL_JOINTS[:(- face_hand_num)]] if (pred_flip is not None) else None))
-                (pose_coords_face_hand, pose_scores_face_hand) = heatmap_to_coord[1](pred[i][gt_val_dataset.EVAL_JOINTS[(- face_hand_num):]], bbox, hm_shape=hm_size, norm_type=norm_type, hms_flip=(pred_flip[i][gt_val_dataset.EVAL_JOINTS[(- face_hand_num):]] if (pred_flip is not None) else None))
-                pose_coords = np.concatenate((pose_coords_body_foot, pose_coords_face_hand), axis=0)
-                pose_scores = np.concatenate((pose_scores_body_foot, pose_scores_face_hand), axis=0)
-            else:
-                (pose_coords, pose_scores) = heatmap_to_coord(pred[i][gt_val_dataset.EVAL_JOINTS], bbox, hm_shape=hm_size, norm_type=norm_type, hms_flip=(pred_flip[i][gt_val_dataset.EVAL_JOINTS] if (pred_flip is not None) else None))
+            pose_coords = pose_coords_batch[i]
+            pose_scores = pose_scores_batch[i]
             keypoints = np.concatenate((pose_coords, pose_scores), axis=1)
             keypoints = keypoints.reshape((- 1)).tolist()
             data = dict()
@@ -185,7 +174,7 @@ if (__name__ == '__main__'):
     print(f'Loading model from {opt.checkpoint}...')
     m.load_parameters(jt.load(opt.checkpoint)) #TODO 解注
     # m = torch.nn.DataParallel(m, device_ids=gpus)
-    heatmap_to_coord = get_func_heatmap_to_coord(cfg)
+    heatmap_to_coord = get_func_heatmap_to_coord_batch(cfg)
     with jt.no_grad():
         gt_AP = validate_gt(m, cfg, heatmap_to_coord, opt.batch, opt.num_workers)
         detbox_AP = validate(m, heatmap_to_coord, opt.batch, opt.num_workers)
@@ -26,61 +26,119 @@ def generate_fake_cor(img, out_path):
     fd.close()
 
 
-def orb_matching(img1_path, img2_path, vidname, img1_id, img2_id):
-    
-    out_path = "%s/%s_%s_orb.txt"%(vidname, img1_id, img2_id)
-    # print(out_path)
-    
+class FakeCorrespondences():
+    """Correspondence of every pixel of a width x height frame to itself.
+
+    Stands in for the width*height rows generate_fake_cor writes when the
+    frames have too few ORB matches; the graders of utils.py count the
+    pixels of a box analytically instead of testing every row.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def __len__(self):
+        return self.width * self.height
+
+
+# size in bytes of the correspondence file of these matches, only needed below 1000 bytes:
+# a line takes at least 19 characters, so 53 matches always make a large enough file
+def cor_file_size(cors):
+    if len(cors) >= 53:
+        return 1000
+    return sum(len("%d %d %d %d %f \n"%tuple(cor)) for cor in cors)
+
+
+class OrbMatcher():
+    """ORB correspondences between consecutive frames.
+
+    The ORB detector and the FLANN matcher are created once, and `describe`
+    gives the keypoints and descriptors of a frame, to be kept by the caller
+    so that each frame of a video is described once, as the next frame of a
+    pair and then as the last one. With scale < 1, ORB runs on the frame
+    downscaled to grayscale and the keypoints are scaled back to the frame.
+    """
+
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        # Initiate ORB detector
+        self.orb = cv2.ORB_create(nfeatures=10000, scoreType=cv2.ORB_FAST_SCORE)
+        # FLANN parameters
+        FLANN_INDEX_LSH = 6
+        index_params= dict(algorithm = FLANN_INDEX_LSH,
+                           table_number = 12, # 12
+                           key_size = 12,     # 20
+                           multi_probe_level = 2) #2
+        search_params = dict(checks=100)   # or pass empty dictionary
+        self.flann = cv2.FlannBasedMatcher(index_params,search_params)
+
+    def describe(self, img):
+        """Keypoint positions (ndarray, (n, 2)) in frame coordinates and ORB descriptors of img (ndarray, channel BGR)."""
+        if self.scale == 1.0:
+            kp, des = self.orb.detectAndCompute(cv2.cvtColor(img, cv2.COLOR_BGR2RGB), None)
+        else:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            kp, des = self.orb.detectAndCompute(cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA), None)
+        pts = np.array([k.pt for k in kp], dtype=np.float64).reshape(-1, 2)
+
+        return pts / self.scale, des
+
+    def match(self, features1, features2, img_shape):
+        """
+        Correspondences from the frame of features1 to the frame of features2, as orb_matching gives them
+        img_shape: shape of the frames, for the FakeCorrespondences when there are too few
+        """
+        (pts1, des1), (pts2, des2) = features1, features2
+        if len(pts1)*len(pts2) < 400:
+            return FakeCorrespondences(img_shape[1], img_shape[0])
+
+        matches = self.flann.knnMatch(des1, des2, k=2)
+
+        # ratio test as per Lowe's paper
+        good = [m_n[0] for m_n in matches if len(m_n) == 2 and m_n[0].distance < 0.80*m_n[1].distance]
+        cors = np.zeros((len(good), 5))
+        if good:
+            cors[:, 0:2] = np.trunc(pts1[[m.queryIdx for m in good]])
+            cors[:, 2:4] = np.trunc(pts2[[m.trainIdx for m in good]])
+            cors[:, 4] = [m.distance for m in good]
+
+        if cor_file_size(cors) < 1000:
+            return FakeCorrespondences(img_shape[1], img_shape[0])
+        return cors
+
+
+def orb_matching(img1_path, img2_path, vidname=None, img1_id=None, img2_id=None):
+    """
+    ORB correspondences from img1 to img2, an ndarray of rows x1, y1, x2, y2, distance with the pixel
+    coordinates truncated as in the correspondence files, or FakeCorrespondences when there are too few.
+    The file "<vidname>/<img1_id>_<img2_id>_orb.txt" is only written when vidname is given.
+    """
+
     if isinstance(img1_path, str):
-        img1 = cv2.cvtColor(cv2.imread(img1_path), cv2.COLOR_BGR2RGB)
+        img1 = cv2.imread(img1_path)
     else:
-        img1 = cv2.cvtColor(img1_path, cv2.COLOR_BGR2RGB)
+        img1 = img1_path
     if isinstance(img2_path, str):
-        img2 = cv2.cvtColor(cv2.imread(img2_path), cv2.COLOR_BGR2RGB)
+        img2 = cv2.imread(img2_path)
     else:
-        img2 = cv2.cvtColor(img2_path, cv2.COLOR_BGR2RGB)
-    
-    # Initiate ORB detector
-    orb = cv2.ORB_create(nfeatures=10000, scoreType=cv2.ORB_FAST_SCORE)
-
-    # find the keypoints and descriptors with ORB
-    kp1, des1 = orb.detectAndCompute(img1,None)
-    kp2, des2 = orb.detectAndCompute(img2,None)
-
-    if len(kp1)*len(kp2) < 400:
-        generate_fake_cor(img1, out_path)
-        return
-
-    # FLANN parameters
-    FLANN_INDEX_LSH = 6
-    index_params= dict(algorithm = FLANN_INDEX_LSH,
-                       table_number = 12, # 12
-                       key_size = 12,     # 20
-                       multi_probe_level = 2) #2
+        img2 = img2_path
 
-    search_params = dict(checks=100)   # or pass empty dictionary
+    matcher = OrbMatcher()
+    cors = matcher.match(matcher.describe(img1), matcher.describe(img2), img1.shape)
+    if vidname is not None:
+        dump_correspondences(cors, vidname, img1_id, img2_id)
 
-    flann = cv2.FlannBasedMatcher(index_params,search_params)
+    return cors
 
-    matches = flann.knnMatch(des1, des2, k=2)
-    
-    # Open file
-    fd = open(out_path,"w")
-
-    # ratio test as per Lowe's paper
-    for i, m_n in enumerate(matches):
-        if len(m_n) != 2:
-            continue
-        elif m_n[0].distance < 0.80*m_n[1].distance:
-            ret = fd.write("%d %d %d %d %f \n"%(kp1[m_n[0].queryIdx].pt[0], kp1[m_n[0].queryIdx].pt[1], kp2[m_n[0].trainIdx].pt[0], kp2[m_n[0].trainIdx].pt[1], m_n[0].distance))
-    
-    # Close opened file
-    fd.close()
-
-    # print(os.stat(out_path).st_size)
 
-    if os.stat(out_path).st_size<1000:
-        generate_fake_cor(img1, out_path)
+# write the correspondences in the "<vidname>/<img1_id>_<img2_id>_orb.txt" file read by the offline trackers
+def dump_correspondences(cors, vidname, img1_id, img2_id):
+    out_path = "%s/%s_%s_orb.txt"%(vidname, img1_id, img2_id)
+    if isinstance(cors, FakeCorrespondences):
+        generate_fake_cor(np.broadcast_to(np.uint8(0), (cors.height, cors.width, 3)), out_path)
+    else:
+        np.savetxt(out_path, cors, fmt="%d %d %d %d %f ")
 
 if __name__ == '__main__':
     
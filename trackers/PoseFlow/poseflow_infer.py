@@ -3,8 +3,11 @@ import jittor as jt
 from jittor import init
 from jittor import nn
 import os
+import copy
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from .matching import orb_matching
+from .matching import OrbMatcher, dump_correspondences
 from .utils import expand_bbox, stack_all_pids, best_matching_hungarian
 
 def get_box(pose, img_height, img_width):
@@ -17,7 +20,7 @@ def get_box(pose, img_height, img_width):
 
 class PoseFlowWrapper():
 
-    def __init__(self, link=100, drop=2.0, num=7, mag=30, match=0.2, save_path='.tmp/poseflow', pool_size=5):
+    def __init__(self, link=100, drop=2.0, num=7, mag=30, match=0.2, save_path='.tmp/poseflow', pool_size=0, dump_matching=False, orb_scale=1.0, sink=None):
         self.link_len = link
         self.weights = [1, 2, 1, 2, 0, 0]
         self.weights_fff = [0, 1, 0, 1, 0, 0]
@@ -25,15 +28,27 @@ class PoseFlowWrapper():
         self.num = num
         self.mag = mag
         self.match_thres = match
+        # only the last link_len frames are kept, the ones stack_all_pids looks back at
         self.notrack = {}
         self.track = {}
+        self.frame_list = deque()
+        # frames leaving the window go to sink(frame_name, people), or are kept in self.finished
+        self.sink = sink
+        self.finished = {}
+        self.max_new_pid = 0
         self.save_path = save_path
         self.save_match_path = os.path.join(save_path, 'matching')
         self.pool_size = pool_size
-        if (not os.path.exists(save_path)):
+        # the cost matrix is vectorized, worker processes only pay off for very large crowds
+        self.pool = (ProcessPoolExecutor(max_workers=pool_size) if (pool_size > 0) else None)
+        # the correspondence files are only written for debugging
+        self.dump_matching = dump_matching
+        if (dump_matching and (not os.path.exists(save_path))):
             os.mkdir(save_path)
         self.max_pid_id = 0
-        self.prev_img = None
+        # ORB keypoints and descriptors of the last frame, each frame is described once
+        self.matcher = OrbMatcher(scale=orb_scale)
+        self.prev_features = None
         print('Start pose tracking...\n')
 
     def convert_results_to_no_track(self, alphapose_results):
@@ -73,29 +88,30 @@ class PoseFlowWrapper():
         (img_height, img_width, _) = img.shape
         _track = self.convert_notrack_to_track(_notrack, img_height, img_width)
         self.track.update(_track)
-        if (len(self.track.keys()) == 1):
+        self.frame_list.append(frame_name)
+        if (len(self.frame_list) == 1):
             for pid in range(1, (self.track[frame_name]['num_boxes'] + 1)):
                 self.track[frame_name][pid]['new_pid'] = pid
                 self.track[frame_name][pid]['match_score'] = 0
-            if (not os.path.exists(self.save_match_path)):
+            if (self.dump_matching and (not os.path.exists(self.save_match_path))):
                 os.mkdir(self.save_match_path)
-            self.prev_img = img.copy()
-            return self.final_result_by_name(frame_name)
-        frame_id_list = sorted([(int(os.path.splitext(i)[0]), os.path.splitext(i)[1]) for i in self.track.keys()])
-        frame_list = [''.join([str(i[0]), i[1]]) for i in frame_id_list]
+            self.prev_features = self.matcher.describe(img)
+            return self.finish_step(frame_name)
+        frame_list = list(self.frame_list)
         prev_frame_name = frame_list[(- 2)]
         prev_frame_id = prev_frame_name.split('.')[0]
         frame_new_pids = []
         self.max_pid_id = max(self.max_pid_id, self.track[prev_frame_name]['num_boxes'])
-        cor_file = os.path.join(self.save_match_path, ''.join([prev_frame_id, '_', frame_id, '_orb.txt']))
-        orb_matching(self.prev_img, img, self.save_match_path, prev_frame_id, frame_id)
-        all_cors = np.loadtxt(cor_file)
+        features = self.matcher.describe(img)
+        all_cors = self.matcher.match(self.prev_features, features, img.shape)
+        self.prev_features = features
+        if self.dump_matching:
+            dump_correspondences(all_cors, self.save_match_path, prev_frame_id, frame_id)
         if (self.track[frame_name]['num_boxes'] == 0):
             self.track[frame_name] = copy.deepcopy(self.track[prev_frame_name])
-            self.prev_img = img.copy()
-            return self.final_result_by_name(frame_name)
+            return self.finish_step(frame_name)
         (cur_all_pids, cur_all_pids_fff) = stack_all_pids(self.track, frame_list, (len(frame_list) - 2), self.max_pid_id, self.link_len)
-        (match_indexes, match_scores) = best_matching_hungarian(all_cors, cur_all_pids, cur_all_pids_fff, self.track[frame_name], self.weights, self.weights_fff, self.num, self.mag, pool_size=self.pool_size)
+        (match_indexes, match_scores) = best_matching_hungarian(all_cors, cur_all_pids, cur_all_pids_fff, self.track[frame_name], self.weights, self.weights_fff, self.num, self.mag, pool=self.pool, pool_size=self.pool_size)
         for (pid1, pid2) in match_indexes:
             if (match_scores[pid1][pid2] > self.match_thres):
                 self.track[frame_name][(pid2 + 1)]['new_pid'] = cur_all_pids[pid1]['new_pid']
@@ -106,27 +122,45 @@ class PoseFlowWrapper():
                 self.max_pid_id += 1
                 self.track[frame_name][next_pid]['new_pid'] = self.max_pid_id
                 self.track[frame_name][next_pid]['match_score'] = 0
-        self.prev_img = img.copy()
-        return self.final_result_by_name(frame_name)
+        return self.finish_step(frame_name)
+
+    def finish_step(self, frame_name):
+        result = self.final_result_by_name(frame_name)
+        while (len(self.frame_list) > self.link_len):
+            self.flush_frame()
+        return result
+
+    def flush_frame(self):
+        frame_name = self.frame_list.popleft()
+        del self.track[frame_name]
+        people = self.notrack.pop(frame_name)
+        if (self.sink is not None):
+            self.sink(frame_name, people)
+        else:
+            self.finished[frame_name] = people
+
+    def close(self):
+        while self.frame_list:
+            self.flush_frame()
+        if (self.pool is not None):
+            self.pool.shutdown()
+            self.pool = None
 
     @property
     def num_persons(self):
-        num_persons = 0
-        frame_list = sorted(list(self.track.keys()))
-        for (fid, frame_name) in enumerate(frame_list):
-            for pid in range(1, (self.track[frame_name]['num_boxes'] + 1)):
-                num_persons = max(num_persons, self.track[frame_name][pid]['new_pid'])
-        return num_persons
+        return self.max_new_pid
 
     @property
     def final_results(self):
-        frame_list = sorted(list(self.track.keys()))
-        for (fid, frame_name) in enumerate(frame_list):
-            for pid in range(self.track[frame_name]['num_boxes']):
-                self.notrack[frame_name][pid]['idx'] = self.track[frame_name][(pid + 1)]['new_pid']
-        return self.notrack
+        # the frames given to a sink are not kept
+        results = dict(self.finished)
+        results.update(self.notrack)
+        return results
 
     def final_result_by_name(self, frame_name):
-        for pid in range(self.track[frame_name]['num_boxes']):
+        for pid in range(1, (self.track[frame_name]['num_boxes'] + 1)):
+            self.max_new_pid = max(self.max_new_pid, self.track[frame_name][pid]['new_pid'])
+        # a frame without people keeps the people of the last frame in its track, not in its results
+        for pid in range(len(self.notrack[frame_name])):
             self.notrack[frame_name][pid]['idx'] = self.track[frame_name][(pid + 1)]['new_pid']
         return self.notrack[frame_name]
@@ -17,7 +17,6 @@ import os
 import json
 import copy
 import heapq
-from munkres import Munkres, print_matrix
 from PIL import Image
 from tqdm import tqdm
 from utils import *
@@ -8,7 +8,6 @@ import os
 import json
 import copy
 import heapq
-from munkres import Munkres, print_matrix
 from PIL import Image
 import matplotlib.pyplot as plt
 from tqdm import tqdm
@@ -18,8 +18,8 @@ import os
 import json
 import copy
 import heapq
-from concurrent.futures import ProcessPoolExecutor
-from munkres import Munkres, print_matrix
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import csr_matrix
 from PIL import Image
 from tqdm import tqdm
 
@@ -154,99 +154,151 @@ def cal_pose_iou_dm(all_cors,pose1,pose2,num,mag):
 
     return np.mean(heapq.nlargest(num, poses_iou))
         
-# hungarian matching algorithm(thanks @ZongweiZhou1)
-def _best_matching_hungarian(all_cors, all_pids_info, all_pids_fff, track_vid_next_fid, weights, weights_fff, num, mag):
-    
-    x1, y1, x2, y2 = [all_cors[:, col] for col in range(4)]
-    all_grades_details = []
-    all_grades = []
-    
-    box1_num = len(all_pids_info)
-    box2_num = track_vid_next_fid['num_boxes']
-    cost_matrix = np.zeros((box1_num, box2_num))
-
-    for pid1 in range(box1_num):
-        box1_pos = all_pids_info[pid1]['box_pos']
-        box1_region_ids = find_region_cors_last(box1_pos, all_cors)
-        box1_score = all_pids_info[pid1]['box_score']
-        box1_pose = all_pids_info[pid1]['box_pose_pos']
-        box1_fff = all_pids_fff[pid1]
-
-        for pid2 in range(1, track_vid_next_fid['num_boxes'] + 1):
-            box2_pos = track_vid_next_fid[pid2]['box_pos']
-            box2_region_ids = find_region_cors_next(box2_pos, all_cors)
-            box2_score = track_vid_next_fid[pid2]['box_score']
-            box2_pose = track_vid_next_fid[pid2]['box_pose_pos']
-                        
-            inter = box1_region_ids & box2_region_ids
-            union = box1_region_ids | box2_region_ids
-            dm_iou = len(inter) / (len(union) + 0.00001)
-            box_iou = cal_bbox_iou(box1_pos, box2_pos)
-            pose_iou_dm = cal_pose_iou_dm(all_cors, box1_pose, box2_pose, num,mag)
-            pose_iou = cal_pose_iou(box1_pose, box2_pose,num,mag)
-            if box1_fff:
-                grade = cal_grade([dm_iou, box_iou, pose_iou_dm, pose_iou, box1_score, box2_score], weights)
-            else:
-                grade = cal_grade([dm_iou, box_iou, pose_iou_dm, pose_iou, box1_score, box2_score], weights_fff)
-                
-            cost_matrix[pid1, pid2 - 1] = grade
-    m = Munkres()
-    indexes = m.compute((-np.array(cost_matrix)).tolist())
+# IoU of boxes [xmin, xmax, ymin, ymax] broadcast against each other, the same as cal_bbox_iou
+def cal_bbox_iou_batch(boxA, boxB):
+
+    xA = np.maximum(boxA[..., 0], boxB[..., 0]) #xmin
+    yA = np.maximum(boxA[..., 2], boxB[..., 2]) #ymin
+    xB = np.minimum(boxA[..., 1], boxB[..., 1]) #xmax
+    yB = np.minimum(boxA[..., 3], boxB[..., 3]) #ymax
+
+    interArea = (xB - xA + 1) * (yB - yA + 1)
+    boxAArea = (boxA[..., 1] - boxA[..., 0] + 1) * (boxA[..., 3] - boxA[..., 2] + 1)
+    boxBArea = (boxB[..., 1] - boxB[..., 0] + 1) * (boxB[..., 3] - boxB[..., 2] + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iou = interArea / (boxAArea + boxBArea - interArea + 0.00001)
+
+    return np.where((xA < xB) & (yA < yB), iou, 0.0)
+
+# correspondences sorted by x in each frame, built once per frame pair: the correspondences
+# in a box are found by a binary search on x and a test of y on that slice only
+class CorrespondenceIndex():
+
+    def __init__(self, all_cors):
+        self.num = len(all_cors)
+        self.frames = []
+        for col in (0, 2):
+            order = np.argsort(all_cors[:, col], kind='stable')
+            self.frames.append((order, all_cors[order, col], all_cors[order, col + 1]))
+
+    # (box, correspondence) pairs of the correspondences inside boxes (n, 4) [xmin, xmax, ymin, ymax], frame 0 or 1
+    def regions(self, boxes, frame):
+        order, xs, ys = self.frames[frame]
+        start = np.searchsorted(xs, boxes[:, 0], side='left')
+        lengths = np.maximum(np.searchsorted(xs, boxes[:, 1], side='right') - start, 0)
+        box_ids = np.repeat(np.arange(len(boxes)), lengths)
+        # positions of the x slices of all the boxes, one after the other
+        pos = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - start, lengths)
+        inside = (ys[pos] >= boxes[box_ids, 2]) & (ys[pos] <= boxes[box_ids, 3])
+
+        return box_ids[inside], order[pos[inside]]
+
+    # sparse (groups * n, groups * num) matrix of the correspondences inside boxes (groups, n, 4),
+    # the groups on separate columns so that the boxes of different groups never share one
+    def region_matrix(self, boxes, frame):
+        groups, n = boxes.shape[:2]
+        box_ids, cor_ids = self.regions(boxes.reshape(-1, 4), frame)
+        cols = (box_ids // n) * self.num + cor_ids
+
+        return csr_matrix((np.ones(len(box_ids)), (box_ids, cols)), shape=(groups * n, groups * self.num))
+
+# whether all_cors is the FakeCorrespondences of matching.py, every pixel of the frame matched to itself
+def is_fake_cor(all_cors):
+
+    return hasattr(all_cors, 'width') and hasattr(all_cors, 'height')
+
+# number of pixels of a width x height frame inside boxes [xmin, xmax, ymin, ymax]
+def count_region_pixels(boxes, width, height):
+
+    num_x = np.floor(np.minimum(boxes[..., 1], width - 1)) - np.ceil(np.maximum(boxes[..., 0], 0)) + 1
+    num_y = np.floor(np.minimum(boxes[..., 3], height - 1)) - np.ceil(np.maximum(boxes[..., 2], 0)) + 1
+
+    return np.clip(num_x, 0, None) * np.clip(num_y, 0, None)
+
+# DeepMatching IoU of every box of the last frame with every box of the next frame, per leading dimension
+# boxes1: (..., P, 4) and boxes2: (..., Q, 4), both [xmin, xmax, ymin, ymax], output: (..., P, Q)
+def cal_dm_iou_batch(boxes1, boxes2, all_cors):
+
+    if is_fake_cor(all_cors):
+        # a pixel is in both regions when it is in the intersection of the boxes
+        boxes1, boxes2 = boxes1[..., :, None, :], boxes2[..., None, :, :]
+        inter_boxes = np.stack([np.maximum(boxes1[..., 0], boxes2[..., 0]), np.minimum(boxes1[..., 1], boxes2[..., 1]),
+                                np.maximum(boxes1[..., 2], boxes2[..., 2]), np.minimum(boxes1[..., 3], boxes2[..., 3])], axis=-1)
+        inter = count_region_pixels(inter_boxes, all_cors.width, all_cors.height)
+        union = count_region_pixels(boxes1, all_cors.width, all_cors.height) + count_region_pixels(boxes2, all_cors.width, all_cors.height) - inter
+        return inter / (union + 0.00001)
+    index = all_cors if isinstance(all_cors, CorrespondenceIndex) else CorrespondenceIndex(all_cors)
+    lead, num_boxes1, num_boxes2 = boxes1.shape[:-2], boxes1.shape[-2], boxes2.shape[-2]
+    region1 = index.region_matrix(boxes1.reshape(-1, num_boxes1, 4), 0)
+    region2 = index.region_matrix(boxes2.reshape(-1, num_boxes2, 4), 1)
+    groups = int(np.prod(lead))
+    # only the blocks of the same group are needed from the product
+    group, box1, box2 = np.meshgrid(np.arange(groups), np.arange(num_boxes1), np.arange(num_boxes2), indexing='ij')
+    inter = np.asarray((region1 @ region2.T)[(group * num_boxes1 + box1).ravel(), (group * num_boxes2 + box2).ravel()]).reshape(lead + (num_boxes1, num_boxes2))
+    num1 = np.asarray(region1.sum(axis=1)).reshape(lead + (num_boxes1,))
+    num2 = np.asarray(region2.sum(axis=1)).reshape(lead + (num_boxes2,))
+    union = num1[..., :, None] + num2[..., None, :] - inter
+
+    return inter / (union + 0.00001)
+
+# mean of the top NUM values of the last axis, as np.mean(heapq.nlargest(num, values))
+def mean_nlargest(values, num):
+
+    return np.mean(-np.sort(-values, axis=-1)[..., :num], axis=-1)
+
+# matching grades of the tracked people (rows) against the people of the next frame (columns), all the pairs at once
+# boxes: (n, 4) [xmin, xmax, ymin, ymax], poses: (n, num_joints, 2), scores: (n,), fff: (n1,) bool
+def cal_cost_matrix(all_cors, boxes1, poses1, scores1, fff1, boxes2, poses2, scores2, weights, weights_fff, num, mag):
+
+    dm_iou = cal_dm_iou_batch(boxes1[None], boxes2[None], all_cors)[0]
+    box_iou = cal_bbox_iou_batch(boxes1[:, None], boxes2[None])
+    offsets = np.array([-mag, mag, -mag, mag])
+    pose_boxes1 = poses1[..., [0, 0, 1, 1]] + offsets
+    pose_boxes2 = poses2[..., [0, 0, 1, 1]] + offsets
+    # one DeepMatching IoU per joint, joints in the leading dimension
+    pose_iou_dm = mean_nlargest(np.moveaxis(cal_dm_iou_batch(np.swapaxes(pose_boxes1, 0, 1), np.swapaxes(pose_boxes2, 0, 1), all_cors), 0, -1), num)
+    pose_iou = mean_nlargest(cal_bbox_iou_batch(pose_boxes1[:, None], pose_boxes2[None]), num)
+    grades = [dm_iou, box_iou, pose_iou_dm, pose_iou, scores1[:, None], scores2[None]]
+    weight = np.where(fff1[:, None], np.array(weights, dtype=np.float64)[None], np.array(weights_fff, dtype=np.float64)[None])
+    # summed in the order of cal_grade
+    cost_matrix = 0
+    for (grade, w) in zip(grades, weight.T):
+        cost_matrix = cost_matrix + grade * w[:, None]
+
+    return np.broadcast_to(cost_matrix, (len(boxes1), len(boxes2))).copy()
 
-    return indexes, cost_matrix
+# hungarian matching algorithm(thanks @ZongweiZhou1)
+# all_cors: correspondences from the last frame to the next, rows of x1, y1, x2, y2, or FakeCorrespondences
+# pool: an optional long-lived executor owned by the caller, for very large crowds the rows
+# of the cost matrix are then split in pool_size tasks, each sending the correspondence index once
+def best_matching_hungarian(all_cors, all_pids_info, all_pids_fff, track_vid_next_fid, weights, weights_fff, num, mag, pool=None, pool_size=5):
 
-# multiprocessing version of hungarian matching algorithm
-def best_matching_hungarian(all_cors, all_pids_info, all_pids_fff, track_vid_next_fid, weights, weights_fff, num, mag, pool_size=5):
-    x1, y1, x2, y2 = [all_cors[:, col] for col in range(4)]
-    all_grades_details = []
-    all_grades = []
-    
+    if not is_fake_cor(all_cors):
+        all_cors = CorrespondenceIndex(np.array(all_cors, dtype=np.float64, ndmin=2))
     box1_num = len(all_pids_info)
     box2_num = track_vid_next_fid['num_boxes']
-    cost_matrix = np.zeros((box1_num, box2_num))
-
-    qsize = box1_num * track_vid_next_fid['num_boxes']
-    pool = ProcessPoolExecutor(max_workers=pool_size)
-    futures = []
-    for pid1 in range(box1_num):
-        box1_pos = all_pids_info[pid1]['box_pos']
-        box1_region_ids = find_region_cors_last(box1_pos, all_cors)
-        box1_score = all_pids_info[pid1]['box_score']
-        box1_pose = all_pids_info[pid1]['box_pose_pos']
-        box1_fff = all_pids_fff[pid1]
-
-        for pid2 in range(1, track_vid_next_fid['num_boxes'] + 1):
-            future = pool.submit(best_matching_hungarian_kernel, pid1, pid2, all_cors, track_vid_next_fid, weights, weights_fff, num, mag, box1_pos, box1_region_ids, box1_score, box1_pose, box1_fff)
-            futures.append(future)
-
-    pool.shutdown(True)
-    for future in futures:
-        pid1, pid2, grade = future.result()
-        cost_matrix[pid1, pid2 - 1] = grade
-    m = Munkres()
-    indexes = m.compute((-np.array(cost_matrix)).tolist())
+    if box1_num == 0 or box2_num == 0:
+        return [], np.zeros((box1_num, box2_num))
+    next_info = [track_vid_next_fid[pid2] for pid2 in range(1, box2_num + 1)]
+    boxes1 = np.array([info['box_pos'] for info in all_pids_info], dtype=np.float64).reshape(-1, 4)
+    boxes2 = np.array([info['box_pos'] for info in next_info], dtype=np.float64).reshape(-1, 4)
+    poses1 = np.array([info['box_pose_pos'] for info in all_pids_info], dtype=np.float64)
+    poses2 = np.array([info['box_pose_pos'] for info in next_info], dtype=np.float64)
+    scores1 = np.array([np.asarray(info['box_score'], dtype=np.float64).reshape(-1)[0] for info in all_pids_info])
+    scores2 = np.array([np.asarray(info['box_score'], dtype=np.float64).reshape(-1)[0] for info in next_info])
+    fff1 = np.array(all_pids_fff, dtype=bool)
+
+    if pool is None or box1_num < 2:
+        cost_matrix = cal_cost_matrix(all_cors, boxes1, poses1, scores1, fff1, boxes2, poses2, scores2, weights, weights_fff, num, mag)
+    else:
+        futures = [pool.submit(cal_cost_matrix, all_cors, boxes1[rows], poses1[rows], scores1[rows], fff1[rows], boxes2, poses2, scores2, weights, weights_fff, num, mag)
+                   for rows in np.array_split(np.arange(box1_num), min(pool_size, box1_num))]
+        cost_matrix = np.concatenate([future.result() for future in futures], axis=0)
+    rows, cols = linear_sum_assignment(-cost_matrix)
+    indexes = [(int(row), int(col)) for row, col in zip(rows, cols)]
 
     return indexes, cost_matrix
 
-# one iteration of hungarian matching algorithm
-def best_matching_hungarian_kernel(pid1, pid2, all_cors, track_vid_next_fid, weights, weights_fff, num, mag, box1_pos, box1_region_ids, box1_score, box1_pose, box1_fff):
-    box2_pos = track_vid_next_fid[pid2]['box_pos']
-    box2_region_ids = find_region_cors_next(box2_pos, all_cors)
-    box2_score = track_vid_next_fid[pid2]['box_score']
-    box2_pose = track_vid_next_fid[pid2]['box_pose_pos']
-                        
-    inter = box1_region_ids & box2_region_ids
-    union = box1_region_ids | box2_region_ids
-    dm_iou = len(inter) / (len(union) + 0.00001)
-    box_iou = cal_bbox_iou(box1_pos, box2_pos)
-    pose_iou_dm = cal_pose_iou_dm(all_cors, box1_pose, box2_pose, num,mag)
-    pose_iou = cal_pose_iou(box1_pose, box2_pose,num,mag)
-    if box1_fff:
-        grade = cal_grade([dm_iou, box_iou, pose_iou_dm, pose_iou, box1_score, box2_score], weights)
-    else:
-        grade = cal_grade([dm_iou, box_iou, pose_iou_dm, pose_iou, box1_score, box2_score], weights_fff)  
-    return (pid1, pid2, grade)
-
 # calculate number of matching points in one box from last frame
 def find_region_cors_last(box_pos, all_cors):
     